@@ -1,4 +1,5 @@
 import os
+import sys
 import argparse
 import uvicorn
 from omegaconf import OmegaConf
@@ -12,8 +13,8 @@ def get_args() -> argparse.Namespace:
         "-m",
         "--model_name",
         type=str,
-        choices=["tree", "mil", "ensemble"],
-        help="choose model to use",
+        choices=["tree", "mil", "ensemble", "all"],
+        help="choose model to use (all: serve every model from one process)",
     )
     parser.add_argument(
         "-p",
@@ -29,6 +30,54 @@ def get_args() -> argparse.Namespace:
         default=1,
         help="Number of workers (child process)",
     )
+
+    subparsers = parser.add_subparsers(dest="command")
+    score_parser = subparsers.add_parser(
+        "score", help="Score a cohort offline, without the web server"
+    )
+    sources = score_parser.add_mutually_exclusive_group(required=True)
+    sources.add_argument(
+        "--sample-ids",
+        type=str,
+        help="File with one sample id per line (featurized from files/dynamodb)",
+    )
+    sources.add_argument(
+        "--request-dir",
+        type=str,
+        help="Directory of MILRequest JSON files",
+    )
+    score_parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        required=True,
+        help="*.ndjson file, or *.parquet directory written as one part per batch",
+    )
+    score_parser.add_argument(
+        "-m",
+        "--model_name",
+        type=str,
+        choices=["mil", "ensemble"],
+        default="mil",
+        help="choose model to use",
+    )
+    score_parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of featurization processes",
+    )
+    score_parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=64,
+        help="Samples inferred and checkpointed together",
+    )
+    score_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip samples already recorded in <output>.checkpoint",
+    )
     return parser.parse_args()
 
 
@@ -36,6 +85,24 @@ if __name__ == "__main__":
   
     # If you have a CLI argument parser, you can still use that.
     ARGS = get_args()
+    CONFIG = OmegaConf.load(os.path.join(ASC_DIR, "config.yaml"))
+
+    if ARGS.command == "score":
+        sys.path.append(os.path.dirname(ASC_DIR))
+        from ASC3.scoring import list_sources, score
+        from utils.log_ops import get_logger
+
+        score(
+            config=CONFIG,
+            logger=get_logger("score"),
+            sources=list_sources(ARGS.sample_ids, ARGS.request_dir),
+            output=ARGS.output,
+            model_name=ARGS.model_name,
+            processes=ARGS.processes,
+            batch_size=ARGS.batch_size,
+            resume=ARGS.resume,
+        )
+        sys.exit(0)
 
     # Override the port with the one provided by Heroku if it exists
     port = int(os.environ.get("PORT", ARGS.port))
@@ -43,7 +110,6 @@ if __name__ == "__main__":
     # Optionally, print which port is being used for debugging
     print(f"Starting server on port {port}")
 
-    CONFIG = OmegaConf.load(os.path.join(ASC_DIR, "config.yaml"))
     uvicorn.run(
         app="app:app",
         host="0.0.0.0",
@@ -1,5 +1,7 @@
 import os
 import sys
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
 from starlette.types import Message
@@ -11,23 +13,39 @@ ASC3_DIR = os.path.dirname(os.path.abspath(__file__))
 ROOT_DIR = os.path.dirname(ASC3_DIR)
 sys.path.append(ROOT_DIR)
 
-from ASC3.tree_model.router import api_router
-from ASC3.tree_model.model import Classifier
-from ASC3.mil_model.router import mil_router
-from ASC3.mil_model.model import MILPredictor, EnsembleMILPredictor
-
 from ASC3.error_handler import add_exception_handlers
+from ASC3.health import Readiness, health_router, run_warmup
+from ASC3.transport import CompressionMiddleware, DecompressionMiddleware
+from ASC3.profiling import ProfilingMiddleware, profiling_from_config
 from utils.log_ops import get_logger
 
 
 MODEL_NAME = os.environ.get("MODEL_NAME")
+CONFIG_PATH = os.path.join(ASC3_DIR, "config.yaml")
+
+# MODEL_NAME에 해당하는 모델 스택만 import (tree 모드에서 torch를 import하지 않도록)
+# all: 한 프로세스에서 tree/mil/ensemble을 모두 서비스
+if MODEL_NAME in ("tree", "all"):
+    from ASC3.tree_model.router import api_router
+    from ASC3.tree_model.model import Classifier
+
+if MODEL_NAME in ("mil", "ensemble", "all"):
+    from ASC3.mil_model.router import mil_router
+    from ASC3.mil_model.model import MILPredictor, EnsembleMILPredictor
+    from ASC3.result_cache import cache_from_config
+    from ASC3.hot_swap import watcher_from_config
+
+elif MODEL_NAME != "tree":
+    raise NotImplementedError()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    config = OmegaConf.load(os.path.join(ASC3_DIR, "config.yaml"))
+    config_path = CONFIG_PATH
+    config = OmegaConf.load(config_path)
 
     logger = get_logger("router")
+    app.state.readiness = Readiness()
 
     if MODEL_NAME == "tree":
         classifier = Classifier(config=config, logger=logger, delimiter=".")
@@ -35,6 +53,7 @@ async def lifespan(app: FastAPI):
 
         app.state.classifier: Classifier = classifier
         app.state.logger = logger
+        app.state.readiness.ready = True
 
         yield
 
@@ -44,32 +63,43 @@ async def lifespan(app: FastAPI):
         del app.state.classifier
         del app.state.logger
 
-    elif MODEL_NAME == "mil":
-        app.state.mil_predictor = MILPredictor(config=config, logger=logger)
-        app.state.logger = logger
-
-        yield
-
-        app.state.mil_predictor = None
-        app.state.logger = None
-
-        del app.state.mil_predictor
-        del app.state.logger
-
-    elif MODEL_NAME == "ensemble":
-        app.state.mil_predictor = EnsembleMILPredictor(config=config, logger=logger)
+    elif MODEL_NAME in ("mil", "ensemble", "all"):
+        # all: EnsembleMILPredictor 하나로 mil/ensemble/rf 점수를 모두 제공하고,
+        # tree 모델(Classifier) API는 /tree 경로로 함께 서비스
+        predictor_class = MILPredictor if MODEL_NAME == "mil" else EnsembleMILPredictor
+        if MODEL_NAME == "all":
+            classifier = Classifier(config=config, logger=logger, delimiter=".")
+            classifier.set_model()
+            app.state.classifier: Classifier = classifier
+
+        app.state.mil_predictor = predictor_class(config=config, logger=logger)
+        app.state.result_cache = cache_from_config(config)
+        app.state.float_digits = config.get("TRANSPORT", dict()).get("FLOAT_DIGITS", None)
         app.state.logger = logger
+        watcher = watcher_from_config(app, config, config_path, predictor_class, logger)
+        if watcher is not None:
+            watcher.start()
+        warmup_task = asyncio.create_task(run_warmup(app, config, logger))
 
         yield
 
+        warmup_task.cancel()
+        if watcher is not None:
+            await watcher.stop()
         app.state.mil_predictor = None
+        app.state.result_cache = None
         app.state.logger = None
 
         del app.state.mil_predictor
+        del app.state.result_cache
         del app.state.logger
+        if MODEL_NAME == "all":
+            app.state.classifier = None
+            del app.state.classifier
 
 
 app = FastAPI(lifespan=lifespan)
+app.include_router(health_router)
 if MODEL_NAME == "tree":
     app.include_router(api_router)
 
@@ -79,6 +109,10 @@ elif MODEL_NAME == "mil":
 elif MODEL_NAME == "ensemble":
     app.include_router(mil_router)
 
+elif MODEL_NAME == "all":
+    app.include_router(mil_router)
+    app.include_router(api_router, prefix="/tree")
+
 else:
     raise NotImplementedError()
 
@@ -90,8 +124,15 @@ async def set_body(request: Request, body: bytes):
     request._receive = receive
 
 
+# body를 스트리밍으로 처리하는 경로 (로깅을 위해 body 전체를 미리 읽지 않음)
+STREAMING_PATHS = ("/predict_stream",)
+
+
 @app.middleware("http")
 async def log_request_payload(request: Request, call_next):
+    if request.url.path in STREAMING_PATHS or not request.app.state.logger.isEnabledFor(logging.DEBUG):
+        return await call_next(request)
+
     payload = await request.body()
     await set_body(request, payload)
     request.app.state.logger.debug(f"Request payload: {payload.decode()}")
@@ -99,4 +140,22 @@ async def log_request_payload(request: Request, call_next):
     return response
 
 
+# 미들웨어는 나중에 추가한 것이 바깥쪽: 요청 로깅은 압축 해제된 body를 보고, 응답은 마지막에 압축
+app_config = OmegaConf.load(CONFIG_PATH) if os.path.exists(CONFIG_PATH) else dict()
+transport_config = app_config.get("TRANSPORT", dict())
+app.add_middleware(
+    DecompressionMiddleware,
+    max_body_size=transport_config.get("MAX_REQUEST_BYTES", 512 * 2**20),
+)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=transport_config.get("COMPRESS_MIN_SIZE", 1024),
+    gzip_level=transport_config.get("GZIP_LEVEL", 6),
+    zstd_level=transport_config.get("ZSTD_LEVEL", 3),
+)
+# 프로파일링 토큰이 설정된 경우에만 추가 (가장 바깥쪽: 압축까지 포함하여 측정)
+profiling_kwargs = profiling_from_config(app_config, ROOT_DIR)
+if profiling_kwargs is not None:
+    app.add_middleware(ProfilingMiddleware, **profiling_kwargs)
+
 add_exception_handlers(app)
@@ -0,0 +1,160 @@
+"""RF-first cascade(``MIL_MODEL.CASCADE``)의 속도/정확도 trade-off 리포트
+
+held-out MILRequest(JSON, /predict body)마다 cascade를 끈 ensemble 결과를 기준으로,
+TOP_N/THRESHOLD 조합별로
+
+- ensemble predict 소요 시간 (평균, p95)
+- MIL instance classifier를 돌린 SNV 후보 비율
+- top-k recall: 기준 ensemble 상위 k개 변이 중 cascade 상위 k개에도 있는 비율
+- nonzero recall: 기준에서 truncate_prob 후 0이 아닌 변이 중 cascade에서도 0이 아닌 비율
+- bag 확률 최대 차이 (attention은 전체 bag을 보므로 0이어야 함)
+- causal recall@k: ``--labels``가 주어지면 정답 변이가 cascade 상위 k개에 있는 비율
+
+을 출력함. 임베딩 캐시는 끄고 측정함.
+
+Example:
+    $ python ASC3/benchmarks/cascade_report.py --requests heldout/ --labels heldout_causal.json \\
+        --top-n 0 50 200 --threshold 0.01 0.05 --k 10
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import statistics
+from typing import Dict, List, Optional, Tuple
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ASC3_DIR = os.path.dirname(BENCHMARK_DIR)
+ROOT_DIR = os.path.dirname(ASC3_DIR)
+sys.path.extend([ROOT_DIR, ASC3_DIR])
+
+from omegaconf import OmegaConf
+
+from ASC3.mil_model.data_model import MILRequest
+from ASC3.mil_model.model import EnsembleMILPredictor
+
+
+def load_requests(path: str) -> List[MILRequest]:
+    files = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".json"))
+    requests = list()
+    for file in files:
+        with open(file, encoding="utf-8") as fh:
+            requests.append(MILRequest(**json.load(fh)))
+    return requests
+
+
+def flatten_scores(variant2score: dict) -> Dict[str, float]:
+    """{gene-disease: {cpra: score}} -> {cpra: 변이의 최대 score}"""
+    scores = dict()
+    for variants in variant2score["snv"].values():
+        for cpra, score in variants.items():
+            scores[cpra] = max(score, scores.get(cpra, 0.0))
+    return scores
+
+
+def top_k(scores: Dict[str, float], k: int) -> List[str]:
+    return [cpra for cpra, _ in sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]]
+
+
+def run(
+    predictor: EnsembleMILPredictor, query: MILRequest, repeat: int
+) -> Tuple[float, Dict[str, float], List[float], float]:
+    """Returns: (bag 확률, 변이별 ensemble score, 소요 시간들, 후보 비율)"""
+    seconds = list()
+    for _ in range(repeat):
+        patient_data = predictor.convert_query_to_patient_data(query)
+        stats = dict()
+        start = time.perf_counter()
+        bag_prob, variant2score = predictor.predict_models(patient_data, ("ensemble",), stats)["ensemble"]
+        seconds.append(time.perf_counter() - start)
+
+    cascade = stats.get("cascade", dict())
+    ratio = cascade["candidates"] / cascade["instances"] if cascade.get("instances") else 1.0
+    return bag_prob, flatten_scores(variant2score), seconds, ratio
+
+
+def recall(expected: List[str], found: List[str]) -> Optional[float]:
+    if not expected:
+        return None
+    return len(set(expected) & set(found)) / len(expected)
+
+
+def mean_or_dash(values: List[Optional[float]]) -> str:
+    values = [value for value in values if value is not None]
+    return "%.3f" % statistics.mean(values) if values else "-"
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=str, required=True, help="held-out MILRequest JSON 파일 디렉토리")
+    parser.add_argument("--labels", type=str, default=None, help="{sample_id: [정답 cpra, ...]} JSON")
+    parser.add_argument("--top-n", type=int, nargs="+", default=[0, 50, 100, 200])
+    parser.add_argument("--threshold", type=float, nargs="+", default=[0.01, 0.05])
+    parser.add_argument("--k", type=int, default=10, help="top-k recall의 k")
+    parser.add_argument("--repeat", type=int, default=3, help="요청별 반복 측정 횟수")
+    parser.add_argument("--config", type=str, default=os.path.join(ASC3_DIR, "config.yaml"))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    CONFIG = OmegaConf.load(ARGS.config)
+    LABELS = dict()
+    if ARGS.labels:
+        with open(ARGS.labels, encoding="utf-8") as fh:
+            LABELS = json.load(fh)
+
+    PREDICTOR = EnsembleMILPredictor(config=CONFIG)
+    PREDICTOR.embedding_cache = None
+    PREDICTOR.warmup()
+    REQUESTS = load_requests(ARGS.requests)
+    print("%d held-out requests, k=%d" % (len(REQUESTS), ARGS.k))
+
+    CONFIG.MIL_MODEL.CASCADE = {"ENABLED": False}
+    BASELINE = [run(PREDICTOR, query, ARGS.repeat) for query in REQUESTS]
+
+    print(
+        "\n%-6s %9s %9s %9s %10s %9s %9s %9s %9s"
+        % ("top_n", "threshold", "mean_s", "p95_s", "candidates", "top_k", "nonzero", "bag_diff", "causal")
+    )
+    settings = [(None, None)] + list(itertools.product(ARGS.top_n, ARGS.threshold))
+    for top_n, threshold in settings:
+        if top_n is None:
+            results = BASELINE
+        else:
+            CONFIG.MIL_MODEL.CASCADE = {"ENABLED": True, "TOP_N": top_n, "THRESHOLD": threshold}
+            results = [run(PREDICTOR, query, ARGS.repeat) for query in REQUESTS]
+
+        seconds, ratios, top_k_recall, nonzero_recall, causal_recall, bag_diff = [], [], [], [], [], 0.0
+        for query, (bag_prob, scores, times, ratio), (base_bag, base_scores, _, _) in zip(
+            REQUESTS, results, BASELINE
+        ):
+            seconds.extend(times)
+            ratios.append(ratio)
+            bag_diff = max(bag_diff, abs(bag_prob - base_bag))
+            top_k_recall.append(recall(top_k(base_scores, ARGS.k), top_k(scores, ARGS.k)))
+            nonzero_recall.append(
+                recall(
+                    [cpra for cpra, score in base_scores.items() if score > 0],
+                    [cpra for cpra, score in scores.items() if score > 0],
+                )
+            )
+            causal_recall.append(recall(LABELS.get(query.sample_id, list()), top_k(scores, ARGS.k)))
+
+        seconds.sort()
+        print(
+            "%-6s %9s %9.4f %9.4f %10.3f %9s %9s %9.2e %9s"
+            % (
+                "full" if top_n is None else top_n,
+                "-" if threshold is None else threshold,
+                statistics.mean(seconds),
+                seconds[min(int(0.95 * len(seconds)), len(seconds) - 1)],
+                statistics.mean(ratios),
+                mean_or_dash(top_k_recall),
+                mean_or_dash(nonzero_recall),
+                bag_diff,
+                mean_or_dash(causal_recall),
+            )
+        )
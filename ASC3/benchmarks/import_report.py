@@ -0,0 +1,81 @@
+"""MODEL_NAME별 ASC3 앱 import 시간과 메모리(RSS) 비교
+
+각 모드마다 새 프로세스에서 ``ASC3.app``을 import하여 소요 시간, 최대 RSS,
+로딩된 주요 무거운 모듈을 기록함. ``eager``는 모드와 무관하게 모든 모델 스택을
+import하던 이전 방식을 재현한 기준값임.
+
+Example:
+    $ python ASC3/benchmarks/import_report.py
+    $ python ASC3/benchmarks/import_report.py --modes tree eager --json
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ASC3_DIR = os.path.dirname(BENCHMARK_DIR)
+ROOT_DIR = os.path.dirname(ASC3_DIR)
+
+HEAVY_MODULES = ("torch", "mlflow", "sklearn", "pandas", "boto3")
+MODES = ("tree", "mil", "ensemble", "all", "eager")
+
+CHILD = """
+import os, sys, time, json, resource
+sys.path[:0] = [%(root)r, %(asc3)r]
+start = time.perf_counter()
+if %(mode)r == "eager":
+    os.environ["MODEL_NAME"] = "mil"
+    import mlflow, sklearn.ensemble
+    import ASC3.tree_model.router, ASC3.tree_model.model
+    import ASC3.app
+else:
+    os.environ["MODEL_NAME"] = %(mode)r
+    import ASC3.app
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    "import_s": elapsed,
+    "max_rss_mb": rss_kb / 1024,
+    "heavy": sorted(m for m in %(heavy)r if m in sys.modules),
+}))
+"""
+
+
+def measure(mode: str) -> dict:
+    code = CHILD % {"root": ROOT_DIR, "asc3": ASC3_DIR, "mode": mode, "heavy": HEAVY_MODULES}
+    proc = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT_DIR
+    )
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--modes", nargs="+", choices=MODES, default=list(MODES), help="modes to measure"
+    )
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    report = {mode: measure(mode) for mode in ARGS.modes}
+
+    if ARGS.json:
+        print(json.dumps(report, indent=2))
+        sys.exit(0)
+
+    print("%-10s %9s %12s  %s" % ("mode", "import_s", "max_rss_mb", "heavy modules"))
+    for mode, row in report.items():
+        if "error" in row:
+            print("%-10s %s" % (mode, row["error"]))
+            continue
+        print(
+            "%-10s %9.3f %12.1f   %s"
+            % (mode, row["import_s"], row["max_rss_mb"], ", ".join(row["heavy"]))
+        )
@@ -0,0 +1,85 @@
+"""/predict 응답 인코딩 시간과 전송 크기 비교
+
+bag 크기별로 variant_probability 형태의 임의 응답을 만들어
+표준 json(JSONResponse) / dumps(orjson 우선) 인코딩 시간, 소수점 자릿수 제한,
+gzip/zstd 압축 후 크기와 압축 시간을 비교함.
+
+Example:
+    $ python ASC3/benchmarks/response_encoding.py --bag-sizes 100 1000 10000 --digits 4
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+sys.path.append(ROOT_DIR)
+
+from ASC3.transport import available_encodings, compress, dumps, orjson, round_scores
+
+
+def make_content(bag_size: int, n_cnv: int = 20, seed: int = 0) -> dict:
+    rng = random.Random(seed)
+    snv = dict()
+    for i in range(bag_size):
+        key = "OMIM:%06d-OMIM:%06d" % (i % max(bag_size // 4, 1), i)
+        snv.setdefault(key, dict())["%s-%s-A-T" % (i % 22 + 1, 10000 + i)] = rng.random()
+    cnv = {"%s-%s-%s" % (i % 22 + 1, 1000 * i, 1000 * i + 500): rng.random() for i in range(n_cnv)}
+    return {"patient_probability": rng.random(), "variant_probability": {"snv": snv, "cnv": cnv}}
+
+
+def stdlib_dumps(content: dict) -> bytes:
+    """starlette JSONResponse.render와 같은 인코딩"""
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def timed(func, *args, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bag-sizes", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--digits", type=int, default=4, help="FLOAT_DIGITS to compare against")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    encoder = "orjson" if orjson is not None else "json(fallback)"
+    print(
+        "%8s %-24s %10s %10s   %s"
+        % ("bag", "encoding", "encode_ms", "bytes", "  ".join("%s(bytes/ms)" % e for e in available_encodings()))
+    )
+    for bag_size in ARGS.bag_sizes:
+        content = make_content(bag_size)
+        rounded = dict(
+            content,
+            variant_probability=round_scores(content["variant_probability"], ARGS.digits),
+        )
+        cases = [
+            ("json", stdlib_dumps, content),
+            (encoder, dumps, content),
+            ("%s digits=%s" % (encoder, ARGS.digits), dumps, rounded),
+        ]
+        for name, func, payload in cases:
+            body, seconds = timed(func, payload, repeat=ARGS.repeat)
+            compressed = list()
+            for encoding in available_encodings():
+                data, compress_seconds = timed(compress, body, encoding, repeat=ARGS.repeat)
+                compressed.append("%s(%d/%.2f)" % (encoding, len(data), compress_seconds * 1000))
+            print(
+                "%8d %-24s %10.3f %10d   %s"
+                % (bag_size, name, seconds * 1000, len(body), "  ".join(compressed))
+            )
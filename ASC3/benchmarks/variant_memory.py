@@ -0,0 +1,77 @@
+"""MILRequest -> PatientData 변환의 peak 메모리 비교 (Variant 객체 리스트 vs VariantTable)
+
+임의의 MILRequest를 만들고 ``MIL_MODEL.COMPACT_VARIANTS``를 끄고/켜서
+``convert_query_to_patient_data``의 tracemalloc peak, 변환 후 유지되는 메모리,
+소요 시간을 비교함. 모델은 로딩하지 않음.
+
+Example:
+    $ python ASC3/benchmarks/variant_memory.py --n-snv 5000 20000 --n-genes 500
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+ASC3_DIR = os.path.dirname(BENCHMARK_DIR)
+ROOT_DIR = os.path.dirname(ASC3_DIR)
+sys.path.extend([ROOT_DIR, ASC3_DIR])
+
+from omegaconf import OmegaConf
+
+from ASC3.mil_model.data_model import MILRequest
+from ASC3.mil_model.model import MILPredictor
+
+
+def make_request(n_snv: int, n_genes: int, n_cnv: int) -> MILRequest:
+    example = MILRequest.Config.schema_extra["example"]
+    features = example["snv"]["OMIM:600276-OMIM:125310"]["1-100-A-T"]
+    cnv_features = example["cnv"]["3-273823-2998433"]
+
+    snv = dict()
+    for i in range(n_snv):
+        gene_disease = "OMIM:%06d-OMIM:%06d" % (i % n_genes, i % n_genes + 100000)
+        snv.setdefault(gene_disease, dict())["%s-%s-A-T" % (i % 22 + 1, 10000 + i)] = dict(
+            features, disease_similarity=(i % 100) / 10
+        )
+
+    cnv = {"%s-%s-%s" % (i % 22 + 1, 1000 * i, 1000 * i + 500): cnv_features for i in range(n_cnv)}
+    return MILRequest(sample_id="BENCH", inhouse_total_ac=1000, snv=snv, cnv=cnv)
+
+
+def measure(predictor: MILPredictor, query: MILRequest) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    patient_data = predictor.convert_query_to_patient_data(query)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del patient_data
+    return {"seconds": elapsed, "retained_mb": current / 2**20, "peak_mb": peak / 2**20}
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-snv", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--n-genes", type=int, default=500, help="distinct gene-disease pairs")
+    parser.add_argument("--n-cnv", type=int, default=50)
+    parser.add_argument("--config", type=str, default=os.path.join(ASC3_DIR, "config.yaml"))
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    CONFIG = OmegaConf.load(ARGS.config)
+
+    print("%8s %-8s %9s %12s %9s" % ("n_snv", "variants", "seconds", "retained_mb", "peak_mb"))
+    for n_snv in ARGS.n_snv:
+        query = make_request(n_snv, ARGS.n_genes, ARGS.n_cnv)
+        for compact in (False, True):
+            CONFIG.MIL_MODEL.COMPACT_VARIANTS = compact
+            predictor = MILPredictor(config=CONFIG, load_model=False)
+            row = measure(predictor, query)
+            print(
+                "%8d %-8s %9.3f %12.2f %9.2f"
+                % (n_snv, "table" if compact else "objects", row["seconds"], row["retained_mb"], row["peak_mb"])
+            )
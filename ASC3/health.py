@@ -0,0 +1,89 @@
+"""liveness(/healthz), readiness(/readyz) 엔드포인트와 시작 시 warm-up
+
+lifespan이 yield한 직후부터 요청을 받을 수 있지만, 첫 요청은 torch 초기화,
+메모리 할당, sklearn 첫 호출 비용 때문에 느림. 시작 시 여러 크기의 임의 bag으로
+``predict``를 실행하고, 끝난 뒤에만 /readyz가 200을 반환하여 로드밸런서가
+warm-up이 끝난 워커로만 요청을 보내도록 함.
+"""
+import time
+import asyncio
+from logging import Logger
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+DEFAULT_BAG_SIZES = (16, 128, 1024)
+
+health_router = APIRouter()
+
+
+class Readiness:
+    """워커의 준비 상태"""
+
+    def __init__(self) -> None:
+        self.ready = False
+        self.started_at = time.time()
+        self.warmup_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_seconds": time.time() - self.started_at,
+            "warmup_seconds": self.warmup_seconds,
+            "warmup_error": self.error,
+        }
+
+
+def warmup_bag_sizes(config: dict) -> Tuple[int, ...]:
+    """config의 WARMUP.BAG_SIZES (기본값 16, 128, 1024)"""
+    return tuple(config.get("WARMUP", dict()).get("BAG_SIZES", DEFAULT_BAG_SIZES))
+
+
+async def run_warmup(app, config: dict, logger: Logger) -> None:
+    """app.state.mil_predictor로 warm-up 후 ready 상태로 전환
+
+    warm-up이 실패해도 모델 로딩은 끝난 상태이므로 ready로 전환하고 에러를 기록함.
+    """
+    readiness: Readiness = app.state.readiness
+    warmup_config = config.get("WARMUP", dict())
+    if not warmup_config.get("ENABLED", True):
+        readiness.ready = True
+        return
+
+    bag_sizes = warmup_bag_sizes(config)
+    repeats = warmup_config.get("REPEATS", 1)
+    predictor = app.state.mil_predictor
+    try:
+        elapsed = 0.0
+        for _ in range(repeats):
+            elapsed += await run_in_threadpool(predictor.warmup, bag_sizes)
+        readiness.warmup_seconds = elapsed
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        readiness.error = str(e)
+        logger.error("Warm-up failed: %s" % e)
+
+    readiness.ready = True
+    logger.info("Worker ready: %s" % readiness.to_dict())
+
+
+@health_router.get("/healthz")
+def healthz() -> JSONResponse:
+    """프로세스가 요청에 응답할 수 있는지 (liveness)"""
+    return JSONResponse(content={"status": "ok"})
+
+
+@health_router.get("/readyz")
+def readyz(request: Request) -> JSONResponse:
+    """모델 로딩과 warm-up이 끝났는지 (readiness). 준비되지 않았으면 503"""
+    readiness: Readiness = request.app.state.readiness
+    content = readiness.to_dict()
+    predictor = getattr(request.app.state, "mil_predictor", None)
+    if predictor is not None:
+        content["artifact_id"] = predictor.artifact_id
+
+    return JSONResponse(content=content, status_code=200 if readiness.ready else 503)
@@ -0,0 +1,242 @@
+"""서비스 중단 없이 MIL 모델 아티펙트를 교체하는 백그라운드 감시자
+
+config.yaml의 ``MIL_MODEL.UUID``/``MODEL.ARTIFACT_ROOT``와 체크포인트 디렉토리의
+``MLmodel``, ``rf_model/MLmodel`` 변경을 주기적으로 확인하고, 변경되면
+
+1. 새 config로 predictor를 별도 스레드에서 생성(다운로드/로딩)
+2. warm-up을 실행
+3. ``app.state.mil_predictor``를 새 predictor로 교체
+
+순서로 진행함. 요청 핸들러는 요청 시작 시점의 predictor 참조(Depends)를 사용하므로
+교체 중 처리 중인 요청은 이전 predictor로 끝나고, 이후 요청부터 새 predictor를 사용함.
+새 predictor 생성이나 warm-up이 실패하면 이전 predictor를 계속 사용함.
+
+RF 아티펙트(``MODEL.ARTIFACT_ROOT``)가 바뀌면 새 ``rf_model``을 임시 디렉토리에 받아
+로딩을 확인한 뒤에 교체하고, predictor 생성이 실패하면 이전 ``rf_model``로 되돌림.
+실패한 아티펙트는 다시 바뀌기 전까지 ``interval``의 2배씩(최대 ``max_backoff``) 늘어나는
+간격으로만 재시도함.
+
+Note:
+    uvicorn 워커가 여러 개이면 워커마다 감시자가 동작하며, 체크포인트 디렉토리는
+    워커 간에 공유됨. 다운로드/삭제와 로딩은 ``checkpoint_lock``으로 직렬화되고,
+    다른 워커가 이미 받은 아티펙트는 다시 받지 않음.
+    predictor의 ``artifact_id``에는 로딩한 파일의 mtime이 포함되므로 교체 후에는
+    결과 캐시의 이전 결과가 사용되지 않음.
+"""
+import os
+import time
+import shutil
+import asyncio
+import tempfile
+from logging import Logger
+from typing import Optional, Tuple, Type
+
+from fastapi import FastAPI
+from omegaconf import OmegaConf
+from starlette.concurrency import run_in_threadpool
+
+from ASC3.health import warmup_bag_sizes
+from ASC3.mil_model.model import CHECKPOINT_DIR, MILPredictor, checkpoint_lock, load_sklearn_artifact
+from mlflow_settings import TRACKING_URI
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+class ModelWatcher:
+    """모델 아티펙트 변경 감지 및 predictor 교체
+
+    Args:
+        app (FastAPI): ``app.state.mil_predictor``를 갖는 앱
+        config_path (str): config.yaml 경로
+        predictor_class (Type[MILPredictor]): MILPredictor 또는 EnsembleMILPredictor
+        logger (Logger): 로거
+        interval (float): 변경 확인 주기(초)
+        warmup_bag_sizes (Tuple[int, ...]): 교체 전 warm-up에 사용할 bag 크기
+        max_backoff (float): 교체에 실패한 아티펙트의 최대 재시도 간격(초)
+    """
+
+    def __init__(
+        self,
+        app: FastAPI,
+        config_path: str,
+        predictor_class: Type[MILPredictor],
+        logger: Logger,
+        interval: float = 60,
+        warmup_bag_sizes: Tuple[int, ...] = (16,),
+        max_backoff: float = 3600,
+    ) -> None:
+        self.app = app
+        self.config_path = config_path
+        self.predictor_class = predictor_class
+        self.logger = logger
+        self.interval = interval
+        self.warmup_bag_sizes = warmup_bag_sizes
+        self.max_backoff = max_backoff
+        self.n_swaps = 0
+        self.n_failures = 0
+        self._failed_fingerprint: Optional[tuple] = None
+        self._retry_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._fingerprint = self.fingerprint(OmegaConf.load(config_path))
+
+    def fingerprint(self, config: dict) -> tuple:
+        """교체 여부를 판단하는 아티펙트 식별 정보"""
+        artifact_root = config.get("MODEL", dict()).get("ARTIFACT_ROOT")
+        return (
+            config["MIL_MODEL"]["UUID"],
+            artifact_root,
+            _mtime(os.path.join(CHECKPOINT_DIR, "MLmodel")),
+            _mtime(os.path.join(CHECKPOINT_DIR, "rf_model", "MLmodel")),
+        )
+
+    def reload_if_changed(self) -> bool:
+        """아티펙트가 바뀌었으면 새 predictor를 로딩/warm-up 후 교체 (스레드에서 실행)
+
+        Returns:
+            bool: 교체 여부
+
+        Raises:
+            Exception: 교체 실패. 같은 아티펙트는 backoff가 끝날 때까지 다시 시도하지 않음
+        """
+        config = OmegaConf.load(self.config_path)
+        fingerprint = self.fingerprint(config)
+        if fingerprint == self._fingerprint:
+            return False
+        if fingerprint == self._failed_fingerprint and time.monotonic() < self._retry_at:
+            return False
+
+        self.logger.info("Model artifact changed: %s -> %s" % (self._fingerprint, fingerprint))
+        try:
+            predictor = self._load(config, tree_changed=fingerprint[1] != self._fingerprint[1])
+        except Exception:
+            # 실패한 다운로드가 MLmodel 등의 mtime을 바꿨을 수 있으므로 실패 이후 상태를 기록
+            self._back_off(self.fingerprint(config))
+            raise
+
+        previous = self.app.state.mil_predictor
+        self.app.state.mil_predictor = predictor
+        # 다운로드로 MLmodel 등의 mtime이 바뀌었으므로 로딩 이후 상태를 기준으로 삼음
+        self._fingerprint = self.fingerprint(config)
+        self._failed_fingerprint = None
+        self.n_swaps += 1
+        self.logger.info(
+            "Swapped predictor %s -> %s" % (previous.artifact_id, predictor.artifact_id)
+        )
+        return True
+
+    def _load(self, config: dict, tree_changed: bool) -> MILPredictor:
+        """새 predictor 생성 및 warm-up. RF 아티펙트가 바뀌었으면 검증된 사본으로 먼저 교체"""
+        if not tree_changed:
+            predictor = self.predictor_class(config=config, logger=self.logger)
+            predictor.warmup(self.warmup_bag_sizes)
+            return predictor
+
+        # _set_tree_model은 로컬 rf_model이 있으면 그대로 사용하므로, 새 RF를 받아 로딩이
+        # 확인된 뒤에만 로컬 사본과 바꿈. 실패하면 이전 rf_model은 그대로 남음
+        staging = self._stage_tree_model(config["MODEL"]["ARTIFACT_ROOT"])
+        local_path = os.path.join(CHECKPOINT_DIR, "rf_model")
+        previous_path = os.path.join(staging, "previous")
+        try:
+            with checkpoint_lock():
+                if os.path.exists(local_path):
+                    os.replace(local_path, previous_path)
+                os.replace(os.path.join(staging, "rf_model"), local_path)
+
+            try:
+                predictor = self.predictor_class(config=config, logger=self.logger)
+                predictor.warmup(self.warmup_bag_sizes)
+            except Exception:
+                # 현재 predictor가 사용하는 RF를 디스크에도 되돌려 다른 워커/재시작과 맞춤
+                with checkpoint_lock():
+                    if os.path.exists(previous_path):
+                        shutil.rmtree(local_path, ignore_errors=True)
+                        os.replace(previous_path, local_path)
+                raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        return predictor
+
+    def _stage_tree_model(self, artifact_root: str) -> str:
+        """RF 아티펙트를 CHECKPOINT_DIR 안의 임시 디렉토리에 받고 로딩되는지 확인
+
+        Returns:
+            str: ``rf_model``을 담은 임시 디렉토리 (호출자가 삭제)
+        """
+        import mlflow
+
+        os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+        # 같은 파일시스템에 두어 교체(os.replace)가 원자적으로 이루어지게 함
+        staging = tempfile.mkdtemp(prefix=".rf_model-", dir=CHECKPOINT_DIR)
+        try:
+            mlflow.set_tracking_uri(TRACKING_URI)
+            mlflow.artifacts.download_artifacts(artifact_root, dst_path=staging)
+            load_sklearn_artifact(os.path.join(staging, "rf_model"))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        return staging
+
+    def _back_off(self, fingerprint: tuple) -> None:
+        """실패한 아티펙트의 재시도 시점 기록. 같은 아티펙트가 연속으로 실패하면 간격을 2배로"""
+        if fingerprint == self._failed_fingerprint:
+            self.n_failures += 1
+        else:
+            self.n_failures = 1
+        delay = min(self.interval * 2 ** self.n_failures, self.max_backoff)
+        self._failed_fingerprint = fingerprint
+        self._retry_at = time.monotonic() + delay
+        self.logger.warning("Retry artifact %s in %.0fs" % (fingerprint, delay))
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await run_in_threadpool(self.reload_if_changed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error("Model hot-swap failed, keep current predictor: %s" % e)
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def watcher_from_config(
+    app: FastAPI,
+    config: dict,
+    config_path: str,
+    predictor_class: Type[MILPredictor],
+    logger: Logger,
+) -> Optional[ModelWatcher]:
+    """config의 HOT_SWAP 설정으로 감시자 생성. ENABLED가 false(기본값)면 None"""
+    swap_config = config.get("HOT_SWAP", dict())
+    if not swap_config.get("ENABLED", False):
+        return None
+
+    return ModelWatcher(
+        app,
+        config_path,
+        predictor_class,
+        logger,
+        interval=swap_config.get("INTERVAL", 60),
+        warmup_bag_sizes=tuple(swap_config.get("WARMUP_BAG_SIZES", warmup_bag_sizes(config))),
+        max_backoff=swap_config.get("MAX_BACKOFF", 3600),
+    )
@@ -0,0 +1,134 @@
+"""변이 목록의 struct-of-arrays 표현
+
+bag이 커지면 인스턴스마다 ``Variant`` 객체(cpra 문자열, acmg_rules 리스트, gene/disease id
+문자열)를 만드는 비용이 feature 행렬보다 커짐. ``VariantTable``은
+
+- cpra: 하나의 bytes 버퍼 + 오프셋 배열
+- gene_id, disease_id: 중복 제거한 카테고리 목록 + int32 코드 배열
+
+로 저장함. ``Variant`` 객체가 필요한 코드를 위해 순회/인덱싱 시에는 ``Variant``를
+그때그때 생성하여 반환함.
+"""
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from core.data_model import Variant
+
+
+class VariantTable:
+    """변이 정보의 struct-of-arrays
+
+    Args:
+        buffer (bytes): "\\n"으로 이어붙인 cpra (utf-8)
+        offsets (np.ndarray): 각 cpra의 시작 위치 (길이 N + 1)
+        gene_codes (np.ndarray): gene 카테고리 코드 (int32, 없으면 -1)
+        disease_codes (np.ndarray): disease 카테고리 코드 (int32, 없으면 -1)
+        genes (List[str]): gene 카테고리
+        diseases (List[str]): disease 카테고리
+    """
+
+    def __init__(
+        self,
+        buffer: bytes,
+        offsets: np.ndarray,
+        gene_codes: np.ndarray,
+        disease_codes: np.ndarray,
+        genes: List[str],
+        diseases: List[str],
+    ) -> None:
+        self.buffer = buffer
+        self.offsets = offsets
+        self.gene_codes = gene_codes
+        self.disease_codes = disease_codes
+        self.genes = genes
+        self.diseases = diseases
+
+    def __len__(self) -> int:
+        return len(self.gene_codes)
+
+    def cpra(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1] - 1
+        return self.buffer[start:end].decode("utf-8")
+
+    def gene_id(self, index: int) -> Optional[str]:
+        code = self.gene_codes[index]
+        return None if code < 0 else self.genes[code]
+
+    def disease_id(self, index: int) -> Optional[str]:
+        code = self.disease_codes[index]
+        return None if code < 0 else self.diseases[code]
+
+    def rows(self) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+        """(cpra, gene_id, disease_id)를 순서대로 반환"""
+        cpras = self.buffer.decode("utf-8").split("\n")
+        genes = self.genes + [None]
+        diseases = self.diseases + [None]
+        for i in range(len(self)):
+            yield cpras[i], genes[self.gene_codes[i]], diseases[self.disease_codes[i]]
+
+    def __getitem__(self, index: int) -> Variant:
+        gene_id, disease_id = self.gene_id(index), self.disease_id(index)
+        if gene_id is None:
+            return Variant(self.cpra(index), acmg_rules=list())
+        return Variant(self.cpra(index), acmg_rules=list(), gene_id=gene_id, disease_id=disease_id)
+
+    def __iter__(self) -> Iterator[Variant]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        """버퍼와 배열이 차지하는 바이트 수 (카테고리 문자열 제외)"""
+        return (
+            len(self.buffer)
+            + self.offsets.nbytes
+            + self.gene_codes.nbytes
+            + self.disease_codes.nbytes
+        )
+
+
+class VariantTableBuilder:
+    """변이를 하나씩 추가하여 ``VariantTable`` 생성"""
+
+    def __init__(self) -> None:
+        self._cpras: List[bytes] = list()
+        self._gene_codes: List[int] = list()
+        self._disease_codes: List[int] = list()
+        self._genes: Dict[str, int] = dict()
+        self._diseases: Dict[str, int] = dict()
+
+    @staticmethod
+    def _intern(categories: Dict[str, int], value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        return categories.setdefault(value, len(categories))
+
+    def add(self, cpra: str, gene_id: Optional[str] = None, disease_id: Optional[str] = None) -> None:
+        self._cpras.append(cpra.encode("utf-8"))
+        self._gene_codes.append(self._intern(self._genes, gene_id))
+        self._disease_codes.append(self._intern(self._diseases, disease_id))
+
+    def build(self) -> VariantTable:
+        lengths = np.fromiter((len(cpra) + 1 for cpra in self._cpras), dtype=np.int64, count=len(self._cpras))
+        offsets = np.zeros(len(self._cpras) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return VariantTable(
+            buffer=b"\n".join(self._cpras) + (b"\n" if self._cpras else b""),
+            offsets=offsets,
+            gene_codes=np.array(self._gene_codes, dtype=np.int32),
+            disease_codes=np.array(self._disease_codes, dtype=np.int32),
+            genes=list(self._genes),
+            diseases=list(self._diseases),
+        )
+
+
+def variant_rows(
+    variants: Union[VariantTable, List[Variant]]
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """VariantTable 또는 Variant 리스트에서 (cpra, gene_id, disease_id) 순회"""
+    if isinstance(variants, VariantTable):
+        return variants.rows()
+    return (
+        (variant.cpra, getattr(variant, "gene_id", None), getattr(variant, "disease_id", None))
+        for variant in variants
+    )
@@ -137,6 +137,13 @@ class MILRequest(BaseModel):
     snv: Dict[str, Dict[str, SNVFeature]]
     cnv: Union[Dict[str, CNVFeature], Dict]
 
+    @validator("inhouse_total_ac")
+    def check_inhouse_total_ac(cls, inhouse_total_ac):
+        # inhouse_af의 분모. 0이면 /predict는 ZeroDivisionError, /predict_stream은 inf가 됨
+        if inhouse_total_ac <= 0:
+            raise ValueError("inhouse_total_ac must be positive")
+        return inhouse_total_ac
+
     class Config:
         schema_extra = {
             "example": {
@@ -0,0 +1,83 @@
+"""재분석 시 변경되지 않은 인스턴스의 인코더 출력을 재사용하기 위한 캐시
+
+key는 (sample_id, 인스턴스 종류, 스케일링된 feature 행의 해시)이며, 값은 인코더
+출력(인스턴스 임베딩)임. 같은 행은 같은 임베딩을 내므로 변경된 행만 다시 인코딩하고
+attention pooling은 bag 전체에 대해 다시 수행하면 전체 재계산과 같은 점수가 나옴.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+
+def hash_rows(x: np.ndarray) -> List[str]:
+    """feature 행별 해시 (dtype/길이가 같을 때만 같은 값)"""
+    x = np.ascontiguousarray(x)
+    return [hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest() for row in x]
+
+
+class InstanceEmbeddingCache:
+    """샘플 단위 LRU 인스턴스 임베딩 캐시
+
+    Args:
+        max_samples (int): 캐시에 유지하는 최대 샘플 수. 초과 시 가장 오래 사용되지 않은 샘플 제거
+        model_uuid (str): 모델 아티펙트 UUID. 다른 UUID의 임베딩은 재사용하지 않음
+    """
+
+    def __init__(self, max_samples: int = 1000, model_uuid: Optional[str] = None) -> None:
+        self.max_samples = max_samples
+        self.model_uuid = model_uuid
+        self._lock = threading.Lock()
+        self._samples: "OrderedDict[str, Dict[str, torch.Tensor]]" = OrderedDict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def _sample_key(self, sample_id: str) -> str:
+        return "%s/%s" % (self.model_uuid, sample_id)
+
+    def encode(
+        self,
+        sample_id: str,
+        kind: str,
+        x: torch.Tensor,
+        encoder: Callable[[torch.Tensor], torch.Tensor],
+    ) -> Dict[str, object]:
+        """캐시에 없는 행만 encoder로 인코딩하고 전체 임베딩을 원래 순서대로 반환
+
+        Returns:
+            dict: {"embedding": (N, d) 텐서, "rows": N, "reused": 재사용한 행 수}
+        """
+        if len(x) == 0:
+            return {"embedding": encoder(x), "rows": 0, "reused": 0}
+
+        keys = ["%s:%s" % (kind, digest) for digest in hash_rows(x.detach().cpu().numpy())]
+        sample_key = self._sample_key(sample_id)
+        with self._lock:
+            cached = self._samples.get(sample_key, dict())
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        new_embeddings = dict()
+        if missing:
+            encoded = encoder(x[torch.tensor(missing, device=x.device)])
+            # 행마다 복사하여 저장: view로 두면 행 하나가 남아 있는 동안 배치 전체 텐서가 유지됨
+            new_embeddings = {keys[i]: encoded[j].clone() for j, i in enumerate(missing)}
+
+        # 이번 bag에 등장한 행만 유지하여 재분석을 거듭해도 샘플당 크기가 bag 크기를 넘지 않음
+        merged = {key: new_embeddings[key] if key in new_embeddings else cached[key] for key in keys}
+        embedding = torch.stack([merged[key] for key in keys])
+
+        with self._lock:
+            entry = self._samples.get(sample_key, dict())
+            entry = {key: value for key, value in entry.items() if not key.startswith(kind + ":")}
+            entry.update(merged)
+            self._samples[sample_key] = entry
+            self._samples.move_to_end(sample_key)
+            while len(self._samples) > self.max_samples:
+                self._samples.popitem(last=False)
+
+        return {"embedding": embedding, "rows": len(keys), "reused": len(keys) - len(missing)}
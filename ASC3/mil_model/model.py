@@ -1,28 +1,35 @@
 import os
 import sys
 import time
+import fcntl
+import pickle
+import hashlib
+import logging
 from collections import defaultdict
-from typing import Tuple, Dict, Any
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Tuple, Dict, Any, Iterator, Optional
 from logging import Logger
 
 import torch
-import mlflow
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
 from omegaconf import OmegaConf
 
+if TYPE_CHECKING:
+    from sklearn.ensemble import RandomForestClassifier
+    from ASC3.mil_model.streaming import SNVMatrixBuilder
+
 MIL_MODEL_DIR = os.path.dirname(os.path.abspath(__file__))
 ASC3_DIR = os.path.dirname(MIL_MODEL_DIR)
 ROOT_DIR = os.path.dirname(ASC3_DIR)
 CHECKPOINT_DIR = os.path.join(ROOT_DIR, "data", "checkpoint")
 sys.path.append(ROOT_DIR)
 
-from core.snv_factory import SNVFeaturizer
-from core.cnv_factory import CNVFeaturizer
 from core.data_model import PatientData, PatientDataSet, SNVData, CNVData, Variant
 from core.datasets import ExSCNVDataset
-from core.dynamodb_ops import DynamoDBClient
 from ASC3.mil_model.data_model import MILRequest, SNVFeature, CNVFeature
+from ASC3.mil_model.staged import StagedMIL, unique_rows
+from ASC3.mil_model.embedding_cache import InstanceEmbeddingCache
+from ASC3.mil_model.compact import VariantTableBuilder, variant_rows
 
 from core.networks import MultimodalAttentionMIL
 
@@ -30,6 +37,60 @@ from utils.log_ops import get_logger
 from mlflow_settings import TRACKING_URI
 
 
+@contextmanager
+def checkpoint_lock(shared: bool = False) -> Iterator[None]:
+    """CHECKPOINT_DIR 파일 잠금
+
+    uvicorn 워커들이 같은 CHECKPOINT_DIR를 공유하므로 다운로드(기존 파일 삭제 후 재다운로드)는
+    배타적으로, 로딩은 공유 잠금으로 수행하여 다른 워커가 다운로드 중인 파일을 읽지 않게 함.
+
+    Args:
+        shared (bool): True이면 공유 잠금(로딩), False이면 배타 잠금(다운로드)
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    with open(os.path.join(CHECKPOINT_DIR, ".lock"), "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def artifact_stamp(*paths: str) -> str:
+    """로딩한 아티펙트 파일들의 mtime으로 만든 식별자
+
+    UUID가 같아도 파일이 교체되면 값이 바뀌고, 같은 파일을 로딩한 워커들은 같은 값을 가짐.
+    """
+    mtimes = list()
+    for path in paths:
+        try:
+            mtimes.append(str(os.stat(path).st_mtime_ns))
+        except OSError:
+            mtimes.append("-")
+    return hashlib.blake2b(",".join(mtimes).encode(), digest_size=6).hexdigest()
+
+
+def load_sklearn_artifact(model_dir: str) -> Any:
+    """mlflow sklearn flavor로 저장된 디렉토리에서 모델을 로딩
+
+    pickle/cloudpickle로 저장된 모델은 mlflow를 import하지 않고 직접 읽음.
+
+    Raises:
+        OSError: MLmodel 또는 모델 파일이 없는 경우
+        KeyError: MLmodel에 sklearn flavor 정보가 없는 경우
+        mlflow.exceptions.MlflowException: mlflow.sklearn fallback이 실패한 경우
+    """
+    metadata = OmegaConf.load(os.path.join(model_dir, "MLmodel"))
+    flavor = metadata["flavors"]["sklearn"]
+    if flavor.get("serialization_format", "cloudpickle") in ("pickle", "cloudpickle"):
+        with open(os.path.join(model_dir, flavor["pickled_model"]), "rb") as fh:
+            return pickle.load(fh)
+
+    import mlflow.sklearn
+
+    return mlflow.sklearn.load_model(model_dir)
+
+
 class MILPredictor:
     """Variant Recommendation sys with Multiple Instance Learning
 
@@ -63,27 +124,49 @@ class MILPredictor:
     """
 
     def __init__(
-        self, config: dict, device: str = "cpu", logger: Logger = Logger(__name__)
+        self,
+        config: dict,
+        device: str = "cpu",
+        logger: Logger = Logger(__name__),
+        load_model: bool = True,
     ) -> None:
         """클래스 생성자
 
         Args:
             config (dict): 설정 정보가 담긴 딕셔너리
             logger (Logger): 로깅을 위한 Logger 인스턴스
+            load_model (bool): False이면 모델을 로딩하지 않음 (피처라이징 전용 워커 등)
         """
         self.config = config
         self.logger = logger
         self.device = device
         self.trials = 0
-        self._set_model()
+        if load_model:
+            self._set_model()
         self.feature_name = (
             self.config["MIL_MODEL"]["BASE_FEATURE"]
             + self.config["MIL_MODEL"]["ADDITIONAL_FEATURES"]
             + self.config["MIL_MODEL"]["RULES"]
         )
 
+    @property
+    def artifact_id(self) -> str:
+        """추론 결과에 영향을 주는 모델 아티펙트 식별자 (결과 캐시 key 등에 사용)
+
+        UUID가 같은 채로 체크포인트 파일만 교체(hot swap)되어도 바뀌도록 로딩한 파일의 mtime을 포함함.
+        """
+        return "%s:%s:%s" % (
+            type(self).__name__,
+            self.config["MIL_MODEL"]["UUID"],
+            getattr(self, "mil_stamp", ""),
+        )
+
     def _set_featurizer(self) -> None:
         """피처라이저 설정"""
+        # 파일 기반 피처라이징(/predict_from_file, 오프라인 스코어링)에서만 필요하므로 이때 import
+        from core.snv_factory import SNVFeaturizer
+        from core.cnv_factory import CNVFeaturizer
+        from core.dynamodb_ops import DynamoDBClient
 
         self.logger.info("Load dynamodb client.")
         self.dynamodb_client = DynamoDBClient(
@@ -136,6 +219,22 @@ class MILPredictor:
             >>> mil_config = {"ARTIFACT_ROOT":..., }
             >>> MILPredictor.download_artifact(mil_config)
         """
+        with checkpoint_lock():
+            # 잠금을 기다리는 동안 다른 워커가 같은 아티펙트를 받았으면 다시 받지 않음
+            if (
+                self._check_same_artifact_uuid()
+                and os.path.exists(os.path.join(CHECKPOINT_DIR, model_config["CHECKPOINT"]))
+                and os.path.exists(os.path.join(CHECKPOINT_DIR, model_config["SCALER"]))
+            ):
+                self.logger.info("Artifact already downloaded by another worker")
+                return
+
+            self._download_artifact(model_config)
+
+    def _download_artifact(self, model_config: Dict[str, Any]) -> None:
+        """메타데이터, 체크포인트, 스케일러를 지우고 다시 다운로드 (checkpoint_lock 안에서 호출)"""
+        import mlflow
+
         mlflow.set_tracking_uri(TRACKING_URI)
         log_if_exist = (
             lambda msg: self.logger.info(msg) if hasattr(self, "logger") else print(msg)
@@ -191,6 +290,8 @@ class MILPredictor:
             raise FileNotFoundError("checkpoint and scaler not found")
 
         if not self._check_same_artifact_uuid():
+            import mlflow
+
             try:
                 self.download_artifact(mil_config)
                 self._set_model()
@@ -199,16 +300,46 @@ class MILPredictor:
                 self._set_model()
 
         if os.path.exists(local_checkpoint_path) and os.path.exists(local_scaler_path):
-            self.model: MultimodalAttentionMIL = torch.load(
-                os.path.join(CHECKPOINT_DIR, mil_config["CHECKPOINT"]),
-                map_location=self.device,
-            )
-            self.scalers = torch.load(
-                os.path.join(CHECKPOINT_DIR, mil_config["SCALER"]),
-                map_location=self.device,
-            )["scaler"]
+            with checkpoint_lock(shared=True):
+                self.model: MultimodalAttentionMIL = torch.load(
+                    os.path.join(CHECKPOINT_DIR, mil_config["CHECKPOINT"]),
+                    map_location=self.device,
+                )
+                self.scalers = torch.load(
+                    os.path.join(CHECKPOINT_DIR, mil_config["SCALER"]),
+                    map_location=self.device,
+                )["scaler"]
+                self.mil_stamp = artifact_stamp(local_checkpoint_path, local_scaler_path)
             # TODO load calibration model
             # self.calibration_model = ...
+            self.staged = StagedMIL(self.model, mil_config.get("STAGES"))
+            self.staged.verify(
+                n_snv_features=len(
+                    mil_config["BASE_FEATURE"]
+                    + mil_config["ADDITIONAL_FEATURES"]
+                    + mil_config["RULES"]
+                ),
+                n_cnv_features=3,
+                logger=self.logger,
+            )
+            cache_config = mil_config.get("EMBEDDING_CACHE", dict())
+            self.embedding_cache = None
+            if cache_config.get("ENABLED", False) and self.staged.verified:
+                self.embedding_cache = InstanceEmbeddingCache(
+                    max_samples=cache_config.get("MAX_SAMPLES", 1000),
+                    model_uuid=mil_config["UUID"],
+                )
+            # 청크 단위 forward: CHUNK_SIZE(행 수)가 없으면 MEMORY_MB(activation 상한)로부터 계산
+            chunk_config = mil_config.get("CHUNKED_FORWARD", dict())
+            self.chunk_size = 0
+            if chunk_config.get("ENABLED", False) and self.staged.chunk_verified:
+                self.chunk_size = chunk_config.get("CHUNK_SIZE", 0) or self.staged.chunk_size(
+                    chunk_config.get("MEMORY_MB", 256)
+                )
+                self.logger.info(
+                    "Chunked MIL forward: %s instances per chunk (%s bytes of activations per instance)"
+                    % (self.chunk_size, self.staged.activation_bytes)
+                )
             self.logger.info("Set models and scaler as attribute")
             return
 
@@ -272,6 +403,9 @@ class MILPredictor:
         """
 
         self.logger.info("Make SNVData from snv_qeury data")
+        if self.config["MIL_MODEL"].get("COMPACT_VARIANTS", False):
+            return self._make_compact_snv_data(snv_query_data, inhouse_total_ac)
+
         variants = list()
         vectors = list()
         for gene_disease, snv_feature in snv_query_data.items():
@@ -296,6 +430,42 @@ class MILPredictor:
             x=np.vstack(vectors), variants=variants, header=self.feature_name
         )
 
+    def _make_compact_snv_data(
+        self, snv_query_data: Dict[str, Dict[str, SNVFeature]], inhouse_total_ac: int
+    ) -> SNVData:
+        """make_snv_data와 같은 SNVData를 float32 행렬과 VariantTable로 생성
+
+        행 벡터를 모아 vstack하지 않고 미리 할당한 float32 행렬에 바로 채움.
+        ``MIL_MODEL.COMPACT_VARIANTS``가 true일 때만 사용 (기본값 false). VariantTable은 정수
+        인덱싱/순회만 지원하고 x가 float32이므로 core(ExSCNVDataset, scaler)와 검증한 뒤 켤 것.
+        """
+        n_rows = sum(len(snv_feature) for snv_feature in snv_query_data.values())
+        x = None
+        builder = VariantTableBuilder()
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+
+        row = 0
+        for gene_disease, snv_feature in snv_query_data.items():
+            gene_id, disease_id = gene_disease.split("-", maxsplit=1)
+            for cpra, features in snv_feature.items():
+                vector = features.to_vector(inhouse_total_ac)
+                if debug:
+                    self.logger.debug(
+                        "CPRA(%s) with feature (%s)"
+                        % (cpra, ",".join(map(lambda x: str(x), vector.tolist())))
+                    )
+                if x is None:
+                    x = np.empty((n_rows, len(vector)), dtype=np.float32)
+
+                x[row] = vector
+                builder.add(cpra, gene_id, disease_id)
+                row += 1
+
+        if x is None:
+            x = np.zeros((0, len(self.feature_name)), dtype=np.float32)
+
+        return SNVData(x=x, variants=builder.build(), header=self.feature_name)
+
     def make_cnv_data(self, cnv_query_data: Dict[str, CNVFeature]) -> CNVData:
         """클라이언트가 쿼리한 CNV 데이터를 사용하여 CNVData 객체를 생성
 
@@ -306,6 +476,14 @@ class MILPredictor:
             CNVData: 생성된 CNVData 객체.
 
         """
+        if self.config["MIL_MODEL"].get("COMPACT_VARIANTS", False):
+            builder = VariantTableBuilder()
+            x = np.zeros((len(cnv_query_data), 3), dtype=np.float32)
+            for row, (region, cnv_feature) in enumerate(cnv_query_data.items()):
+                x[row] = list(cnv_feature.dict().values())
+                builder.add(region)
+            return CNVData(x=x, variants=builder.build())
+
         variant = list()
         vectors = list()
         for region, cnv_feature in cnv_query_data.items():
@@ -337,6 +515,32 @@ class MILPredictor:
 
         return patient_data
 
+    def convert_stream_to_patient_data(
+        self, fields: Dict[str, Any], snv_builder: "SNVMatrixBuilder"
+    ) -> PatientData:
+        """/predict_stream에서 파싱한 최상위 필드와 누적한 SNV 행렬로 PatientData를 생성
+
+        Args:
+            fields (Dict[str, Any]): snv를 제외한 요청 필드 (sample_id, inhouse_total_ac, cnv)
+            snv_builder (SNVMatrixBuilder): gene-disease 그룹 단위로 채운 SNV 행렬
+
+        Returns:
+            PatientData: 예측할 PatientData
+
+        Raises:
+            pydantic.ValidationError: snv 이외의 필드가 MILRequest 스펙과 다른 경우
+        """
+        request = MILRequest(**dict(fields, snv=dict()))
+        snv_data = snv_builder.build(request.inhouse_total_ac, self.feature_name)
+        cnv_data = self.make_cnv_data(request.cnv)
+
+        return PatientData(
+            sample_id=request.sample_id,
+            bag_label=False,
+            snv_data=snv_data,
+            cnv_data=cnv_data,
+        )
+
     def truncate_prob(
         self, prob: float, t1: float = 0.001, t2: float = 0.0001
     ) -> float:
@@ -387,9 +591,10 @@ class MILPredictor:
 
         snv_res = defaultdict(dict)
         n_snv = len(patient_data.snv_data.variants)
-        for prob, variant in zip(instance_prob, patient_data.snv_data.variants):
-            key = variant.gene_id + "-" + variant.disease_id
-            snv_res[key][variant.cpra] = self.truncate_prob(prob.item())
+        snv_rows = variant_rows(patient_data.snv_data.variants)
+        for prob, (cpra, gene_id, disease_id) in zip(instance_prob, snv_rows):
+            key = gene_id + "-" + disease_id
+            snv_res[key][cpra] = self.truncate_prob(prob.item())
 
         for key, value in snv_res.items():
             snv_res[key] = dict(sorted(value.items(), key=lambda x: x[1], reverse=True))
@@ -399,43 +604,222 @@ class MILPredictor:
         )
 
         cnv_res = dict()
-        for prob, variant in zip(instance_prob[n_snv:], patient_data.cnv_data.variants):
-            cnv_res[variant.cpra] = self.truncate_prob(prob.item())
+        cnv_rows = variant_rows(patient_data.cnv_data.variants)
+        for prob, (cpra, _, _) in zip(instance_prob[n_snv:], cnv_rows):
+            cnv_res[cpra] = self.truncate_prob(prob.item())
 
         return {
             "snv": snv_res,
             "cnv": cnv_res,
         }
 
-    def predict(self, patient_data: PatientData) -> Tuple[float, dict]:
+    def _build_dataset(self, patient_data: PatientData) -> ExSCNVDataset:
+        return ExSCNVDataset(
+            PatientDataSet([patient_data]),
+            base_features=self.config["MIL_MODEL"]["BASE_FEATURE"],
+            additional_features=(
+                self.config["MIL_MODEL"]["ADDITIONAL_FEATURES"]
+                + self.config["MIL_MODEL"]["RULES"]
+            ),
+            scalers=self.scalers,
+            device=self.device,
+        )
+
+    def _log_dedup(self, name: str, n_total: int, n_unique: int) -> Dict[str, float]:
+        """중복 제거 비율 기록"""
+        ratio = 1 - n_unique / n_total if n_total else 0.0
+        self.logger.info(
+            "%s dedup: %s instances -> %s unique (%.1f%% removed)"
+            % (name, n_total, n_unique, ratio * 100)
+        )
+        return {"instances": n_total, "unique": n_unique, "ratio": ratio}
+
+    def _log_reuse(self, n_rows: int, n_reused: int) -> Dict[str, float]:
+        """임베딩 캐시 재사용 비율 기록"""
+        ratio = n_reused / n_rows if n_rows else 0.0
+        self.logger.info(
+            "Embedding cache: reused %s/%s instances (%.1f%%)" % (n_reused, n_rows, ratio * 100)
+        )
+        return {"rows": n_rows, "reused": n_reused, "ratio": ratio}
+
+    def _encode(
+        self, x: torch.Tensor, kind: str, sample_id: Optional[str]
+    ) -> Tuple[torch.Tensor, int]:
+        """인스턴스 인코딩. 임베딩 캐시가 켜져 있으면 변경된 행만 인코딩
+
+        Returns:
+            Tuple[torch.Tensor, int]: (인스턴스 임베딩, 캐시에서 재사용한 행 수)
         """
-        환자 데이터를 기반으로 변이 예측을 수행하고 결과를 반환
+        chunk_size = getattr(self, "chunk_size", 0)
+        if chunk_size:
+            encoder = lambda rows: self.staged.encode_chunked(rows, kind, chunk_size)
+        else:
+            encoder = lambda rows: self.staged.encode(rows, kind)
+        embedding_cache: InstanceEmbeddingCache = getattr(self, "embedding_cache", None)
+        if embedding_cache is None or sample_id is None:
+            return encoder(x), 0
+
+        result = embedding_cache.encode(sample_id, kind, x, encoder)
+        return result["embedding"], result["reused"]
+
+    def _forward(
+        self,
+        snv_x: torch.Tensor,
+        cnv_x: torch.Tensor,
+        sample_id: Optional[str] = None,
+        snv_mask: Optional[np.ndarray] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor, Dict[str, dict]]:
+        """MIL 모델 추론
+
+        feature가 완전히 같은 SNV 인스턴스는 인코더/instance classifier에서 한 번만
+        계산하고, attention pooling에는 등장 횟수만큼 가중치를 주어 전체 bag과 같은 결과를 냄.
+        임베딩 캐시가 켜져 있으면 이전 분석과 같은 행의 인코더 출력을 재사용하고
+        attention pooling만 bag 전체에 대해 다시 수행함.
+        청크 단위 forward가 켜져 있으면 chunk_size 행씩 인코딩하고 attention pooling은
+        bag 전체에 대해 online softmax로 누적하여, 중간 activation 메모리를 청크 크기로 제한함.
+        snv_mask가 주어지면 False인 SNV는 instance classifier를 건너뛰고 logit을 -inf로 둠
+        (attention pooling에는 그대로 포함).
+        단계별 실행이 검증되지 않은 모델은 전체 bag으로 forward.
+
+        predictor는 요청 간에 공유되므로 요청별 통계는 속성이 아니라 반환값으로 넘김.
+
+        Returns:
+            Tuple: (bag logit, instance logit, 수행한 항목의 {"dedup": 중복 제거 통계, "reuse": 재사용 통계})
+        """
+        stats = dict()
+        staged: StagedMIL = getattr(self, "staged", None)
+        use_dedup = self.config["MIL_MODEL"].get("DEDUP", True)
+        use_cache = getattr(self, "embedding_cache", None) is not None
+        chunk_size = getattr(self, "chunk_size", 0)
+        use_chunks = 0 < chunk_size < len(snv_x) + len(cnv_x)
+        use_mask = snv_mask is not None
+        if staged is None or not staged.verified or not (use_dedup or use_cache or use_chunks or use_mask):
+            bag_logit, instance_logit = self.model((snv_x, cnv_x))
+            return bag_logit, instance_logit, stats
+
+        counts = None
+        unique_snv_x = snv_x
+        if use_dedup:
+            first_index, inverse, counts = unique_rows(snv_x.cpu().numpy())
+            stats["dedup"] = self._log_dedup("MIL", len(inverse), len(first_index))
+            unique_snv_x = snv_x[torch.from_numpy(first_index)]
+            counts = torch.from_numpy(counts)
+
+        instance_mask = None
+        if use_mask:
+            unique_mask = snv_mask
+            if use_dedup:
+                unique_mask = np.zeros(len(first_index), dtype=bool)
+                unique_mask[inverse[snv_mask]] = True
+            instance_mask = torch.from_numpy(
+                np.concatenate([unique_mask, np.ones(len(cnv_x), dtype=bool)])
+            ).to(snv_x.device)
+
+        if use_cache and sample_id is not None:
+            # 캐시는 행별 임베딩이 필요하므로 인코딩만 청크 단위로 수행
+            h_snv, snv_reused = self._encode(unique_snv_x, "snv", sample_id)
+            h_cnv, cnv_reused = self._encode(cnv_x, "cnv", sample_id)
+            stats["reuse"] = self._log_reuse(len(unique_snv_x) + len(cnv_x), snv_reused + cnv_reused)
+            bag_logit, instance_logit = staged.from_embeddings(
+                h_snv, h_cnv, snv_counts=counts, instance_mask=instance_mask
+            )
+        elif use_chunks:
+            bag_logit, instance_logit = staged.forward_chunked(
+                unique_snv_x, cnv_x, chunk_size, snv_counts=counts, instance_mask=instance_mask
+            )
+        else:
+            h_snv, _ = self._encode(unique_snv_x, "snv", sample_id)
+            h_cnv, _ = self._encode(cnv_x, "cnv", sample_id)
+            bag_logit, instance_logit = staged.from_embeddings(
+                h_snv, h_cnv, snv_counts=counts, instance_mask=instance_mask
+            )
+        if not use_dedup:
+            return bag_logit, instance_logit, stats
+
+        n_unique = len(unique_snv_x)
+        instance_logit = torch.cat(
+            [instance_logit[:n_unique][torch.from_numpy(inverse)], instance_logit[n_unique:]]
+        )
+        return bag_logit, instance_logit, stats
+
+    def make_synthetic_data(self, n_snv: int, n_cnv: int = 2, seed: int = 0) -> PatientData:
+        """예측 경로(스케일링, 추론, 후처리)를 그대로 거치는 임의의 PatientData 생성
+
+        Args:
+            n_snv (int): SNV 인스턴스 수
+            n_cnv (int): CNV 인스턴스 수
+            seed (int): 난수 시드
+
+        Returns:
+            PatientData: 임의의 feature를 갖는 환자 데이터
+        """
+        rng = np.random.default_rng(seed)
+        snv_variants = VariantTableBuilder()
+        for i in range(n_snv):
+            snv_variants.add("1-%s-A-G" % (i + 1), gene_id=str(i), disease_id="OMIM:000000")
+        cnv_variants = VariantTableBuilder()
+        for i in range(n_cnv):
+            cnv_variants.add("1:%s-%s" % (i + 1, i + 2))
+
+        snv_data = SNVData(
+            x=rng.random((n_snv, len(self.feature_name)), dtype=np.float32),
+            variants=snv_variants.build(),
+            header=self.feature_name,
+        )
+        cnv_data = CNVData(x=rng.random((n_cnv, 3), dtype=np.float32), variants=cnv_variants.build())
+        return PatientData(
+            sample_id="__warmup__", bag_label=False, snv_data=snv_data, cnv_data=cnv_data
+        )
+
+    def warmup(self, bag_sizes: Tuple[int, ...] = (16,)) -> float:
+        """임의의 bag으로 predict를 실행하여 첫 요청의 지연(torch 초기화 등)을 미리 소모
+
+        Args:
+            bag_sizes (Tuple[int, ...]): 실행할 bag의 SNV 인스턴스 수
+
+        Returns:
+            float: 소요 시간(초)
+        """
+        start = time.perf_counter()
+        for n_snv in bag_sizes:
+            self.predict(self.make_synthetic_data(n_snv))
+        elapsed = time.perf_counter() - start
+        self.logger.info("Warm-up with bag sizes %s took %.3fs" % (list(bag_sizes), elapsed))
+        return elapsed
+
+    # predict_models로 선택할 수 있는 모델. 첫 번째가 predict의 기본 모델
+    MODELS: Tuple[str, ...] = ("mil",)
+
+    def _infer(
+        self, patient_data: PatientData, snv_mask: Optional[np.ndarray] = None
+    ) -> Tuple[float, np.ndarray, bool, Dict[str, dict]]:
+        """MIL 모델로 bag 확률과 인스턴스(SNV, CNV 순) 확률 계산
 
         Args:
             patient_data (PatientData): 환자 데이터 객체
+            snv_mask (np.ndarray, optional): instance 확률을 계산할 SNV (False인 SNV는 0)
 
         Returns:
-            Tuple[bool, dict]: 변이 예측 결과와 변이별 점수가 포함된 튜플
+            Tuple[float, np.ndarray, bool, Dict[str, dict]]: (bag 확률, 인스턴스 확률,
+                CNV가 비어있었는지 여부, 추론 통계(``_forward``))
         """
         is_empty_cnv = False
         if len(patient_data.cnv_data.x) == 0:
             is_empty_cnv = True
             patient_data.cnv_data.x = np.zeros((1, 3), dtype=np.float32)
 
-        dataset = ExSCNVDataset(
-            PatientDataSet([patient_data]),
-            base_features=self.config["MIL_MODEL"]["BASE_FEATURE"],
-            additional_features=(
-                self.config["MIL_MODEL"]["ADDITIONAL_FEATURES"]
-                + self.config["MIL_MODEL"]["RULES"]
-            ),
-            scalers=self.scalers,
-            device=self.device,
-        )
+        # float32 연속 배열이면 데이터셋의 텐서 변환(torch.from_numpy)이 복사 없이 메모리를 공유
+        for data in (patient_data.snv_data, patient_data.cnv_data):
+            if data.x.dtype == np.float32:
+                data.x = np.ascontiguousarray(data.x)
+
+        dataset = self._build_dataset(patient_data)
 
         with torch.no_grad():
             (snv_x, cnv_x), _, _ = dataset[0]
-            bag_logit, instance_logit = self.model((snv_x, cnv_x))
+            bag_logit, instance_logit, stats = self._forward(
+                snv_x, cnv_x, sample_id=patient_data.sample_id, snv_mask=snv_mask
+            )
             bag_logit = bag_logit.cpu()
             instance_logit = instance_logit.cpu()
 
@@ -446,104 +830,239 @@ class MILPredictor:
         # instance_prob = self.calibration_model.predict_proba(instance_prob)[:, 1]
         # instance_prob[instance_prob < 0.001 & instance_prob > 0.0001)] = 0.001
 
+        return bag_prob, instance_prob, is_empty_cnv, stats
+
+    def _to_variant_score(
+        self, instance_prob: np.ndarray, patient_data: PatientData, is_empty_cnv: bool
+    ) -> Dict[str, Dict[str, float]]:
         variant2score = self.post_process(instance_prob, patient_data)
 
         if is_empty_cnv:
             variant2score["cnv"] = dict()
 
-        return bag_prob, variant2score
+        return variant2score
+
+    def predict_models(
+        self,
+        patient_data: PatientData,
+        models: Tuple[str, ...],
+        stats: Optional[Dict[str, dict]] = None,
+    ) -> Dict[str, Tuple[Optional[float], dict]]:
+        """같은 PatientData로 여러 모델의 결과를 한 번의 추론으로 계산
+
+        Args:
+            patient_data (PatientData): 환자 데이터 객체
+            models (Tuple[str, ...]): self.MODELS 중 계산할 모델
+            stats (Dict[str, dict], optional): 주어지면 이 요청의 추론 통계(``_forward``)를 채움
+
+        Returns:
+            Dict[str, Tuple[Optional[float], dict]]: 모델명 -> (bag 확률, 변이별 점수)
+        """
+        unknown = set(models) - set(self.MODELS)
+        if unknown:
+            raise ValueError("Unsupported model %s, expected one of %s" % (sorted(unknown), self.MODELS))
+
+        bag_prob, instance_prob, is_empty_cnv, infer_stats = self._infer(patient_data)
+        if stats is not None:
+            stats.update(infer_stats)
+        return {"mil": (bag_prob, self._to_variant_score(instance_prob, patient_data, is_empty_cnv))}
+
+    def predict(self, patient_data: PatientData) -> Tuple[float, dict]:
+        """
+        환자 데이터를 기반으로 변이 예측을 수행하고 결과를 반환
+
+        Args:
+            patient_data (PatientData): 환자 데이터 객체
+
+        Returns:
+            Tuple[bool, dict]: 변이 예측 결과와 변이별 점수가 포함된 튜플
+        """
+        return self.predict_models(patient_data, self.MODELS[:1])[self.MODELS[0]]
 
 
 class EnsembleMILPredictor(MILPredictor):
     """SNV에 대해서는 앙상블추론하는 추론용객체"""
 
     def __init__(
-        self, config: dict, device: str = "cpu", logger: Logger = Logger(__name__)
+        self,
+        config: dict,
+        device: str = "cpu",
+        logger: Logger = Logger(__name__),
+        load_model: bool = True,
     ) -> None:
         self.config = config
         self.logger = logger
         self.device = device
         self.trials = 0
-        self._set_model()
-        self._set_tree_model()
+        if load_model:
+            self._set_model()
+            self._set_tree_model()
         self.feature_name = (
             self.config["MIL_MODEL"]["BASE_FEATURE"]
             + self.config["MIL_MODEL"]["ADDITIONAL_FEATURES"]
             + self.config["MIL_MODEL"]["RULES"]
         )
 
+    @property
+    def artifact_id(self) -> str:
+        return "%s:%s:%s:%s:%s" % (
+            type(self).__name__,
+            self.config["MIL_MODEL"]["UUID"],
+            self.config["MODEL"]["ARTIFACT_ROOT"],
+            getattr(self, "mil_stamp", ""),
+            getattr(self, "tree_stamp", ""),
+        )
+
     def _set_tree_model(self):
         self.logger.info(
             "Load random forest from: %s" % self.config["MODEL"]["ARTIFACT_ROOT"]
         )
         if self.trials >= 3:
+            import mlflow
+
             raise mlflow.exceptions.MlflowException(
                 "Random Forest download fail from MODEL.ARTIFACT_ROOT"
             )
 
         try:
-            self.tree_model: RandomForestClassifier = mlflow.sklearn.load_model(
-                os.path.join(CHECKPOINT_DIR, "rf_model")
+            with checkpoint_lock(shared=True):
+                self.tree_model: "RandomForestClassifier" = load_sklearn_artifact(
+                    os.path.join(CHECKPOINT_DIR, "rf_model")
+                )
+                self.tree_stamp = artifact_stamp(os.path.join(CHECKPOINT_DIR, "rf_model", "MLmodel"))
+
+        except Exception as e:
+            # mlflow는 다시 받아야 하는 경우에만 import (mlflow.sklearn fallback의 예외 포함)
+            import mlflow
+
+            redownload = (
+                OSError,
+                EOFError,
+                KeyError,
+                pickle.UnpicklingError,
+                mlflow.exceptions.MlflowException,
             )
+            if not isinstance(e, redownload):
+                raise
 
-        except (mlflow.exceptions.MlflowException, OSError) as e:
+            self.logger.info("Random forest not loadable (%s), download again" % e)
             mlflow.set_tracking_uri(TRACKING_URI)
-            mlflow.artifacts.download_artifacts(
-                self.config["MODEL"]["ARTIFACT_ROOT"], dst_path=CHECKPOINT_DIR
-            )
+            with checkpoint_lock():
+                mlflow.artifacts.download_artifacts(
+                    self.config["MODEL"]["ARTIFACT_ROOT"], dst_path=CHECKPOINT_DIR
+                )
             self._set_tree_model()
 
         return
 
-    def predict(self, patient_data: PatientData) -> Tuple[bool, dict]:
-        """
-        환자 데이터를 기반으로 변이 예측을 수행하고 결과를 반환
+    def _predict_tree(self, tree_x: np.ndarray) -> np.ndarray:
+        """랜덤포레스트 SNV 확률. 같은 feature 행은 한 번만 계산하여 원래 순서로 되돌림"""
+        if not self.config["MIL_MODEL"].get("DEDUP", True):
+            return self.tree_model.predict_proba(tree_x)[:, -1].ravel()
 
-        Args:
-            patient_data (PatientData): 환자 데이터 객체
+        first_index, inverse, _ = unique_rows(tree_x)
+        self._log_dedup("RF", len(inverse), len(first_index))
+        unique_prob = self.tree_model.predict_proba(tree_x[first_index])[:, -1].ravel()
+        return unique_prob[inverse]
+
+    def _cascade_mask(self, tree_snv_prob: np.ndarray) -> Tuple[np.ndarray, Dict[str, int]]:
+        """RF-first cascade: MIL instance classifier를 돌릴 SNV 후보
+
+        랜덤포레스트 확률 상위 ``MIL_MODEL.CASCADE.TOP_N``개와 THRESHOLD 이상인 SNV를
+        후보로 선택함 (TOP_N이 0이면 THRESHOLD만 사용). 후보가 아닌 SNV의 MIL 확률은 0으로 두므로
+        ensemble 점수는 2/3 * rf가 됨 (대부분 truncate_prob에서 0으로 잘리는 변이).
 
         Returns:
-            Tuple[bool, dict]: 변이 예측 결과와 변이별 점수가 포함된 튜플
+            Tuple[np.ndarray, Dict[str, int]]: (후보 SNV bool mask, {"instances": SNV 수, "candidates": 후보 수})
         """
-        is_empty_cnv = False
-        if len(patient_data.cnv_data.x) == 0:
-            is_empty_cnv = True
-            patient_data.cnv_data.x = np.zeros((1, 3), dtype=np.float32)
+        cascade_config = self.config["MIL_MODEL"].get("CASCADE", dict())
+        top_n = cascade_config.get("TOP_N", 100)
+        threshold = cascade_config.get("THRESHOLD", 0.01)
+        mask = tree_snv_prob >= threshold
+        if top_n >= len(tree_snv_prob):
+            mask[:] = True
+        elif top_n > 0:
+            mask[np.argpartition(-tree_snv_prob, top_n - 1)[:top_n]] = True
+
+        n_candidates = int(mask.sum())
+        self.logger.info("RF cascade: %s/%s SNV candidates for MIL" % (n_candidates, len(mask)))
+        return mask, {"instances": len(mask), "candidates": n_candidates}
+
+    # rf는 ensemble에 섞이는 MODEL.ARTIFACT_ROOT의 랜덤포레스트로, tree 모델(Classifier)과는 다름.
+    # Classifier 점수는 MODEL_NAME=all일 때 /tree 경로의 API로 제공됨
+    MODELS: Tuple[str, ...] = ("ensemble", "mil", "rf")
+
+    def predict_models(
+        self,
+        patient_data: PatientData,
+        models: Tuple[str, ...],
+        stats: Optional[Dict[str, dict]] = None,
+    ) -> Dict[str, Tuple[Optional[float], dict]]:
+        """MIL 추론과 랜덤포레스트 추론을 한 번씩만 하여 요청한 모델의 결과를 계산
+
+        - mil: MIL 인스턴스 확률
+        - rf: 랜덤포레스트 SNV 확률 (bag 확률 없음, CNV 점수 없음)
+        - ensemble: SNV는 2/3 * rf + 1/3 * mil, CNV는 mil
+
+        RF-first cascade(``_cascade_mask``)가 켜져 있으면 ensemble의 MIL instance 확률은 랜덤포레스트
+        후보 SNV에 대해서만 계산함. bag 확률은 전체 bag으로 계산. mil 결과는 후보가 아닌 SNV를
+        0으로 만들면 안 되므로, mil을 함께 요청하면 cascade 없이 한 번만 추론함.
+        단계별 실행이 검증되지 않은 모델도 cascade 없이 추론함.
 
-        dataset = ExSCNVDataset(
-            PatientDataSet([patient_data]),
-            base_features=self.config["MIL_MODEL"]["BASE_FEATURE"],
-            additional_features=(
-                self.config["MIL_MODEL"]["ADDITIONAL_FEATURES"]
-                + self.config["MIL_MODEL"]["RULES"]
-            ),
-            scalers=self.scalers,
-            device=self.device,
+        Args:
+            patient_data (PatientData): 환자 데이터 객체
+            models (Tuple[str, ...]): self.MODELS 중 계산할 모델
+            stats (Dict[str, dict], optional): 주어지면 이 요청의 추론 통계(``_forward``)와
+                cascade를 적용한 경우 {"cascade": {"instances", "candidates"}}를 채움.
+                predictor는 요청 간에 공유되므로 속성이 아니라 요청별 dict로 넘김
+        """
+        unknown = set(models) - set(self.MODELS)
+        if unknown:
+            raise ValueError("Unsupported model %s, expected one of %s" % (sorted(unknown), self.MODELS))
+
+        results = dict()
+        n_snv = len(patient_data.snv_data.x)
+        stats = stats if stats is not None else dict()
+        use_cascade = (
+            self.config["MIL_MODEL"].get("CASCADE", dict()).get("ENABLED", False)
+            and "ensemble" in models
+            and "mil" not in models
         )
-
-        with torch.no_grad():
-            (snv_x, cnv_x), _, _ = dataset[0]
-            bag_logit, instance_logit = self.model((snv_x, cnv_x))
-            bag_logit = bag_logit.cpu()
-            instance_logit = instance_logit.cpu()
-
-        bag_prob = torch.sigmoid(bag_logit).item()
-        instance_prob = torch.sigmoid(instance_logit).numpy()
-
-        mil_snv_prob = instance_prob[: len(snv_x)]
-        tree_snv_prob = self.tree_model.predict_proba(patient_data.snv_data.x[:, :6])[
-            :, -1
-        ].ravel()
-        ensemble_snv_prob = (2 / 3 * tree_snv_prob) + (1 / 3 * mil_snv_prob)
-        instance_prob[: len(snv_x)] = ensemble_snv_prob
-
-        # TODO
-        # instance_prob = self.calibration_model.predict_proba(instance_prob)[:, 1]
-        # instance_prob[instance_prob < 0.001 & instance_prob > 0.0001)] = 0.001
-
-        variant2score = self.post_process(instance_prob, patient_data)
-
-        if is_empty_cnv:
+        staged: StagedMIL = getattr(self, "staged", None)
+        if use_cascade and (staged is None or not staged.verified):
+            # mask는 단계별 실행에서만 적용되므로 전체 forward로 추론하면 cascade 없이 계산됨
+            self.logger.warning("RF cascade disabled: staged MIL forward is not available")
+            use_cascade = False
+        tree_snv_prob = None
+        if "rf" in models or "ensemble" in models:
+            tree_snv_prob = self._predict_tree(patient_data.snv_data.x[:, :6])
+
+        if "rf" in models:
+            variant2score = self.post_process(tree_snv_prob, patient_data)
             variant2score["cnv"] = dict()
+            results["rf"] = (None, variant2score)
+
+        if "mil" not in models and "ensemble" not in models:
+            return results
+
+        snv_mask = None
+        if use_cascade:
+            snv_mask, stats["cascade"] = self._cascade_mask(tree_snv_prob)
+        bag_prob, instance_prob, is_empty_cnv, infer_stats = self._infer(patient_data, snv_mask=snv_mask)
+        stats.update(infer_stats)
+        if "mil" in models:
+            results["mil"] = (
+                bag_prob,
+                self._to_variant_score(instance_prob, patient_data, is_empty_cnv),
+            )
+
+        if "ensemble" in models:
+            ensemble_prob = instance_prob.copy()
+            mil_snv_prob = instance_prob[:n_snv]
+            ensemble_prob[:n_snv] = (2 / 3 * tree_snv_prob) + (1 / 3 * mil_snv_prob)
+            results["ensemble"] = (
+                bag_prob,
+                self._to_variant_score(ensemble_prob, patient_data, is_empty_cnv),
+            )
 
-        return bag_prob, variant2score
+        return results
@@ -1,9 +1,15 @@
 from logging import Logger
-from fastapi import APIRouter, Request, Depends
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
 from ASC3.mil_model.model import MILPredictor
 from ASC3.mil_model.data_model import SampleId, MILRequest
+from ASC3.mil_model.streaming import PARSE_ERRORS, MILRequestStreamParser, SNVMatrixBuilder
+from ASC3.result_cache import PredictionCache, canonical_hash
+from ASC3.transport import FastJSONResponse, round_scores
 
 
 mil_router = APIRouter()
@@ -17,11 +23,49 @@ def get_predictor(request: Request) -> MILPredictor:
     return request.app.state.mil_predictor
 
 
+def get_result_cache(request: Request) -> Optional[PredictionCache]:
+    return getattr(request.app.state, "result_cache", None)
+
+
+def get_float_digits(request: Request) -> Optional[int]:
+    return getattr(request.app.state, "float_digits", None)
+
+
+def select_model(model: Optional[str], mil_predictor: MILPredictor) -> str:
+    """query의 model 값 검증. 지정하지 않으면 predictor의 기본 모델"""
+    if model is None:
+        return mil_predictor.MODELS[0]
+
+    if model == "tree":
+        # ensemble의 랜덤포레스트(rf)와 tree 모델(Classifier)을 혼동하지 않도록 안내
+        raise HTTPException(
+            status_code=400,
+            detail="the tree Classifier is served under /tree; use model=rf for the ensemble's random forest",
+        )
+    if model not in mil_predictor.MODELS:
+        raise HTTPException(
+            status_code=400,
+            detail="model must be one of %s, got %s" % (list(mil_predictor.MODELS), model),
+        )
+    return model
+
+
+def to_content(
+    bag_prob: Optional[float], variant2score: dict, digits: Optional[int] = None
+) -> dict:
+    return {
+        "patient_probability": bag_prob,
+        "variant_probability": round_scores(variant2score, digits),
+    }
+
+
 @mil_router.post("/predict_from_file")
 def predict_from_file(
     query: SampleId,
+    model: Optional[str] = Query(None),
     mil_predictor: MILPredictor = Depends(get_predictor),
     logger: Logger = Depends(get_logger),
+    digits: Optional[int] = Depends(get_float_digits),
 ) -> JSONResponse:
     """
     주어진 샘플을 기반으로 MIL (Multiple Instance Learning)을 사용하여 결과를 예측
@@ -32,32 +76,36 @@ def predict_from_file(
 
     Args:
         sample_id (str): 예측에 사용할 샘플의 식별자
+        model (str, optional): mil, ensemble, rf 중 사용할 모델 (기본값: 서비스 모델)
         request (Request): FastAPI의 요청 객체
 
     Returns:
         JSONResponse: 예측된 Bag 확률과 원인변이 스코어를 담고 있는 JSON 응답
     """
     sample_id = query.sample_id
+    model = select_model(model, mil_predictor)
     logger.info("Passed sample id %s" % sample_id)
 
     patient_data = mil_predictor.build_data_from_file(sample_id)
-    bag_label, variant2score = mil_predictor.predict(patient_data)
+    bag_label, variant2score = mil_predictor.predict_models(patient_data, (model,))[model]
 
-    return JSONResponse(
-        content={"patient_probability": bag_label, "variant_probability": variant2score}
-    )
+    return FastJSONResponse(content=to_content(bag_label, variant2score, digits))
 
 
 @mil_router.post("/predict")
 def predict(
     query: MILRequest,
+    model: Optional[str] = Query(None),
     mil_predictor: MILPredictor = Depends(get_predictor),
     logger: Logger = Depends(get_logger),
+    result_cache: Optional[PredictionCache] = Depends(get_result_cache),
+    digits: Optional[int] = Depends(get_float_digits),
 ) -> JSONResponse:
     """특징값을 POST 요청을 받아서 MIL(Multiple Instance Learning) 모델을 사용하여 예측
 
     Args:
         query (MILRequest): POST 요청에서 받은 데이터를 나타내는 MILRequest 객체.
+        model (str, optional): mil, ensemble, rf 중 사용할 모델 (기본값: 서비스 모델)
         request (Request): FastAPI Request 객체.
 
     Returns:
@@ -69,11 +117,93 @@ def predict(
             }
     """
     sample_id = query.sample_id
+    model = select_model(model, mil_predictor)
     logger.info("Passed sample id %s" % sample_id)
 
+    def compute() -> dict:
+        patient_data = mil_predictor.convert_query_to_patient_data(query)
+        return to_content(*mil_predictor.predict_models(patient_data, (model,))[model], digits)
+
+    if result_cache is None:
+        return FastJSONResponse(content=compute())
+
+    # 같은 payload + 같은 모델 아티펙트 + 같은 모델이면 이전 결과를 재사용
+    key = canonical_hash(query, "%s/%s/%s" % (mil_predictor.artifact_id, model, digits))
+    content, status = result_cache.get_or_compute(key, compute)
+    logger.info("Result cache %s for sample id %s" % (status, sample_id))
+
+    return FastJSONResponse(content=content, headers={"X-Result-Cache": status})
+
+
+@mil_router.post("/predict_all")
+def predict_all(
+    query: MILRequest,
+    mil_predictor: MILPredictor = Depends(get_predictor),
+    logger: Logger = Depends(get_logger),
+    digits: Optional[int] = Depends(get_float_digits),
+) -> JSONResponse:
+    """한 번 피처라이징한 PatientData로 서비스 중인 모든 모델의 결과를 반환
+
+    Returns:
+        JSONResponse: 모델명별 예측 결과
+            {
+                "ensemble": {"patient_probability": ..., "variant_probability": ...},
+                "mil": {...},
+                "rf": {"patient_probability": null, "variant_probability": ...},
+            }
+    """
+    logger.info("Passed sample id %s (all models)" % query.sample_id)
+
     patient_data = mil_predictor.convert_query_to_patient_data(query)
-    bag_prob, variant2score = mil_predictor.predict(patient_data)
+    results = mil_predictor.predict_models(patient_data, mil_predictor.MODELS)
 
-    return JSONResponse(
-        content={"patient_probability": bag_prob, "variant_probability": variant2score}
+    return FastJSONResponse(
+        content={model: to_content(*result, digits) for model, result in results.items()}
     )
+
+
+@mil_router.post("/predict_stream")
+async def predict_stream(
+    request: Request,
+    model: Optional[str] = Query(None),
+    n_snv: Optional[int] = Query(None, ge=1),
+    mil_predictor: MILPredictor = Depends(get_predictor),
+    logger: Logger = Depends(get_logger),
+    digits: Optional[int] = Depends(get_float_digits),
+) -> JSONResponse:
+    """/predict와 같은 body/응답이지만 body를 받는 대로 파싱하여 피처라이징
+
+    SNV가 수십만 개인 큰 요청용. gene-disease 그룹 단위로 검증하여 float32 행렬에 바로
+    채우므로 JSON 트리 전체나 MILRequest 객체를 메모리에 만들지 않음. 결과 캐시는 사용하지 않음.
+
+    Args:
+        model (str, optional): mil, ensemble, rf 중 사용할 모델 (기본값: 서비스 모델)
+        n_snv (int, optional): 전체 SNV 수. 주어지면 행렬을 한 번에 할당함
+
+    Returns:
+        JSONResponse: /predict와 같은 형식의 예측 결과
+    """
+    model = select_model(model, mil_predictor)
+    snv_builder = SNVMatrixBuilder(capacity=n_snv or 4096, logger=logger)
+    parser = MILRequestStreamParser(snv_builder.add_group)
+
+    try:
+        # 파싱과 피처라이징은 CPU 작업이므로 청크마다 threadpool에서 처리
+        async for chunk in request.stream():
+            await run_in_threadpool(parser.feed, chunk)
+        fields = await run_in_threadpool(parser.close)
+        patient_data = await run_in_threadpool(
+            mil_predictor.convert_stream_to_patient_data, fields, snv_builder
+        )
+    except PARSE_ERRORS as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    logger.info(
+        "Passed sample id %s (streamed, %d SNVs)"
+        % (patient_data.sample_id, len(patient_data.snv_data.x))
+    )
+    bag_label, variant2score = (
+        await run_in_threadpool(mil_predictor.predict_models, patient_data, (model,))
+    )[model]
+
+    return FastJSONResponse(content=to_content(bag_label, variant2score, digits))
@@ -0,0 +1,310 @@
+"""MultimodalAttentionMIL의 forward를 단계별(인스턴스 인코딩 / attention pooling / classifier)로 실행
+
+전체 forward 대신 단계별로 실행하면 중복 인스턴스 제거, 인코더 출력 캐시,
+청크 단위 인코딩/pooling(``forward_chunked``) 등을 bag attention 결과를 바꾸지 않고 적용할 수 있음.
+단계 모듈명은 ``config["MIL_MODEL"]["STAGES"]``로 바꿀 수 있으며, 로딩된
+모델에서 단계별 실행이 전체 forward와 동일한 결과를 내는지 검증(``verify``)된
+경우에만 사용함.
+"""
+import math
+from logging import Logger
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+DEFAULT_STAGES = {
+    "snv_encoder": "snv_encoder",
+    "cnv_encoder": "cnv_encoder",
+    "shared_encoder": "shared_encoder",
+    "attention": "attention",
+    "bag_classifier": "bag_classifier",
+    "instance_classifier": "instance_classifier",
+}
+
+
+def _same_logits(expected: Tuple[torch.Tensor, torch.Tensor], actual: Tuple[torch.Tensor, torch.Tensor]) -> bool:
+    """전체 forward의 (bag logit, instance logit)과 단계별 실행 결과 비교"""
+    return all(
+        torch.allclose(reference.reshape(-1), value, atol=1e-5) for reference, value in zip(expected, actual)
+    )
+
+
+def _expand(logits: Tuple[torch.Tensor, torch.Tensor], inverse: np.ndarray) -> Tuple[torch.Tensor, torch.Tensor]:
+    """중복 제거한 bag의 (bag logit, instance logit)에서 SNV instance logit을 원래 행 순서로 펼침"""
+    bag_logit, instance_logit = logits
+    n_unique = int(inverse.max()) + 1 if len(inverse) else 0
+    index = torch.from_numpy(inverse).to(instance_logit.device)
+    return bag_logit, torch.cat([instance_logit[:n_unique][index], instance_logit[n_unique:]])
+
+
+class StagedMIL:
+    """Gated attention MIL의 단계별 실행기
+
+    bag logit = bag_classifier(sum_i softmax(a)_i * h_i),  a_i = attention(h_i)
+    instance logit = instance_classifier(h_i)
+
+    동일한 인스턴스가 k번 등장하면 softmax 분모/분자에 k번 더해지므로
+    attention logit에 log(k)를 더하면 중복을 제거한 bag으로 정확히 같은 pooling 결과를 얻음.
+    """
+
+    def __init__(self, model: torch.nn.Module, stages: Optional[Dict[str, str]] = None) -> None:
+        self.model = model
+        names = dict(DEFAULT_STAGES, **(stages or dict()))
+        self.snv_encoder = getattr(model, names["snv_encoder"], None)
+        self.cnv_encoder = getattr(model, names["cnv_encoder"], None)
+        self.shared_encoder = getattr(model, names["shared_encoder"], None)
+        self.attention = getattr(model, names["attention"], None)
+        self.bag_classifier = getattr(model, names["bag_classifier"], None)
+        self.instance_classifier = getattr(model, names["instance_classifier"], None)
+        self.verified = False
+        # forward_chunked(online softmax)까지 전체 forward와 일치하는지. chunk_size 사용 여부만 결정함
+        self.chunk_verified = False
+        # 인스턴스 1개를 인코딩할 때 생기는 중간 activation 크기 (verify에서 측정)
+        self.activation_bytes = 0
+
+    @property
+    def available(self) -> bool:
+        required = (
+            self.snv_encoder,
+            self.cnv_encoder,
+            self.attention,
+            self.bag_classifier,
+            self.instance_classifier,
+        )
+        return all(module is not None for module in required)
+
+    def encode(self, x: torch.Tensor, kind: str) -> torch.Tensor:
+        """인스턴스 임베딩 (N, d)"""
+        encoder = self.snv_encoder if kind == "snv" else self.cnv_encoder
+        h = encoder(x)
+        if self.shared_encoder is not None:
+            h = self.shared_encoder(h)
+        return h
+
+    def attention_logits(self, h: torch.Tensor) -> torch.Tensor:
+        return self.attention(h).reshape(-1)
+
+    def instance_logits(self, h: torch.Tensor, mask: Optional[torch.Tensor] = None) -> torch.Tensor:
+        """instance logit. mask가 주어지면 True인 행만 계산하고 나머지는 -inf (확률 0)"""
+        if mask is None:
+            return self.instance_classifier(h).reshape(-1)
+        logits = torch.full((len(h),), -math.inf, dtype=h.dtype, device=h.device)
+        if mask.any():
+            logits[mask] = self.instance_classifier(h[mask]).reshape(-1)
+        return logits
+
+    def pool(
+        self, h: torch.Tensor, logits: torch.Tensor, counts: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        """attention pooling 후 bag logit 계산. counts는 각 행의 중복 횟수"""
+        if counts is not None:
+            logits = logits + torch.log(counts.to(device=logits.device, dtype=logits.dtype))
+        weights = torch.softmax(logits, dim=0)
+        bag_embedding = (weights.unsqueeze(1) * h).sum(dim=0, keepdim=True)
+        return self.bag_classifier(bag_embedding).reshape(-1)
+
+    def forward(
+        self,
+        snv_x: torch.Tensor,
+        cnv_x: torch.Tensor,
+        snv_counts: Optional[torch.Tensor] = None,
+        instance_mask: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """model((snv_x, cnv_x))와 같은 (bag_logit, instance_logit) 반환"""
+        return self.from_embeddings(
+            self.encode(snv_x, "snv"),
+            self.encode(cnv_x, "cnv"),
+            snv_counts=snv_counts,
+            instance_mask=instance_mask,
+        )
+
+    def from_embeddings(
+        self,
+        h_snv: torch.Tensor,
+        h_cnv: torch.Tensor,
+        snv_counts: Optional[torch.Tensor] = None,
+        instance_mask: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """인코딩된 인스턴스 임베딩으로부터 (bag_logit, instance_logit) 계산
+
+        instance_mask (SNV, CNV 순 bool)가 주어지면 attention pooling은 bag 전체로 하고
+        instance logit은 True인 행만 계산함.
+        """
+        h = torch.cat([h_snv, h_cnv], dim=0)
+        logits = self.attention_logits(h)
+        counts = None
+        if snv_counts is not None:
+            counts = torch.cat(
+                [snv_counts, torch.ones(len(h_cnv), dtype=snv_counts.dtype, device=snv_counts.device)]
+            )
+        return self.pool(h, logits, counts), self.instance_logits(h, instance_mask)
+
+    def encode_chunked(self, x: torch.Tensor, kind: str, chunk_size: int) -> torch.Tensor:
+        """chunk_size 행씩 인코딩한 뒤 이어붙인 임베딩 (N, d). 중간 activation은 한 청크 크기로 제한"""
+        if len(x) <= chunk_size:
+            return self.encode(x, kind)
+        return torch.cat([self.encode(chunk, kind) for chunk in torch.split(x, chunk_size)], dim=0)
+
+    def forward_chunked(
+        self,
+        snv_x: torch.Tensor,
+        cnv_x: torch.Tensor,
+        chunk_size: int,
+        snv_counts: Optional[torch.Tensor] = None,
+        instance_mask: Optional[torch.Tensor] = None,
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """bag 전체 임베딩을 만들지 않고 청크 단위로 (bag_logit, instance_logit) 계산
+
+        청크마다 인코딩 -> attention/instance logit을 구하고, softmax pooling은
+        running max m으로 누적함 (online softmax).
+
+            s = sum_i exp(a_i - m),  z = sum_i exp(a_i - m) * h_i
+            새 청크의 max가 m'이면 s, z에 exp(m - m')를 곱한 뒤 청크를 더함
+
+        마지막에 z / s는 bag 전체 softmax(a)로 가중합한 임베딩과 같으므로
+        결과는 ``forward``와 (부동소수점 합산 순서 차이를 제외하고) 같음.
+        메모리는 청크 하나의 activation과 (N,) 크기의 logit만 사용함.
+        instance_mask는 ``from_embeddings``와 같음.
+        """
+        instance_logits = list()
+        running_max = torch.tensor(-math.inf)
+        weight_sum = None
+        weighted_embedding = None
+
+        chunks = [("snv", chunk) for chunk in torch.split(snv_x, chunk_size)]
+        chunks += [("cnv", chunk) for chunk in torch.split(cnv_x, chunk_size)]
+        counts = torch.split(snv_counts, chunk_size) if snv_counts is not None else None
+        masks = None
+        if instance_mask is not None:
+            masks = torch.split(instance_mask[: len(snv_x)], chunk_size)
+            masks += torch.split(instance_mask[len(snv_x) :], chunk_size)
+        for index, (kind, x) in enumerate(chunks):
+            if len(x) == 0:
+                continue
+            h = self.encode(x, kind)
+            logits = self.attention_logits(h)
+            if kind == "snv" and counts is not None:
+                logits = logits + torch.log(counts[index].to(device=logits.device, dtype=logits.dtype))
+            instance_logits.append(self.instance_logits(h, masks[index] if masks is not None else None))
+
+            chunk_max = torch.maximum(running_max.to(logits), logits.max())
+            weights = torch.exp(logits - chunk_max)
+            chunk_embedding = (weights.unsqueeze(1) * h).sum(dim=0, keepdim=True)
+            if weight_sum is None:
+                weight_sum = weights.sum()
+                weighted_embedding = chunk_embedding
+            else:
+                scale = torch.exp(running_max.to(logits) - chunk_max)
+                weight_sum = weight_sum * scale + weights.sum()
+                weighted_embedding = weighted_embedding * scale + chunk_embedding
+            running_max = chunk_max
+
+        bag_logit = self.bag_classifier(weighted_embedding / weight_sum).reshape(-1)
+        return bag_logit, torch.cat(instance_logits)
+
+    def measure_activation_bytes(self, x: torch.Tensor, kind: str) -> int:
+        """x 한 행을 인코딩/분류할 때 각 단계 모듈이 출력하는 activation의 총 바이트 수"""
+        total = [0]
+
+        def hook(module, inputs, output):
+            if isinstance(output, torch.Tensor):
+                total[0] += output.element_size() * output.nelement()
+
+        modules = (
+            self.snv_encoder if kind == "snv" else self.cnv_encoder,
+            self.shared_encoder,
+            self.attention,
+            self.instance_classifier,
+        )
+        handles = [
+            submodule.register_forward_hook(hook)
+            for module in modules
+            if module is not None
+            for submodule in module.modules()
+        ]
+        try:
+            with torch.no_grad():
+                h = self.encode(x[:1], kind)
+                self.attention_logits(h)
+                self.instance_logits(h)
+        finally:
+            for handle in handles:
+                handle.remove()
+        return total[0]
+
+    def chunk_size(self, memory_mb: float) -> int:
+        """인스턴스 activation이 memory_mb를 넘지 않는 청크 행 수"""
+        if self.activation_bytes <= 0:
+            return 0
+        return max(1, int(memory_mb * 2**20 // self.activation_bytes))
+
+    def verify(self, n_snv_features: int, n_cnv_features: int, logger: Logger) -> bool:
+        """중복 행이 있는 임의의 bag으로 단계별 실행과 전체 forward의 결과가 같은지 확인
+
+        서비스 경로와 같이 중복을 제거한 bag을 ``snv_counts``와 함께 실행하고,
+        instance logit을 ``inverse``로 원래 행 순서로 펼쳐 전체 bag의 forward와 비교함.
+        ``forward_chunked``는 따로 검증하여 ``chunk_verified``에 기록하며,
+        청크 결과가 달라도 단계별 실행(중복 제거, 캐시, mask)은 계속 사용함.
+        """
+        self.verified = False
+        self.chunk_verified = False
+        if not self.available:
+            logger.info("Staged MIL forward disabled: stage modules not found in model")
+            return False
+
+        generator = torch.Generator().manual_seed(0)
+        try:
+            device = next(self.model.parameters()).device
+            rows = torch.randn(5, n_snv_features, generator=generator)
+            snv_x = rows[torch.tensor([0, 1, 2, 0, 3, 1, 0, 4])].to(device)
+            cnv_x = torch.randn(2, n_cnv_features, generator=generator).to(device)
+            first_index, inverse, counts = unique_rows(snv_x.cpu().numpy())
+            unique_snv_x = snv_x[torch.from_numpy(first_index)]
+            counts = torch.from_numpy(counts)
+            with torch.no_grad():
+                expected = self.model((snv_x, cnv_x))
+                self.verified = _same_logits(
+                    expected, _expand(self.forward(unique_snv_x, cnv_x, snv_counts=counts), inverse)
+                )
+        except (RuntimeError, TypeError, ValueError, StopIteration) as e:
+            logger.info("Staged MIL forward disabled: %s" % e)
+            self.verified = False
+            return False
+
+        logger.info("Staged MIL forward %s" % ("verified" if self.verified else "mismatch, disabled"))
+        if not self.verified:
+            return False
+
+        try:
+            with torch.no_grad():
+                self.chunk_verified = _same_logits(
+                    expected,
+                    _expand(self.forward_chunked(unique_snv_x, cnv_x, chunk_size=3, snv_counts=counts), inverse),
+                )
+                self.activation_bytes = max(
+                    self.measure_activation_bytes(snv_x, "snv"),
+                    self.measure_activation_bytes(cnv_x, "cnv"),
+                )
+        except (RuntimeError, TypeError, ValueError) as e:
+            logger.info("Chunked MIL forward disabled: %s" % e)
+            self.chunk_verified = False
+        else:
+            if not self.chunk_verified:
+                logger.info("Chunked MIL forward mismatch, disabled")
+        return True
+
+
+def unique_rows(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """중복 행 제거
+
+    Returns:
+        Tuple: (각 unique 행의 첫 등장 인덱스, 원래 행 -> unique 인덱스, unique 행별 등장 횟수)
+    """
+    if len(x) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    _, first_index, inverse, counts = np.unique(
+        x, axis=0, return_index=True, return_inverse=True, return_counts=True
+    )
+    return first_index, inverse.reshape(-1), counts
@@ -0,0 +1,218 @@
+"""/predict_stream: 큰 MILRequest body를 스트리밍으로 파싱하여 바로 피처라이징
+
+/predict는 body 전체를 읽고 MILRequest 전체를 pydantic 객체로 검증한 뒤 피처라이징하므로
+수십만 개의 SNV가 들어오면 JSON 트리와 검증된 객체가 동시에 메모리에 올라감.
+여기서는
+
+- ``MILRequestStreamParser``: body 청크를 받는 대로 파싱하여 ``snv``를 gene-disease 그룹
+  단위로 넘겨주고, 나머지 필드(sample_id, inhouse_total_ac, cnv)만 모아둠
+- ``SNVMatrixBuilder``: 그룹의 SNVFeature를 검증/벡터화하여 미리 할당한 float32 행렬에
+  바로 채움 (부족하면 2배씩 확장)
+
+으로 처리하므로 peak 메모리가 JSON 트리가 아니라 출력 행렬 크기로 제한됨.
+
+ijson이 설치되어 있지 않으면 body를 모두 받은 뒤 json으로 파싱하고 같은 경로로 처리함
+(결과는 같고, 메모리 상한만 보장되지 않음).
+
+Note:
+    inhouse_total_ac가 body에서 snv보다 뒤에 올 수 있으므로, inhouse_af 열에는 먼저
+    inhouse_variant_ac를 채우고 build 시점에 inhouse_total_ac로 나눔.
+"""
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from ASC3.mil_model.compact import VariantTableBuilder
+from ASC3.mil_model.data_model import SNVFeature
+from core.data_model import SNVData
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# 잘못된 body로 판단하는 예외 (pydantic.ValidationError는 ValueError의 하위 클래스)
+PARSE_ERRORS = (ValueError,) if ijson is None else (ValueError, ijson.JSONError)
+# SNVFeature.to_vector의 inhouse_af 위치
+INHOUSE_AF_COLUMN = 3
+_CONTAINER_START = ("start_map", "start_array")
+_CONTAINER_END = ("end_map", "end_array")
+
+
+class SNVMatrixBuilder:
+    """gene-disease 그룹 단위로 SNV feature를 float32 행렬과 VariantTable로 누적
+
+    Args:
+        capacity (int): 처음 할당할 행 수 (클라이언트가 SNV 수를 알려주면 그 값)
+        logger (logging.Logger, optional): 디버그 로깅
+    """
+
+    def __init__(self, capacity: int = 4096, logger: Optional[logging.Logger] = None) -> None:
+        self.capacity = max(capacity, 1)
+        self.logger = logger
+        self.x: Optional[np.ndarray] = None
+        self.n_rows = 0
+        self.variants = VariantTableBuilder()
+
+    def _append(self, vector: np.ndarray) -> None:
+        if self.x is None:
+            self.x = np.empty((self.capacity, len(vector)), dtype=np.float32)
+        elif self.n_rows == len(self.x):
+            # 제자리 realloc: 이전 행렬과 새 행렬을 동시에 들고 있지 않음
+            self.x.resize((len(self.x) * 2, self.x.shape[1]), refcheck=False)
+        self.x[self.n_rows] = vector
+        self.n_rows += 1
+
+    def add_group(self, gene_disease: str, group: dict) -> None:
+        """한 gene-disease 그룹({cpra: feature dict})을 검증/벡터화하여 추가
+
+        Raises:
+            ValueError: gene-disease 키 또는 feature가 올바르지 않은 경우
+        """
+        if not isinstance(group, dict) or "-" not in gene_disease:
+            raise ValueError("snv[%s] must be a {cpra: feature} mapping keyed by gene-disease" % gene_disease)
+
+        gene_id, disease_id = gene_disease.split("-", maxsplit=1)
+        for cpra, features in group.items():
+            if not isinstance(features, dict):
+                raise ValueError("snv[%s][%s] must be an object" % (gene_disease, cpra))
+            vector = SNVFeature(**features).to_vector(inhouse_total_ac=1)
+            if self.logger is not None and self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    "CPRA(%s) with feature (%s)" % (cpra, ",".join(map(lambda x: str(x), vector.tolist())))
+                )
+            self._append(vector)
+            self.variants.add(cpra, gene_id, disease_id)
+
+    def build(self, inhouse_total_ac: int, header: list) -> SNVData:
+        if self.x is None:
+            x = np.zeros((0, len(header)), dtype=np.float32)
+        else:
+            x = self.x
+            x.resize((self.n_rows, x.shape[1]), refcheck=False)
+            self.x = None
+            # float32로 저장된 allele count는 정수이므로 float64로 나눈 뒤 변환하면 /predict와 같은 값
+            x[:, INHOUSE_AF_COLUMN] = x[:, INHOUSE_AF_COLUMN].astype(np.float64) / inhouse_total_ac
+
+        return SNVData(x=x, variants=self.variants.build(), header=header)
+
+
+class MILRequestStreamParser:
+    """MILRequest JSON body를 청크 단위로 받아 파싱
+
+    ``snv``의 gene-disease 그룹은 완성되는 즉시 ``on_snv_group(gene_disease, group)``으로
+    넘기고 버림. 나머지 최상위 필드는 ``close()``가 dict로 반환함.
+
+    Args:
+        on_snv_group (Callable[[str, dict], None]): 그룹 하나를 처리하는 함수
+    """
+
+    def __init__(self, on_snv_group: Callable[[str, dict], None]) -> None:
+        self.on_snv_group = on_snv_group
+        self.fields: Dict[str, object] = dict()
+        self._buffer = list()
+        self._depth = 0
+        self._key: Optional[str] = None
+        self._group: Optional[str] = None
+        self._in_snv = False
+        self._builder = None
+        self._builder_depth = 0
+
+        if ijson is not None:
+            self._events = ijson.sendable_list()
+            self._coro = ijson.basic_parse_coro(self._events, use_float=True)
+
+    def feed(self, chunk: bytes) -> None:
+        """받은 청크를 파싱하고, 완성된 snv 그룹을 on_snv_group으로 넘김
+
+        Raises:
+            ValueError: JSON이 올바르지 않은 경우 (ijson.JSONError 포함)
+        """
+        if not chunk:
+            return
+        if ijson is None:
+            self._buffer.append(chunk)
+            return
+
+        self._coro.send(chunk)
+        for event, value in self._events:
+            self._event(event, value)
+        del self._events[:]
+
+    def close(self) -> Dict[str, object]:
+        if ijson is None:
+            request = json.loads(b"".join(self._buffer))
+            self._buffer = list()
+            if not isinstance(request, dict):
+                raise ValueError("request body must be a JSON object")
+            snv = request.pop("snv", None)
+            if not isinstance(snv, dict):
+                raise ValueError("snv must be an object")
+            for gene_disease in list(snv):
+                self.on_snv_group(gene_disease, snv.pop(gene_disease))
+            self.fields = dict(request, snv=dict())
+            return self.fields
+
+        self._coro.close()
+        for event, value in self._events:
+            self._event(event, value)
+        del self._events[:]
+        if self._depth != 0 or "snv" not in self.fields:
+            raise ValueError("request body must be a JSON object with an snv object")
+        return self.fields
+
+    def _start_builder(self) -> None:
+        self._builder = ijson.ObjectBuilder()
+        self._builder_depth = self._depth
+
+    def _event(self, event: str, value) -> None:
+        if self._builder is not None:
+            self._builder.event(event, value)
+            self._depth += (event in _CONTAINER_START) - (event in _CONTAINER_END)
+            if self._depth == self._builder_depth:
+                self._finish_builder(self._builder.value)
+            return
+
+        if self._depth == 0:
+            if event != "start_map":
+                raise ValueError("request body must be a JSON object")
+            self._depth = 1
+        elif self._depth == 1 and not self._in_snv:
+            if event == "map_key":
+                self._key = value
+            elif event == "end_map":
+                self._depth = 0
+            elif self._key == "snv" and event == "start_map":
+                self._in_snv = True
+                self.fields["snv"] = dict()
+                self._depth = 2
+            elif self._key == "snv":
+                raise ValueError("snv must be an object")
+            elif event in _CONTAINER_START:
+                self._start_builder()
+                self._builder.event(event, value)
+                self._depth += 1
+            else:
+                self.fields[self._key] = value
+        else:
+            # snv 내부 (depth 2): gene-disease 키와 그룹
+            if event == "map_key":
+                self._group = value
+            elif event == "end_map":
+                self._in_snv = False
+                self._depth = 1
+            elif event in _CONTAINER_START:
+                self._start_builder()
+                self._builder.event(event, value)
+                self._depth += 1
+            else:
+                self.on_snv_group(self._group, value)
+
+    def _finish_builder(self, value) -> None:
+        self._builder = None
+        if self._in_snv:
+            self.on_snv_group(self._group, value)
+        else:
+            self.fields[self._key] = value
@@ -0,0 +1,257 @@
+"""요청 단위 CPU 프로파일링과 메모리 추적
+
+특정 샘플의 /predict가 느릴 때 재배포 없이 원인을 보기 위한 훅.
+``ASC3_PROFILE_TOKEN`` 환경변수(또는 config의 PROFILING.TOKEN)가 설정된 경우에만
+미들웨어가 추가되며, 토큰이 없으면 요청 처리 경로에 아무것도 추가되지 않음.
+
+요청에 ``X-Profile-Token: <token>`` 헤더를 붙이면 해당 요청을 처리하는 동안
+
+- 샘플링 CPU 프로파일: 일정 간격으로 모든 스레드의 스택을 수집하여 folded stack 형식
+  (flamegraph.pl, speedscope 등에서 바로 사용)으로 저장
+- tracemalloc: 요청 중 peak 메모리와 할당량 상위 라인
+
+을 ``<OUTPUT_DIR>/<profile_id>.folded``, ``<profile_id>.json``으로 저장하고, 응답 헤더
+``X-Profile-Id``로 알려줌. 저장된 결과는 같은 토큰으로 ``GET /profiles/<profile_id>.folded``
+(또는 ``.json``)로 받을 수 있음.
+
+Note:
+    샘플러는 프로세스의 모든 스레드를 보므로, 같은 워커에서 동시에 처리 중인 다른 요청의
+    스택이 섞일 수 있음. 한 번에 하나의 요청만 프로파일링하며, 이미 진행 중이면
+    ``X-Profile-Status: busy``로 프로파일링 없이 처리함.
+    토큰은 access log에 남지 않도록 헤더로만 받으며, 쿼리 문자열의 토큰은 무시함.
+"""
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import threading
+import tracemalloc
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# 요청을 처리하지 않고 대기 중인 스레드의 최상위 함수
+IDLE_FUNCTIONS = {"wait", "select", "poll", "_worker", "_wait_for_tstate_lock", "get"}
+PROFILE_ID_PATTERN = re.compile(r"^/profiles/([0-9a-f\-]+)\.(folded|json)$")
+
+
+def fold_stack(frame) -> str:
+    """frame을 root;...;leaf 형식의 folded stack 문자열로 변환"""
+    names = list()
+    while frame is not None:
+        code = frame.f_code
+        names.append("%s (%s:%s)" % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class StackSampler(threading.Thread):
+    """interval마다 모든 스레드의 스택을 샘플링
+
+    Args:
+        interval (float): 샘플링 간격(초)
+    """
+
+    def __init__(self, interval: float = 0.005) -> None:
+        super().__init__(name="asc3-profiler", daemon=True)
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.n_samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            self.n_samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_name in IDLE_FUNCTIONS:
+                    continue
+                self.counts[fold_stack(frame)] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join("%s %s\n" % (stack, count) for stack, count in self.counts.most_common())
+
+
+class ProfileSession:
+    """한 요청 동안의 CPU 샘플링 + tracemalloc"""
+
+    def __init__(self, interval: float, top_n: int) -> None:
+        self.profile_id = uuid.uuid4().hex
+        self.top_n = top_n
+        self.sampler = StackSampler(interval)
+        self._started_tracemalloc = False
+        self._start = 0.0
+
+    def start(self) -> None:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self._started_tracemalloc = True
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+        self.sampler.start()
+
+    def stop(self) -> Tuple[str, Dict]:
+        self.sampler.stop()
+        elapsed = time.perf_counter() - self._start
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        top = snapshot.statistics("lineno")[: self.top_n]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        report = {
+            "profile_id": self.profile_id,
+            "seconds": elapsed,
+            "samples": self.sampler.n_samples,
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "top_allocations": [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in top
+            ],
+        }
+        return self.sampler.folded(), report
+
+
+class ProfilingMiddleware:
+    """토큰을 제시한 요청만 프로파일링하고, 저장된 결과를 제공하는 ASGI 미들웨어
+
+    Args:
+        app (ASGIApp): 감쌀 ASGI 앱
+        token (str): 프로파일링 토큰
+        output_dir (str): 결과 저장 경로
+        paths (Tuple[str, ...]): 프로파일링 대상 경로
+        interval (float): CPU 샘플링 간격(초)
+        top_n (int): 기록할 메모리 할당 상위 라인 수
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        token: str,
+        output_dir: str,
+        paths: Tuple[str, ...] = ("/predict", "/predict_from_file", "/predict_stream"),
+        interval: float = 0.005,
+        top_n: int = 20,
+    ) -> None:
+        self.app = app
+        self.token = token
+        self.output_dir = output_dir
+        self.paths = tuple(paths)
+        self.interval = interval
+        self.top_n = top_n
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _authorized(self, scope: Scope) -> bool:
+        supplied = b""
+        for key, value in scope.get("headers", list()):
+            if key.lower() == b"x-profile-token":
+                supplied = value
+                break
+        # str끼리 비교하면 ASCII가 아닌 값에서 TypeError가 나므로 bytes로 비교
+        return bool(supplied) and hmac.compare_digest(supplied, self.token.encode("utf-8"))
+
+    async def _send_file(self, send: Send, profile_id: str, kind: str) -> None:
+        path = os.path.join(self.output_dir, "%s.%s" % (profile_id, kind))
+        if not os.path.exists(path):
+            status, body, content_type = 404, b'{"detail":"profile not found"}', b"application/json"
+        else:
+            with open(path, "rb") as fh:
+                body = fh.read()
+            status = 200
+            content_type = b"application/json" if kind == "json" else b"text/plain; charset=utf-8"
+
+        await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", content_type)]})
+        await send({"type": "http.response.body", "body": body})
+
+    def _save(self, profile_id: str, folded: str, report: Dict) -> None:
+        with open(os.path.join(self.output_dir, profile_id + ".folded"), "w") as fh:
+            fh.write(folded)
+        with open(os.path.join(self.output_dir, profile_id + ".json"), "w") as fh:
+            json.dump(report, fh, indent=2)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        matched = PROFILE_ID_PATTERN.match(path) if scope["method"] == "GET" else None
+        if matched and self._authorized(scope):
+            await self._send_file(send, matched.group(1), matched.group(2))
+            return
+
+        if path not in self.paths or not self._authorized(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not self._lock.acquire(blocking=False):
+            async def send_busy(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message = dict(message, headers=list(message.get("headers", list())) + [(b"x-profile-status", b"busy")])
+                await send(message)
+
+            await self.app(scope, receive, send_busy)
+            return
+
+        session = ProfileSession(self.interval, self.top_n)
+        stopped = False
+
+        def finish() -> Dict:
+            nonlocal stopped
+            stopped = True
+            folded, report = session.stop()
+            report["path"] = path
+            self._save(session.profile_id, folded, report)
+            self._lock.release()
+            return report
+
+        async def send_profiled(message: Message) -> None:
+            # 응답 시작 시점에 추론이 끝나므로 여기서 프로파일을 종료하고 헤더로 알림
+            if message["type"] == "http.response.start" and not stopped:
+                report = finish()
+                message = dict(
+                    message,
+                    headers=list(message.get("headers", list()))
+                    + [
+                        (b"x-profile-id", session.profile_id.encode("latin-1")),
+                        (b"x-profile-peak-bytes", str(report["traced_peak_bytes"]).encode("latin-1")),
+                        (b"x-profile-samples", str(report["samples"]).encode("latin-1")),
+                    ],
+                )
+            await send(message)
+
+        session.start()
+        try:
+            await self.app(scope, receive, send_profiled)
+        finally:
+            if not stopped:
+                finish()
+
+
+def profiling_from_config(config: dict, root_dir: str) -> Optional[Dict]:
+    """미들웨어 인자. 토큰이 없으면 None (미들웨어를 추가하지 않음)"""
+    profiling_config = config.get("PROFILING", dict())
+    token = os.environ.get("ASC3_PROFILE_TOKEN") or profiling_config.get("TOKEN")
+    if not token:
+        return None
+
+    return {
+        "token": token,
+        "output_dir": os.path.join(root_dir, profiling_config.get("OUTPUT_DIR", "data/profiles")),
+        "paths": tuple(profiling_config.get("PATHS", ("/predict", "/predict_from_file", "/predict_stream"))),
+        "interval": profiling_config.get("INTERVAL_MS", 5) / 1000,
+        "top_n": profiling_config.get("TOP_N", 20),
+    }
@@ -0,0 +1,186 @@
+"""/predict 응답 캐시
+
+같은 MILRequest가 재전송되는 경우 피처라이징과 추론을 다시 하지 않도록
+요청의 정규화된 해시와 모델 아티펙트 ID로 응답을 캐시함.
+
+- 메모리: 크기 제한 LRU
+- 디스크(선택): 여러 워커 프로세스가 공유하는 디렉토리에 key별 JSON 파일로 저장
+- 동시에 들어온 같은 요청은 한 번만 계산하고 나머지는 그 결과를 기다림
+- key에 모델 아티펙트 ID가 포함되므로 모델이 바뀌면 이전 결과는 자동으로 사용되지 않음
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+
+def canonical_hash(query: BaseModel, artifact_id: str) -> str:
+    """요청 필드 순서/공백과 무관한 요청 해시
+
+    Args:
+        query (BaseModel): MILRequest 등 요청 객체
+        artifact_id (str): 모델 아티펙트 ID (ex. "MILPredictor:<UUID>")
+
+    Returns:
+        str: sha256 hex digest
+    """
+    payload = json.dumps(
+        {"artifact": artifact_id, "query": query.dict()},
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PredictionCache:
+    """요청 해시 -> 응답 content(dict) 캐시
+
+    Args:
+        max_entries (int): 메모리에 유지하는 최대 응답 수
+        disk_dir (str, optional): 워커 간에 공유할 디스크 저장 경로
+        disk_max_entries (int): 디스크에 유지하는 최대 응답 수 (오래된 파일부터 삭제)
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        disk_dir: Optional[str] = None,
+        disk_max_entries: int = 10000,
+    ) -> None:
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, Future] = dict()
+        self._n_writes = 0
+        self.stats = {"hit": 0, "disk_hit": 0, "miss": 0, "coalesced": 0}
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.disk_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path) as fh:
+                content = json.load(fh)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return content
+
+    def _write_disk(self, key: str, content: Dict[str, Any]) -> None:
+        if not self.disk_dir:
+            return
+
+        tmp_path = "%s.%s.%s.tmp" % (self._disk_path(key), os.getpid(), threading.get_ident())
+        try:
+            with open(tmp_path, "w") as fh:
+                json.dump(content, fh)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        self._n_writes += 1
+        if self._n_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """디스크 저장 개수가 disk_max_entries를 넘으면 가장 오래 사용되지 않은 파일부터 삭제"""
+        paths = [
+            os.path.join(self.disk_dir, name)
+            for name in os.listdir(self.disk_dir)
+            if name.endswith(".json")
+        ]
+        if len(paths) <= self.disk_max_entries:
+            return
+
+        def mtime(path: str) -> float:
+            try:
+                return os.path.getmtime(path)
+            except OSError:
+                return 0.0
+
+        for path in sorted(paths, key=mtime)[: len(paths) - self.disk_max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _remember(self, key: str, content: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self, key: str, compute: Callable[[], Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """캐시된 응답을 반환하거나, 없으면 compute()로 계산하여 저장
+
+        Returns:
+            Tuple[dict, str]: (응답 content, "hit" | "disk_hit" | "miss" | "coalesced")
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hit"] += 1
+                return self._entries[key], "hit"
+
+            future = self._inflight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_owner:
+            with self._lock:
+                self.stats["coalesced"] += 1
+            return future.result(), "coalesced"
+
+        status = "disk_hit"
+        try:
+            content = self._read_disk(key)
+            if content is None:
+                status = "miss"
+                content = compute()
+                self._write_disk(key, content)
+            self._remember(key, content)
+            future.set_result(content)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.stats[status] += 1
+
+        return content, status
+
+
+def cache_from_config(config: dict) -> Optional[PredictionCache]:
+    """config의 RESULT_CACHE 설정으로 캐시 생성. ENABLED가 false(기본값)면 None"""
+    cache_config = config.get("RESULT_CACHE", dict())
+    if not cache_config.get("ENABLED", False):
+        return None
+
+    return PredictionCache(
+        max_entries=cache_config.get("MAX_ENTRIES", 256),
+        disk_dir=cache_config.get("DISK_DIR", None),
+        disk_max_entries=cache_config.get("DISK_MAX_ENTRIES", 10000),
+    )
@@ -0,0 +1,225 @@
+"""웹서버 없이 코호트 단위로 3ASC 스코어를 계산하는 오프라인 스코어링
+
+Example:
+    $ python -m ASC3 score --sample-ids samples.txt -o scores.ndjson --processes 8
+    $ python -m ASC3 score --request-dir requests/ -o scores_parquet/ --model_name ensemble --resume
+"""
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from logging import Logger
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+import torch
+
+ASC3_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(ASC3_DIR)
+sys.path.append(ROOT_DIR)
+
+from ASC3.mil_model.data_model import MILRequest
+from ASC3.mil_model.model import MILPredictor, EnsembleMILPredictor
+from core.data_model import PatientData
+
+PREDICTORS = {"mil": MILPredictor, "ensemble": EnsembleMILPredictor}
+
+# 워커 프로세스마다 1개씩 생성되는 피처라이징 전용 predictor (모델 미로딩)
+_worker_predictor: Optional[MILPredictor] = None
+
+
+def _init_worker(config: dict, logger: Logger) -> None:
+    global _worker_predictor
+    # 프로세스 수만큼 torch 스레드가 중복으로 생성되지 않도록 제한
+    torch.set_num_threads(1)
+    _worker_predictor = MILPredictor(config=config, logger=logger, load_model=False)
+
+
+def _featurize(source: str) -> Tuple[str, PatientData]:
+    """샘플ID 또는 MILRequest JSON 파일 경로로부터 PatientData 생성 (워커 프로세스에서 실행)"""
+    if source.endswith(".json"):
+        query = MILRequest.parse_file(source)
+        return query.sample_id, _worker_predictor.convert_query_to_patient_data(query)
+
+    return source, _worker_predictor.build_data_from_file(source)
+
+
+def list_sources(sample_ids: Optional[str], request_dir: Optional[str]) -> List[str]:
+    """스코어링 대상(샘플ID 또는 JSON 파일 경로) 목록"""
+    if request_dir:
+        return sorted(
+            os.path.join(request_dir, filename)
+            for filename in os.listdir(request_dir)
+            if filename.endswith(".json")
+        )
+
+    with open(sample_ids) as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+class ResultWriter:
+    """NDJSON 파일 또는 Parquet 디렉토리(배치마다 part 파일)에 결과를 기록하고 체크포인트를 남김
+
+    체크포인트(``<output>.checkpoint``)에는 결과가 디스크에 기록된 source가
+    한 줄씩 기록되며, ``--resume`` 시 이 목록의 source는 건너뜀.
+    """
+
+    def __init__(self, output: str, resume: bool) -> None:
+        self.output = output
+        self.is_parquet = output.endswith(".parquet") or output.endswith("/")
+        self.checkpoint_path = output.rstrip("/") + ".checkpoint"
+
+        if not resume:
+            for path in (self.checkpoint_path, output):
+                if os.path.isfile(path):
+                    os.remove(path)
+
+        if self.is_parquet:
+            os.makedirs(output, exist_ok=True)
+            if not resume:
+                # 이전 실행의 part 파일이 남아 있으면 새 결과와 섞이므로 삭제
+                for name in os.listdir(output):
+                    if name.startswith("part-") and name.endswith(".parquet"):
+                        os.remove(os.path.join(output, name))
+            self.n_parts = len([name for name in os.listdir(output) if name.endswith(".parquet")])
+
+    def completed(self) -> Set[str]:
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+
+        with open(self.checkpoint_path) as fh:
+            return {line.rstrip("\n") for line in fh if line.strip()}
+
+    def write(self, rows: List[dict], sources: List[str]) -> None:
+        if not rows:
+            return
+
+        if self.is_parquet:
+            import pandas as pd
+
+            frame = pd.DataFrame(
+                {
+                    "sample_id": [row["sample_id"] for row in rows],
+                    "patient_probability": [row["patient_probability"] for row in rows],
+                    "variant_probability": [
+                        json.dumps(row["variant_probability"]) for row in rows
+                    ],
+                }
+            )
+            part_path = os.path.join(self.output, "part-%05d.parquet" % self.n_parts)
+            frame.to_parquet(part_path, index=False)
+            self.n_parts += 1
+        else:
+            with open(self.output, "a") as fh:
+                for row in rows:
+                    fh.write(json.dumps(row) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+
+        # 결과가 디스크에 기록된 뒤에 체크포인트 갱신
+        with open(self.checkpoint_path, "a") as fh:
+            fh.write("".join(source + "\n" for source in sources))
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+def _chunks(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def score(
+    config: dict,
+    logger: Logger,
+    sources: List[str],
+    output: str,
+    model_name: str = "mil",
+    processes: int = 4,
+    batch_size: int = 64,
+    resume: bool = False,
+) -> dict:
+    """프로세스 풀로 피처라이징하고, 메인 프로세스에서 배치 단위로 추론하여 결과를 기록
+
+    다음 배치의 피처라이징이 워커에서 진행되는 동안 현재 배치를 추론함.
+
+    Args:
+        config (dict): config.yaml
+        logger (Logger): 로거
+        sources (List[str]): 샘플ID 또는 MILRequest JSON 경로 목록
+        output (str): ``.ndjson`` 파일 또는 ``.parquet`` 디렉토리
+        model_name (str): "mil" 또는 "ensemble"
+        processes (int): 피처라이징 프로세스 수
+        batch_size (int): 한 번에 기록(체크포인트)하는 샘플 수
+        resume (bool): 체크포인트에 기록된 샘플을 건너뛰고 이어서 진행
+
+    Returns:
+        dict: 처리 샘플 수, 소요 시간, samples/sec
+    """
+    writer = ResultWriter(output, resume=resume)
+    done = writer.completed()
+    pending = [source for source in sources if source not in done]
+    logger.info(
+        "Scoring %s samples (%s already done) with %s processes"
+        % (len(pending), len(sources) - len(pending), processes)
+    )
+
+    predictor = PREDICTORS[model_name](config=config, logger=logger)
+
+    n_scored = 0
+    n_failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=processes, initializer=_init_worker, initargs=(config, logger)
+    ) as executor:
+        batches = _chunks(pending, batch_size)
+        next_batch = next(batches, None)
+        futures = [executor.submit(_featurize, s) for s in next_batch or []]
+        while next_batch:
+            batch, batch_futures = next_batch, futures
+            # 현재 배치를 추론하는 동안 다음 배치를 미리 피처라이징
+            next_batch = next(batches, None)
+            futures = [executor.submit(_featurize, s) for s in next_batch or []]
+
+            rows = list()
+            scored_sources = list()
+            for source, future in zip(batch, batch_futures):
+                try:
+                    sample_id, patient_data = future.result()
+                    bag_prob, variant2score = predictor.predict(patient_data)
+                except Exception as e:
+                    n_failed += 1
+                    logger.error("Fail to score %s: %s" % (source, e))
+                    continue
+                rows.append(
+                    {
+                        "sample_id": sample_id,
+                        "patient_probability": bag_prob,
+                        "variant_probability": variant2score,
+                    }
+                )
+                scored_sources.append(source)
+
+            # 실패한 샘플은 체크포인트에 남기지 않아 --resume 시 재시도됨
+            writer.write(rows, scored_sources)
+            n_scored += len(rows)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                "Scored %s/%s samples (%.2f samples/sec)"
+                % (n_scored, len(pending), n_scored / elapsed if elapsed else 0.0)
+            )
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "scored": n_scored,
+        "failed": n_failed,
+        "skipped": len(sources) - len(pending),
+        "seconds": elapsed,
+        "samples_per_sec": n_scored / elapsed if elapsed else 0.0,
+    }
+    logger.info("Scoring finished: %s" % summary)
+    return summary
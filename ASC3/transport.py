@@ -0,0 +1,294 @@
+"""응답 인코딩과 요청/응답 압축
+
+- ``FastJSONResponse``: orjson이 설치되어 있으면 orjson으로, 아니면 표준 json으로 인코딩
+- ``round_scores``: variant_probability의 소수점 자릿수 제한
+- ``CompressionMiddleware``: Accept-Encoding에 따라 응답을 zstd 또는 gzip으로 압축
+- ``DecompressionMiddleware``: Content-Encoding이 gzip/zstd인 요청 body를 스트리밍으로 해제
+
+zstd는 zstandard 패키지가 설치된 경우에만 사용함.
+"""
+import gzip
+import json
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def dumps(content: Any) -> bytes:
+    """JSON bytes 인코딩 (orjson 우선)"""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def round_scores(variant2score: Dict[str, dict], digits: Optional[int]) -> Dict[str, dict]:
+    """{"snv": {gene-disease: {cpra: p}}, "cnv": {cpra: p}}의 점수를 digits 자리로 반올림
+
+    digits가 None이면 그대로 반환.
+    """
+    if digits is None:
+        return variant2score
+
+    return {
+        "snv": {
+            key: {cpra: round(prob, digits) for cpra, prob in cpra2prob.items()}
+            for key, cpra2prob in variant2score.get("snv", dict()).items()
+        },
+        "cnv": {
+            cpra: round(prob, digits) for cpra, prob in variant2score.get("cnv", dict()).items()
+        },
+    }
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """서버가 지원하는 압축 방식 (선호 순)"""
+    return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Accept-Encoding 헤더에서 사용할 압축 방식 선택. q=0인 방식은 제외"""
+    accepted = dict()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    candidates = [
+        encoding
+        for encoding in available_encodings()
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)))
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, zstd_level: int = 3) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=zstd_level).compress(body)
+    return gzip.compress(body, compresslevel=gzip_level)
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope.get("headers", list()):
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return ""
+
+
+def _without_headers(headers: List[Tuple[bytes, bytes]], names: Tuple[bytes, ...]) -> list:
+    return [(key, value) for key, value in headers if key.lower() not in names]
+
+
+class CompressionMiddleware:
+    """응답 body를 Accept-Encoding에 맞춰 zstd/gzip으로 압축
+
+    Args:
+        app (ASGIApp): 감쌀 ASGI 앱
+        minimum_size (int): 이 크기(bytes) 미만의 응답은 압축하지 않음
+        gzip_level (int): gzip 압축 레벨
+        zstd_level (int): zstd 압축 레벨
+    """
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(_header(scope, b"accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        chunks: List[bytes] = list()
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            headers = list(start_message.get("headers", list()))
+            already_encoded = any(key.lower() == b"content-encoding" for key, _ in headers)
+            if len(body) >= self.minimum_size and not already_encoded:
+                body = compress(body, encoding, self.gzip_level, self.zstd_level)
+                headers = _without_headers(headers, (b"content-length",))
+                headers += [
+                    (b"content-encoding", encoding.encode("latin-1")),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"vary", b"Accept-Encoding"),
+                ]
+
+            await send(dict(start_message, headers=headers))
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class RequestBodyError(Exception):
+    def __init__(self, status_code: int, detail: str) -> None:
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _find_body_error(exc: BaseException) -> Optional[RequestBodyError]:
+    """BaseHTTPMiddleware(anyio task group)를 거치면 ExceptionGroup으로 감싸지므로 내부까지 확인"""
+    if isinstance(exc, RequestBodyError):
+        return exc
+    for inner in getattr(exc, "exceptions", ()):
+        found = _find_body_error(inner)
+        if found is not None:
+            return found
+    return None
+
+
+class _BoundedDecompressor:
+    """해제 결과가 limit bytes를 넘는 즉시 413을 발생시키는 증분 해제기
+
+    gzip은 ``decompress(data, max_length)``와 ``unconsumed_tail``로, zstd는 출력 블록(최대 128KB)마다
+    호출되는 stream_writer로 해제하므로, 압축 폭탄이라도 limit + 블록 하나 이상은 메모리에 만들지 않음.
+    """
+
+    def __init__(self, encoding: str, limit: int) -> None:
+        self.encoding = encoding
+        self.limit = limit
+        self.size = 0
+        self._chunks: List[bytes] = list()
+        if encoding == "gzip":
+            self._zlib = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+        else:
+            self._zstd = zstandard.ZstdDecompressor().stream_writer(self)
+
+    def write(self, data: bytes) -> int:
+        """zstd stream_writer의 출력 대상"""
+        self.size += len(data)
+        if self.size > self.limit:
+            raise RequestBodyError(413, "Decompressed request body exceeds %s bytes" % self.limit)
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def decompress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "gzip":
+            while data:
+                self.write(self._zlib.decompress(data, self.limit - self.size + 1))
+                data = self._zlib.unconsumed_tail
+            if final:
+                self.write(self._zlib.flush())
+        elif data:
+            self._zstd.write(data)
+
+        body = b"".join(self._chunks)
+        self._chunks.clear()
+        return body
+
+
+class DecompressionMiddleware:
+    """Content-Encoding이 gzip/zstd인 요청 body를 받는 즉시(청크 단위로) 해제
+
+    해제 후 크기가 max_body_size를 넘는 순간 해제를 멈추고 413, 손상된 데이터면 400을 반환.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int = 512 * 2**20) -> None:
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def _reject(self, send: Send, error: RequestBodyError) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": error.status_code,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": dumps({"detail": error.detail})})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        encoding = _header(scope, b"content-encoding").strip().lower() if scope["type"] == "http" else ""
+        if encoding in ("", "identity"):
+            await self.app(scope, receive, send)
+            return
+
+        if encoding not in available_encodings():
+            await self._reject(send, RequestBodyError(415, "Unsupported Content-Encoding: %s" % encoding))
+            return
+
+        scope = dict(
+            scope,
+            headers=_without_headers(scope["headers"], (b"content-encoding", b"content-length")),
+        )
+        decompressor = _BoundedDecompressor(encoding, self.max_body_size)
+
+        async def receive_decompressed() -> Message:
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+
+            try:
+                body = decompressor.decompress(
+                    message.get("body", b""), final=not message.get("more_body", False)
+                )
+            except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+                raise RequestBodyError(400, "Invalid %s request body: %s" % (encoding, e))
+            return dict(message, body=body)
+
+        started = False
+
+        async def send_tracking(message: Message) -> None:
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive_decompressed, send_tracking)
+        except Exception as e:
+            error = _find_body_error(e)
+            if error is None or started:
+                raise
+            await self._reject(send, error)
@@ -0,0 +1,95 @@
+"""DxVar command line interface.
+
+Example:
+    $ python -m dxvar annotate cohort.vcf.gz -o cohort.tsv --workers 16
+    $ python -m dxvar annotate candidates.txt -o candidates.parquet
+"""
+import argparse
+import csv
+import gzip
+import os
+import sys
+from typing import Callable
+
+DXVAR_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(DXVAR_DIR)
+sys.path.append(ROOT_DIR)
+
+from dxvar.batch import RESULT_COLUMNS, BatchReport, annotate_to_frame
+from dxvar.engine import AnnotationEngine
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="dxvar")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    annotate = subparsers.add_parser("annotate", help="annotate a VCF or a variant list")
+    annotate.add_argument("input", type=str, help="VCF (.vcf/.vcf.gz) or one variant / rs value per line; - for stdin")
+    annotate.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        required=True,
+        help="output path; .parquet writes Parquet, anything else tab separated values",
+    )
+    annotate.add_argument("-w", "--workers", type=int, default=8, help="concurrent upstream lookups")
+    annotate.add_argument("-g", "--genome", type=str, default="hg38", choices=["hg38", "hg19"], help="build of VCF rows")
+    annotate.add_argument("--clingen", type=str, default=None, help="ClinGen gene-disease summary CSV (path or URL)")
+    annotate.add_argument("--timeout", type=float, default=30, help="seconds per upstream request")
+    return parser.parse_args()
+
+
+def open_input(path: str):
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def progress_printer(every: int = 100) -> Callable[[BatchReport], None]:
+    """``on_progress`` callback printing a line each time another ``every`` inputs have completed.
+
+    Several records can complete between two callbacks, so the line is printed when a multiple
+    of ``every`` is crossed rather than only when it is hit exactly.
+    """
+    printed = 0
+
+    def report_progress(report: BatchReport) -> None:
+        nonlocal printed
+        if report.records // every > printed // every:
+            printed = report.records
+            print(
+                f"{report.records} inputs, {report.variants} variants ({report.variants_per_second:.1f} variants/sec)",
+                file=sys.stderr,
+            )
+
+    return report_progress
+
+
+def annotate(args: argparse.Namespace) -> None:
+    engine = AnnotationEngine(clingen_source=args.clingen, workers=args.workers, timeout=args.timeout)
+    report = BatchReport()
+
+    with open_input(args.input) as lines:
+        rows = engine.annotate_lines(lines, genome=args.genome, report=report, on_progress=progress_printer())
+        if args.output.endswith(".parquet"):
+            annotate_to_frame(rows).to_parquet(args.output, index=False)
+        else:
+            # TSV rows are written as they complete, so memory stays flat for large inputs
+            with open(args.output, "w", newline="", encoding="utf-8") as fh:
+                writer = csv.DictWriter(fh, fieldnames=RESULT_COLUMNS, delimiter="\t", restval="")
+                writer.writeheader()
+                writer.writerows(rows)
+
+    print(
+        f"Annotated {report.records} inputs, {report.variants} variants into {report.rows} rows ({report.errors} errors) "
+        f"in {report.seconds:.1f}s: {report.variants_per_second:.1f} variants/sec",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    if ARGS.command == "annotate":
+        annotate(ARGS)
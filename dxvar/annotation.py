@@ -0,0 +1,126 @@
+"""SNP, GeneBe, InterVar and ClinGen lookups without any Streamlit dependency.
+
+Safe to call from worker threads: results are returned, never written to
+``st.session_state``. Pass a shared ``requests.Session`` to reuse pooled
+connections across calls.
+
+Each upstream can be pointed elsewhere (ex: a local stand-in from
+``dxvar.mock_services``) with DXVAR_SNP_URL, DXVAR_GENEBE_URL and DXVAR_INTERVAR_URL.
+"""
+import os
+import re
+from json.decoder import JSONDecodeError
+from typing import Dict, List, Optional
+
+import pandas as pd
+import requests
+
+SNP_URL = "https://clinicaltables.nlm.nih.gov/api/snps/v3/search"
+GENEBE_URL = "https://api.genebe.net/cloud/api-public/v1/variant"
+INTERVAR_URL = "http://wintervar.wglab.org/api_new.php"
+ENDPOINTS = {"snp": SNP_URL, "genebe": GENEBE_URL, "intervar": INTERVAR_URL}
+
+GENEBE_FIELDS = [
+    "acmg_classification",
+    "effect",
+    "gene_symbol",
+    "gene_hgnc_id",
+    "dbsnp",
+    "frequency_reference_population",
+    "acmg_score",
+    "acmg_criteria",
+]
+EMPTY_INTERVAR = ['-', '', '-', '']
+
+
+class AnnotationError(Exception):
+    """Lookup failed; the message is meant to be shown to the user."""
+
+
+def endpoint(name: str) -> str:
+    """URL of the "snp", "genebe" or "intervar" service; DXVAR_<NAME>_URL overrides it."""
+    return os.environ.get(f"DXVAR_{name.upper()}_URL") or ENDPOINTS[name]
+
+
+def lookup_rsid(snp_value: str, timeout: float = 30, session: Optional[requests.Session] = None) -> List[str]:
+    """Resolve an rs value to its GRCh38 alleles (ex: ["chr6:160585140-A>G"]).
+
+    Raises:
+        AnnotationError: invalid rs value, no result or a failed request
+    """
+    if not re.match(r'^rs[1-9]\d*$', snp_value, re.IGNORECASE):
+        raise AnnotationError("Invalid rs value provided. Please enter a valid rs value (e.g., rs1234).")
+
+    params = {
+        "df": "rsNum,38.chr,38.pos,38.alleles,38.gene",
+        "terms": snp_value
+    }
+    response = (session or requests).get(endpoint("snp"), params=params, timeout=timeout)
+    if response.status_code != 200:
+        raise AnnotationError(f"Error: {response.status_code}, {response.text}")
+
+    data = response.json()
+    # Check if data contains valid results
+    if not data[3] or len(data[3]) == 0:
+        raise AnnotationError("No results found for the provided rs value.")
+    # Extracting data from the first matching result
+    chr_num = data[3][0][1]       # Chromosome number
+    pos = int(data[3][0][2]) + 1    # Adjusting position (if 0-based, add 1)
+    alleles = data[3][0][3].split(', ')  # Alleles
+
+    # Format the results as a list of variant strings (e.g., "chr6:160585140-A>G")
+    return [f"chr{chr_num}:{pos}-{a.replace('/', '>')}" for a in alleles]
+
+
+def clingen_matches(df: pd.DataFrame, gene_symbol: str, hgnc_id: str) -> Dict[str, str]:
+    """ClinGen ``{disease label: classification}`` for the gene; empty if none."""
+    if 'GENE SYMBOL' not in df.columns or 'GENE ID (HGNC)' not in df.columns:
+        return dict()
+    matching_rows = df[(df['GENE SYMBOL'] == gene_symbol) & (df['GENE ID (HGNC)'] == hgnc_id)]
+    return dict(zip(matching_rows['DISEASE LABEL'], matching_rows['CLASSIFICATION']))
+
+
+def fetch_genebe(
+    parts: List[str], timeout: float = 30, session: Optional[requests.Session] = None
+) -> Optional[list]:
+    """GeneBe results in ``GeneBe_results`` order, or None if the call failed."""
+    params = {
+        "chr": parts[0],
+        "pos": parts[1],
+        "ref": parts[2],
+        "alt": parts[3],
+        "genome": parts[4]
+    }
+    headers = {
+        "Accept": "application/json"
+    }
+    response = (session or requests).get(endpoint("genebe"), headers=headers, params=params, timeout=timeout)
+    if response.status_code != 200:
+        return None
+    try:
+        variant = response.json()["variants"][0]  # Get the first variant
+    except (JSONDecodeError, KeyError, IndexError):
+        return None
+    return [variant.get(field, "Not Available") for field in GENEBE_FIELDS]
+
+
+def fetch_intervar(
+    parts: List[str], timeout: float = 30, session: Optional[requests.Session] = None
+) -> Optional[list]:
+    """InterVar results in ``InterVar_results`` order, or None if the call failed."""
+    params = {
+        "queryType": "position",
+        "chr": parts[0],
+        "pos": parts[1],
+        "ref": parts[2],
+        "alt": parts[3],
+        "build": parts[4]
+    }
+    response = (session or requests).get(endpoint("intervar"), params=params, timeout=timeout)
+    if response.status_code != 200:
+        return None
+    try:
+        results = response.json()
+    except JSONDecodeError:
+        return list(EMPTY_INTERVAR)
+    return [results.get("Intervar", "Not Available"), '', results.get("Gene", "Not Available"), '']
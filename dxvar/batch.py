@@ -0,0 +1,194 @@
+"""Batch annotation of many variants (VCF or pasted list) with bounded concurrency."""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import requests
+
+from dxvar.annotation import (
+    AnnotationError,
+    clingen_matches,
+    fetch_genebe,
+    fetch_intervar,
+    lookup_rsid,
+)
+from dxvar.variant_parser import normalize_chromosome, normalize_variant, parse_coordinates
+
+RESULT_COLUMNS = [
+    "Input",
+    "Variant",
+    "Classification",
+    "Effect",
+    "Gene",
+    "HGNC ID",
+    "dbsnp",
+    "freq. ref. pop.",
+    "acmg score",
+    "acmg criteria",
+    "InterVar",
+    "ClinGen diseases",
+    "Error",
+]
+
+
+@dataclass
+class VariantRecord:
+    """One line of input; ``parts`` is None when it still needs an rs lookup or failed to parse."""
+
+    source: str
+    parts: Optional[List[str]] = None
+    rs_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+def _vcf_records(fields: List[str], genome: str, source: str) -> Iterator[VariantRecord]:
+    chrom, pos, _, ref, alts = fields[:5]
+    for alt in alts.split(","):
+        if alt.startswith("<") or "[" in alt or "]" in alt or alt == "*":
+            yield VariantRecord(source, error=f"Unsupported symbolic ALT {alt}")
+            continue
+        alt = "" if alt == "." else alt
+        yield VariantRecord(source, parts=[normalize_chromosome(chrom), pos, ref.upper(), alt.upper(), genome])
+
+
+def iter_records(lines: Iterable[str], genome: str = "hg38") -> Iterator[VariantRecord]:
+    """Parse VCF data lines or a pasted list (one variant or rs value per line) lazily.
+
+    Header lines (``#``) are skipped, multi-allelic VCF rows are split per ALT
+    and free-text lines go through the same normalizer as the single query box.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+
+        fields = line.split("\t")
+        if len(fields) >= 5 and fields[1].isdigit():
+            yield from _vcf_records(fields, genome, line)
+            continue
+
+        normalized = normalize_variant(line)
+        if normalized is None:
+            yield VariantRecord(line, error="Could not parse variant")
+        elif normalized.lower().startswith("rs"):
+            yield VariantRecord(line, rs_id=normalized)
+        else:
+            yield VariantRecord(line, parts=normalized.split(","))
+
+
+def annotate_record(
+    record: VariantRecord,
+    clingen: pd.DataFrame,
+    session: Optional[requests.Session] = None,
+    timeout: float = 30,
+) -> List[Dict[str, str]]:
+    """Annotate one record against GeneBe, InterVar and the ClinGen table.
+
+    An rs value expands to one row per allele. ``timeout`` is in seconds per upstream request.
+    """
+    if record.error:
+        return [{"Input": record.source, "Error": record.error}]
+
+    if record.rs_id:
+        try:
+            alleles = lookup_rsid(record.rs_id, timeout=timeout, session=session)
+        except (AnnotationError, OSError) as e:
+            return [{"Input": record.source, "Error": str(e)}]
+        rows = list()
+        for allele in alleles:
+            parsed = parse_coordinates(allele)
+            expanded = VariantRecord(record.source, parts=parsed.to_csv().split(",")) if parsed else \
+                VariantRecord(record.source, error=f"Could not parse allele {allele}")
+            rows.extend(annotate_record(expanded, clingen, session, timeout))
+        return rows
+
+    parts = record.parts
+    row = {"Input": record.source, "Variant": "chr{}:{}-{}>{} ({})".format(*parts)}
+    try:
+        genebe = fetch_genebe(parts, timeout=timeout, session=session)
+        intervar = fetch_intervar(parts, timeout=timeout, session=session)
+    except OSError as e:
+        row["Error"] = str(e)
+        return [row]
+
+    if genebe is not None:
+        row.update(zip(RESULT_COLUMNS[2:10], genebe))
+        diseases = clingen_matches(clingen, genebe[2], "HGNC:" + str(genebe[3]))
+        row["ClinGen diseases"] = "; ".join(f"{label} ({cls})" for label, cls in diseases.items())
+    else:
+        row["Error"] = "GeneBe lookup failed"
+    if intervar is not None:
+        row["InterVar"] = intervar[0]
+    return [row]
+
+
+@dataclass
+class BatchReport:
+    records: int = 0
+    variants: int = 0
+    rows: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def variants_per_second(self) -> float:
+        return self.variants / self.seconds if self.seconds else 0.0
+
+
+def annotate_stream(
+    records: Iterable[VariantRecord],
+    clingen: pd.DataFrame,
+    workers: int = 8,
+    report: Optional[BatchReport] = None,
+    on_progress: Optional[Callable[[BatchReport], None]] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    session: Optional[requests.Session] = None,
+    timeout: float = 30,
+) -> Iterator[Dict[str, str]]:
+    """Yield annotated rows as they complete, with at most ``2 * workers`` records in flight.
+
+    ``records`` is consumed lazily, so a large VCF is never fully held in
+    memory before annotation starts.
+    """
+    report = report if report is not None else BatchReport()
+    own_executor = executor is None
+    executor = executor or ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dxvar-batch")
+    max_in_flight = 2 * workers
+    pending = set()
+    records = iter(records)
+    exhausted = False
+    try:
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                record = next(records, None)
+                if record is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(annotate_record, record, clingen, session, timeout))
+            if not pending:
+                break
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                rows = future.result()
+                report.records += 1
+                # An rs value expands to one annotated variant row per allele
+                report.variants += sum(1 for row in rows if "Variant" in row)
+                report.rows += len(rows)
+                report.errors += sum(1 for row in rows if row.get("Error"))
+                report.seconds = time.perf_counter() - report.started
+                yield from rows
+            if on_progress is not None:
+                on_progress(report)
+    finally:
+        for future in pending:
+            future.cancel()
+        if own_executor:
+            executor.shutdown(wait=False)
+
+
+def annotate_to_frame(rows: Iterable[Dict[str, str]]) -> pd.DataFrame:
+    return pd.DataFrame(list(rows), columns=RESULT_COLUMNS).fillna("")
@@ -0,0 +1,219 @@
+"""Replay a query mix through app.py offline and report per-step and per-rerun latency.
+
+The app is driven with Streamlit's script-testing API (``AppTest``) while the
+SNP, GeneBe, InterVar and Groq APIs are served by ``dxvar.mock_services`` on
+loopback ports, so latency and failures are injected rather than measured
+against the live services. Each query-mix line is one step; a step takes one
+rerun (text input or chat turn) or two (a multi-allelic rs value followed by an
+allele selection). For every rerun the wall time, the upstream calls made
+during it and the LLM time to first token are reported.
+
+Query mix lines are JSON objects:
+
+    {"input": "chr6:160585140-T>G"}
+    {"input": "rs121913529", "select": 1}
+    {"chat": "Which of these diseases are autosomal recessive?"}
+
+Example:
+    $ python dxvar/benchmarks/app_flow.py --repeat 3 --latency genebe=0.4 --latency groq=0.3 \\
+        --token-delay 0.01 --failure-rate intervar=0.2 --json app_flow.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from collections import defaultdict
+from typing import Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DXVAR_DIR = os.path.dirname(BENCHMARK_DIR)
+ROOT_DIR = os.path.dirname(DXVAR_DIR)
+sys.path.append(ROOT_DIR)
+
+from streamlit.testing.v1 import AppTest
+
+from dxvar.llm import latency_log
+from dxvar.mock_services import SERVICES, MockServices, ServiceProfile
+
+APP_PATH = os.path.join(ROOT_DIR, "app.py")
+DEFAULT_MIX = [
+    {"input": "chr6:160585140-T>G"},
+    {"input": "rs1801133"},
+    {"input": "rs121913529", "select": 1},
+    {"input": "17-43045712-A-G"},
+    {"input": "tell me about chromosome 6 position 160585140 T to G"},
+    {"chat": "Which of these diseases are autosomal recessive?"},
+    {"input": "rs334"},
+    {"chat": "How confident is the classification of this variant?"},
+    {"chat": "Summarize what we discussed so far."},
+]
+
+
+def load_mix(path: str) -> List[dict]:
+    with open(path, encoding="utf-8") as fh:
+        return [json.loads(line) for line in fh if line.strip() and not line.lstrip().startswith("#")]
+
+
+def parse_overrides(values: List[str], cast=float) -> Dict[str, float]:
+    """["genebe=0.4", ...] -> {"genebe": 0.4}"""
+    result = dict()
+    for value in values:
+        name, _, number = value.partition("=")
+        if name not in SERVICES:
+            raise SystemExit(f"unknown service {name!r}, expected one of {', '.join(SERVICES)}")
+        result[name] = cast(number)
+    return result
+
+
+def build_profiles(args: argparse.Namespace) -> Dict[str, ServiceProfile]:
+    latency = parse_overrides(args.latency)
+    jitter = parse_overrides(args.jitter)
+    failure_rate = parse_overrides(args.failure_rate)
+    profiles = dict()
+    for name in SERVICES:
+        profiles[name] = ServiceProfile(
+            latency=latency.get(name, 0.0),
+            jitter=jitter.get(name, 0.0),
+            failure_rate=failure_rate.get(name, 0.0),
+        )
+    profiles["groq"].token_delay = args.token_delay
+    profiles["groq"].reply_tokens = args.reply_tokens
+    return profiles
+
+
+def llm_calls() -> Dict[str, int]:
+    return {name: timing["calls"] for name, timing in latency_log.summary().items()}
+
+
+def timed_rerun(services: MockServices, step: int, action: str, text: str, run) -> dict:
+    """Run one rerun and collect its wall time, upstream calls and LLM timings."""
+    mark = services.log.mark()
+    calls_before = llm_calls()
+    start = time.perf_counter()
+    app = run()
+    seconds = time.perf_counter() - start
+
+    llm = dict()
+    for name, timing in latency_log.summary().items():
+        if timing["calls"] > calls_before.get(name, 0):
+            llm[name] = {"ttft": timing["last_ttft"], "total": timing["last_total"]}
+    return {
+        "step": step,
+        "action": action,
+        "text": text,
+        "seconds": seconds,
+        "upstream": services.log.summary(services.log.since(mark)),
+        "llm": llm,
+        "errors": [element.value for element in app.error] + [str(element.value) for element in app.exception],
+    }
+
+
+def replay(app: AppTest, services: MockServices, mix: List[dict], timeout: float) -> List[dict]:
+    """Replay the mix as one user session; returns one record per rerun."""
+    records = [timed_rerun(services, 0, "load", "", lambda: app.run(timeout=timeout))]
+    for step, query in enumerate(mix, start=1):
+        if "chat" in query:
+            chat = app.chat_input[0].set_value(query["chat"])
+            records.append(timed_rerun(services, step, "chat", query["chat"], lambda: chat.run(timeout=timeout)))
+            continue
+
+        text_input = next(widget for widget in app.text_input if widget.label.startswith("Enter a genetic variant"))
+        text_input.input(query["input"])
+        records.append(timed_rerun(services, step, "input", query["input"], lambda: text_input.run(timeout=timeout)))
+        if "select" in query and len(app.selectbox):
+            selectbox = app.selectbox[0]
+            option = selectbox.options[query["select"] % len(selectbox.options)]
+            selectbox.select(option)
+            records.append(timed_rerun(services, step, "select", option, lambda: selectbox.run(timeout=timeout)))
+    return records
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def print_reruns(records: List[dict]) -> None:
+    print("%4s %-7s %-40s %8s  %-34s %s" % ("step", "action", "text", "seconds", "upstream calls (s)", "llm ttft/total"))
+    for record in records:
+        upstream = " ".join(
+            "%s:%d%s(%.2f)" % (name, stats["calls"], "!%d" % stats["failures"] if stats["failures"] else "", stats["seconds"])
+            for name, stats in sorted(record["upstream"].items())
+        )
+        llm = " ".join(
+            "%s:%s/%.2f" % (name, "-" if timing["ttft"] is None else "%.2f" % timing["ttft"], timing["total"])
+            for name, timing in sorted(record["llm"].items())
+        )
+        print("%4d %-7s %-40.40s %8.3f  %-34s %s" % (record["step"], record["action"], record["text"], record["seconds"], upstream, llm))
+        for error in record["errors"]:
+            print("%4s %-7s ! %s" % ("", "", error.splitlines()[0] if error else error))
+
+
+def print_summary(records: List[dict]) -> None:
+    steps = defaultdict(float)
+    by_action = defaultdict(list)
+    for record in records:
+        steps[(record["repeat"], record["step"])] += record["seconds"]
+        by_action[record["action"]].append(record["seconds"])
+
+    print("\n%-7s %5s %8s %8s %8s %8s" % ("rerun", "n", "mean", "p50", "p95", "max"))
+    for action, values in by_action.items():
+        print(
+            "%-7s %5d %8.3f %8.3f %8.3f %8.3f"
+            % (action, len(values), statistics.mean(values), percentile(values, 0.5), percentile(values, 0.95), max(values))
+        )
+    step_seconds = [seconds for (_, step), seconds in steps.items() if step > 0]
+    if step_seconds:
+        print(
+            "%-7s %5d %8.3f %8.3f %8.3f %8.3f"
+            % ("step", len(step_seconds), statistics.mean(step_seconds), percentile(step_seconds, 0.5),
+               percentile(step_seconds, 0.95), max(step_seconds))
+        )
+    errors = sum(len(record["errors"]) for record in records)
+    print("%d reruns, %d with errors shown to the user" % (len(records), errors))
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=str, default=None, help="query mix, one JSON object per line")
+    parser.add_argument("--repeat", type=int, default=1, help="sessions to replay (caches are shared between them)")
+    parser.add_argument("--shuffle", action="store_true", help="shuffle the mix for every session")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SECONDS")
+    parser.add_argument("--jitter", action="append", default=[], metavar="SERVICE=SECONDS")
+    parser.add_argument("--failure-rate", action="append", default=[], metavar="SERVICE=P")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed Groq tokens")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="tokens per Groq reply")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds allowed per rerun")
+    parser.add_argument("--json", type=str, default=None, help="write every rerun record to this file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    ARGS = get_args()
+    MIX = load_mix(ARGS.queries) if ARGS.queries else DEFAULT_MIX
+    RNG = random.Random(ARGS.seed)
+
+    RECORDS = list()
+    with MockServices(profiles=build_profiles(ARGS), seed=ARGS.seed) as MOCKS:
+        os.environ.update(MOCKS.env())
+        for repeat in range(ARGS.repeat):
+            mix = RNG.sample(MIX, len(MIX)) if ARGS.shuffle else MIX
+            app = AppTest.from_file(APP_PATH, default_timeout=ARGS.timeout)
+            app.secrets["GROQ_API_KEY"] = "mock"
+            session = replay(app, MOCKS, mix, ARGS.timeout)
+            for record in session:
+                record["repeat"] = repeat
+            print("\nsession %d" % repeat)
+            print_reruns(session)
+            RECORDS.extend(session)
+
+        print_summary(RECORDS)
+        print("\nupstream totals:", json.dumps(MOCKS.log.summary()))
+
+    if ARGS.json:
+        with open(ARGS.json, "w") as fh:
+            json.dump(RECORDS, fh, indent=2)
@@ -0,0 +1,109 @@
+"""Token-bounded conversation memory for the follow-up chatbot."""
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+# Roughly 4 characters per token for English text, plus the per-message framing the API adds
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation between a clinician and a genomics assistant. "
+    "Keep every variant, gene, disease and classification that was mentioned, and the user's open questions. "
+    "Reply with the summary only, in at most 150 words."
+)
+
+
+def estimate_tokens(messages: List[dict]) -> int:
+    return sum(
+        len(message["content"]) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS for message in messages
+    )
+
+
+@dataclass
+class PromptReport:
+    prompt_tokens: int
+    unbounded_tokens: int
+    recent_messages: int
+    summarized_messages: int
+
+
+@dataclass
+class ConversationMemory:
+    """Keeps the prompt sent per chat turn under ``token_budget``.
+
+    The full history stays in ``st.session_state["messages"]`` for display;
+    only the prompt is bounded. Turns that no longer fit are folded into a
+    rolling summary by ``summarizer`` and the variant/ClinGen context is
+    pinned right after the system prompt on every turn.
+
+    Args:
+        summarizer (Callable[[List[dict]], str]): turns a list of messages into a summary
+        token_budget (int): estimated tokens allowed for system + context + summary + turns
+        min_recent_messages (int): most recent messages always sent verbatim
+    """
+
+    summarizer: Callable[[List[dict]], str]
+    token_budget: int = 3000
+    min_recent_messages: int = 4
+    summary: str = ""
+    summarized_upto: int = 0
+    last_report: Optional[PromptReport] = field(default=None)
+
+    def _summarize(self, history: List[dict], upto: int) -> None:
+        pending = history[self.summarized_upto : upto]
+        if not pending:
+            return
+        if self.summary:
+            pending = [{"role": "system", "content": f"Earlier summary: {self.summary}"}] + pending
+        try:
+            self.summary = self.summarizer(pending)
+        except Exception:
+            # Keep the conversation going without the LLM: fall back to the tail of the text
+            text = " ".join(f"{message['role']}: {message['content']}" for message in pending)
+            self.summary = text[-self.token_budget * CHARS_PER_TOKEN // 4 :]
+        self.summarized_upto = upto
+
+    def build_prompt(
+        self, system: List[dict], history: List[dict], pinned_context: Optional[str] = None
+    ) -> List[dict]:
+        """Messages to send for this turn; also sets ``last_report``."""
+        head = list(system)
+        if pinned_context:
+            head.append({"role": "system", "content": pinned_context})
+
+        def assemble(start: int) -> List[dict]:
+            summary = (
+                [{"role": "system", "content": f"Summary of the earlier conversation: {self.summary}"}]
+                if self.summary
+                else []
+            )
+            return head + summary + history[start:]
+
+        start = self.summarized_upto
+        messages = assemble(start)
+        # Drop the oldest verbatim turns into the summary until the prompt fits
+        if estimate_tokens(messages) > self.token_budget:
+            cut = start
+            newest_allowed = max(len(history) - self.min_recent_messages, start)
+            while cut < newest_allowed and estimate_tokens(head + history[cut:]) > self.token_budget * 3 // 4:
+                cut += 1
+            if cut > start:
+                self._summarize(history, cut)
+                messages = assemble(cut)
+
+        self.last_report = PromptReport(
+            prompt_tokens=estimate_tokens(messages),
+            unbounded_tokens=estimate_tokens(head + history),
+            recent_messages=len(history) - self.summarized_upto,
+            summarized_messages=self.summarized_upto,
+        )
+        return messages
+
+
+def summary_messages(pending: List[dict]) -> List[dict]:
+    """Prompt for the summarizer call."""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in pending)
+    return [
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": transcript},
+    ]
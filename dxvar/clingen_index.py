@@ -0,0 +1,120 @@
+"""BM25 search over the ClinGen gene-disease summary, used to ground chatbot turns.
+
+Each ClinGen row is one document made of its gene symbol, disease label,
+MONDO ID and GCEP. The index is built once per process and only the best
+matching rows are pinned into a chat prompt, so the model cites curated
+gene-disease validity without the whole table being sent. Rows that only
+share a common word with the question are not pinned.
+
+Example:
+    >>> index = ClinGenIndex(pd.read_csv(default_clingen_source()))
+    >>> print(index.context("is MONDO:0018997 linked to RAF1?", k=2))
+    Curated ClinGen gene-disease validity matching the question:
+    - RAF1 / Noonan syndrome (MONDO:0018997), AD: Definitive [RASopathy Gene Curation Expert Panel]
+    ...
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+# Field weights: an exact gene symbol or MONDO ID is a much stronger signal than a shared word
+FIELD_WEIGHTS = {
+    "GENE SYMBOL": 3,
+    "DISEASE ID (MONDO)": 3,
+    "DISEASE LABEL": 1,
+    "GCEP": 1,
+}
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it its me of on or tell that the this "
+    "to was what which who why with about any there these those my your you".split()
+    # chat vocabulary that names the subject of every question, not a disease (ex: "what does this variant mean")
+    + "variant variants mutation mutations patient".split()
+)
+_TOKEN = re.compile(r"[a-z0-9]+(?::\d+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words; IDs such as ``MONDO:0018997`` stay one token."""
+    return [token for token in _TOKEN.findall(str(text).lower()) if token not in STOPWORDS]
+
+
+class ClinGenIndex:
+    """Okapi BM25 over ClinGen rows.
+
+    Args:
+        clingen (pd.DataFrame): the ClinGen gene-disease summary table
+        k1 (float): term frequency saturation
+        b (float): document length normalization
+        max_df (float): query terms found in more than this fraction of rows are ignored
+            (GCEP boilerplate such as "gene curation expert panel", "syndrome")
+        min_score (float): rows scoring below this are not returned; one shared common word
+            such as "disease" scores under it, a gene symbol or MONDO ID scores well above
+    """
+
+    def __init__(
+        self,
+        clingen: pd.DataFrame,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_df: float = 0.2,
+        min_score: float = 3.0,
+    ) -> None:
+        self.rows = clingen.reset_index(drop=True)
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self.min_score = min_score
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        lengths = list()
+        fields = [name for name in FIELD_WEIGHTS if name in self.rows.columns]
+        for row_id, values in enumerate(self.rows[fields].fillna("").itertuples(index=False)):
+            counts = Counter()
+            for name, value in zip(fields, values):
+                for token in tokenize(value):
+                    counts[token] += FIELD_WEIGHTS[name]
+            for token, tf in counts.items():
+                self.postings[token].append((row_id, tf))
+            lengths.append(sum(counts.values()))
+
+        self.lengths = lengths
+        self.mean_length = sum(lengths) / len(lengths) if lengths else 0.0
+        n_rows = len(lengths)
+        self.idf = {
+            token: math.log(1 + (n_rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            for token, rows in self.postings.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """``(row position, score)`` of the ``k`` best rows scoring at least ``min_score``."""
+        scores: Dict[int, float] = defaultdict(float)
+        max_rows = max(self.max_df * len(self), 1)
+        for token in set(tokenize(query)):
+            idf = self.idf.get(token)
+            if idf is None or len(self.postings[token]) > max_rows:
+                continue
+            for row_id, tf in self.postings[token]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[row_id] / self.mean_length)
+                scores[row_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        hits = [(row_id, score) for row_id, score in scores.items() if score >= self.min_score]
+        return sorted(hits, key=lambda item: (-item[1], item[0]))[:k]
+
+    def context(self, query: str, k: int = 5) -> Optional[str]:
+        """Prompt block with the best matching rows, or None if nothing matches."""
+        hits = self.search(query, k)
+        if not hits:
+            return None
+        lines = ["Curated ClinGen gene-disease validity matching the question:"]
+        for row_id, _ in hits:
+            row = self.rows.iloc[row_id]
+            lines.append(
+                f"- {row.get('GENE SYMBOL')} / {row.get('DISEASE LABEL')} ({row.get('DISEASE ID (MONDO)')}), "
+                f"{row.get('MOI')}: {row.get('CLASSIFICATION')} [{row.get('GCEP')}]"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,140 @@
+"""Headless DxVar annotation engine, shared by the Streamlit app and the CLI.
+
+Example:
+    >>> from dxvar.engine import AnnotationEngine
+    >>> engine = AnnotationEngine(workers=16)
+    >>> engine.resolve("rs1234")
+    [['6', '160585140', 'A', 'G', 'hg38'], ...]
+    >>> result = engine.annotate(["6", "160585140", "T", "G", "hg38"])
+    >>> result.genebe[0], result.clingen
+    ('Pathogenic', {'...': 'Definitive'})
+"""
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from dxvar.annotation import (
+    EMPTY_INTERVAR,
+    clingen_matches,
+    fetch_genebe,
+    fetch_intervar,
+    lookup_rsid,
+)
+from dxvar.batch import BatchReport, annotate_stream, iter_records
+from dxvar.variant_parser import normalize_variant, parse_coordinates
+
+DXVAR_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(DXVAR_DIR)
+CLINGEN_FILENAME = "Clingen-Gene-Disease-Summary-2025-01-03.csv"
+CLINGEN_URL = f"https://github.com/wah644/streamlit_app.py/blob/main/{CLINGEN_FILENAME}?raw=true"
+
+
+def default_clingen_source() -> str:
+    """DXVAR_CLINGEN_CSV, else the copy shipped in the repository, else the GitHub URL."""
+    local_path = os.path.join(ROOT_DIR, CLINGEN_FILENAME)
+    return os.environ.get("DXVAR_CLINGEN_CSV") or (local_path if os.path.exists(local_path) else CLINGEN_URL)
+
+
+@dataclass
+class VariantAnnotation:
+    parts: List[str]
+    genebe: Optional[list] = None
+    intervar: List[str] = field(default_factory=lambda: list(EMPTY_INTERVAR))
+    clingen: Dict[str, str] = field(default_factory=dict)
+
+
+class AnnotationEngine:
+    """Variant resolution and GeneBe/InterVar/ClinGen annotation without Streamlit.
+
+    Args:
+        clingen_source (str, optional): path or URL of the ClinGen gene-disease summary CSV
+        workers (int): size of the thread pool and of the HTTP connection pool
+        timeout (float): seconds per upstream HTTP request
+    """
+
+    def __init__(self, clingen_source: Optional[str] = None, workers: int = 8, timeout: float = 30) -> None:
+        self.clingen_source = clingen_source or default_clingen_source()
+        self.clingen: pd.DataFrame = pd.read_csv(self.clingen_source)
+        self.workers = workers
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dxvar")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def resolve(self, text: str) -> List[List[str]]:
+        """Variant parts for free text; an rs value resolves to one entry per allele.
+
+        Raises:
+            AnnotationError: the rs lookup failed
+            ValueError: the text is not a variant the local parser understands
+        """
+        normalized = normalize_variant(text)
+        if normalized is None:
+            raise ValueError(f"Invalid variant format: {text}")
+        if not normalized.lower().startswith("rs"):
+            return [normalized.split(",")]
+
+        alleles = lookup_rsid(normalized, timeout=self.timeout, session=self.session)
+        parsed = [parse_coordinates(allele) for allele in alleles]
+        return [variant.to_csv().split(",") for variant in parsed if variant is not None]
+
+    def find_gene_match(self, gene_symbol: str, hgnc_id: str) -> Dict[str, str]:
+        return clingen_matches(self.clingen, gene_symbol, hgnc_id)
+
+    def gene_match_rows(self, gene_symbol: str, hgnc_id: str) -> pd.DataFrame:
+        matching_rows = self.clingen[
+            (self.clingen['GENE SYMBOL'] == gene_symbol) & (self.clingen['GENE ID (HGNC)'] == hgnc_id)
+        ]
+        return matching_rows[['DISEASE LABEL', 'MOI', 'CLASSIFICATION', 'DISEASE ID (MONDO)']]
+
+    def submit_genebe(self, parts: List[str]) -> Future:
+        return self.executor.submit(fetch_genebe, parts, self.timeout, self.session)
+
+    def submit_intervar(self, parts: List[str]) -> Future:
+        return self.executor.submit(fetch_intervar, parts, self.timeout, self.session)
+
+    def annotate(self, parts: List[str]) -> VariantAnnotation:
+        """GeneBe and InterVar are queried concurrently, then matched against ClinGen."""
+        genebe_future = self.submit_genebe(parts)
+        intervar_future = self.submit_intervar(parts)
+
+        annotation = VariantAnnotation(parts, genebe=genebe_future.result())
+        intervar = intervar_future.result()
+        if intervar is not None:
+            annotation.intervar = intervar
+        if annotation.genebe is not None:
+            annotation.clingen = self.find_gene_match(
+                annotation.genebe[2], 'HGNC:' + str(annotation.genebe[3])
+            )
+        return annotation
+
+    def annotate_lines(
+        self,
+        lines: Iterable[str],
+        genome: str = "hg38",
+        report: Optional[BatchReport] = None,
+        on_progress=None,
+        workers: Optional[int] = None,
+    ) -> Iterator[Dict[str, str]]:
+        """Annotate VCF lines or a variant list, yielding result rows as they complete.
+
+        Records are annotated on the engine's thread pool; ``workers`` only bounds how many are in flight.
+        """
+        return annotate_stream(
+            iter_records(lines, genome=genome),
+            self.clingen,
+            workers=workers or self.workers,
+            report=report,
+            on_progress=on_progress,
+            executor=self.executor,
+            session=self.session,
+            timeout=self.timeout,
+        )
@@ -0,0 +1,154 @@
+"""Streaming helpers around the Groq chat completion API."""
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional
+
+MODEL = "llama-3.3-70b-versatile"
+
+
+@dataclass
+class CompletionTiming:
+    """Latency of one completion; ``ttft`` is None until the first token arrives."""
+
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    ttft: Optional[float] = None
+    total: Optional[float] = None
+    chunks: int = 0
+
+
+class LatencyLog:
+    """Keeps the most recent completion timings per call site (initial, explanation, chat)."""
+
+    def __init__(self, maxlen: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._records: Dict[str, deque] = defaultdict(lambda: deque(maxlen=maxlen))
+
+    def add(self, timing: CompletionTiming) -> None:
+        with self._lock:
+            self._records[timing.name].append(timing)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            records = {name: list(values) for name, values in self._records.items()}
+
+        result = dict()
+        for name, values in records.items():
+            ttfts = [value.ttft for value in values if value.ttft is not None]
+            totals = [value.total for value in values if value.total is not None]
+            result[name] = {
+                "calls": len(values),
+                "mean_ttft": sum(ttfts) / len(ttfts) if ttfts else None,
+                "mean_total": sum(totals) / len(totals) if totals else None,
+                "last_ttft": values[-1].ttft,
+                "last_total": values[-1].total,
+            }
+        return result
+
+
+latency_log = LatencyLog()
+
+
+def stream_completion(
+    client,
+    messages: List[dict],
+    name: str,
+    max_completion_tokens: int = 1024,
+    model: str = MODEL,
+    on_timing: Optional[Callable[[CompletionTiming], None]] = None,
+) -> Iterator[str]:
+    """Yield the assistant reply token by token.
+
+    Time-to-first-token and total latency are recorded separately in
+    ``latency_log`` under ``name`` once the stream is exhausted or closed.
+
+    Example:
+        >>> with st.chat_message("assistant"):
+        ...     reply = st.write_stream(stream_completion(client, messages, name="chat"))
+    """
+    timing = CompletionTiming(name)
+    try:
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=1,
+            max_completion_tokens=max_completion_tokens,
+            top_p=1,
+            stream=True,
+            stop=None,
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            if timing.ttft is None:
+                timing.ttft = time.perf_counter() - timing.started
+            timing.chunks += 1
+            yield delta
+    finally:
+        timing.total = time.perf_counter() - timing.started
+        latency_log.add(timing)
+        if on_timing is not None:
+            on_timing(timing)
+
+
+def complete(client, messages: List[dict], name: str, **kwargs) -> str:
+    """Non-incremental convenience wrapper that still records TTFT."""
+    return "".join(stream_completion(client, messages, name, **kwargs))
+
+
+class BackgroundStream:
+    """Consumes a chunk iterator on an executor thread so the page can keep rendering.
+
+    Iterating yields every chunk produced so far and then the rest as they
+    arrive; it can be iterated again on a later rerun. The producer keeps
+    running if the Streamlit rerun is interrupted, so cache writes wrapped
+    around ``chunks`` still complete.
+    """
+
+    def __init__(self, chunks: Iterator[str], executor) -> None:
+        self._chunks: List[str] = list()
+        self._error: Optional[Exception] = None
+        self._done = False
+        self._condition = threading.Condition()
+        self.future = executor.submit(self._produce, chunks)
+
+    def _produce(self, chunks: Iterator[str]) -> None:
+        try:
+            for chunk in chunks:
+                with self._condition:
+                    self._chunks.append(chunk)
+                    self._condition.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    @property
+    def text(self) -> str:
+        with self._condition:
+            return "".join(self._chunks)
+
+    def __iter__(self) -> Iterator[str]:
+        index = 0
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: index < len(self._chunks) or self._done)
+                pending = self._chunks[index:]
+                finished = self._done
+            index += len(pending)
+            yield from pending
+            if finished and index == len(self._chunks):
+                if self._error is not None:
+                    raise self._error
+                return
@@ -0,0 +1,262 @@
+"""Process-wide scheduler in front of the Groq chat completion API.
+
+Every Streamlit session shares one ``LLMGateway`` so that:
+
+- requests and tokens per minute stay inside the account's rate budget;
+  requests wait in a queue instead of failing with 429
+- rate limits, 5xx responses and connection errors are retried with
+  exponential backoff and full jitter, honouring ``retry-after``; a 429
+  pauses every queued request, not only the one that hit it
+- identical prompts already in flight (ex: the same disease explanation
+  requested by two sessions) share a single upstream call
+- interactive calls (chat, variant normalization) are admitted before
+  background ones (disease explanations)
+
+Queue wait, retries and coalesced calls are reported by ``stats()``.
+
+Example:
+    >>> gateway = gateway_from_env(Groq(api_key=key, max_retries=0))
+    >>> reply = st.write_stream(gateway.stream(messages, name="chat"))
+"""
+import itertools
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional
+
+from dxvar.chat_memory import CHARS_PER_TOKEN, estimate_tokens
+from dxvar.llm import MODEL, BackgroundStream, stream_completion
+from dxvar.response_cache import make_key
+
+try:
+    from groq import APIConnectionError
+except ImportError:
+    APIConnectionError = ()
+
+INTERACTIVE = 0
+BACKGROUND = 1
+RETRY_STATUS = {429, 500, 502, 503, 504}
+WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class _Ticket:
+    key: str
+    priority: int
+    tokens: int
+    seq: int
+    reservation: Optional[list] = field(default=None)
+
+
+class LLMGateway:
+    """Rate-limited, deduplicating, prioritized access to one Groq client.
+
+    Args:
+        client: ``groq.Groq`` client; create it with ``max_retries=0`` so retries are done here
+        requests_per_minute (int): request budget over a sliding minute
+        tokens_per_minute (int): token budget (prompt + ``max_completion_tokens``) over a sliding minute
+        max_concurrent (int): upstream calls running at once
+        max_retries (int): retries of a call that failed before its first token
+        backoff_base (float): first backoff in seconds, doubled per retry
+        backoff_cap (float): longest backoff in seconds
+        workers (int): threads that wait for admission and consume the streams
+    """
+
+    def __init__(
+        self,
+        client,
+        requests_per_minute: int = 30,
+        tokens_per_minute: int = 12000,
+        max_concurrent: int = 8,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 20.0,
+        workers: int = 32,
+    ) -> None:
+        self.client = client
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrent = max_concurrent
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm")
+
+        self._condition = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: List[_Ticket] = list()
+        self._window: deque = deque()  # [admitted at, tokens] per call in the last minute
+        self._running = 0
+        self._blocked_until = 0.0
+        self._jobs = dict()
+        self._tickets = dict()
+        self._random = random.Random()
+
+        self._waits: deque = deque(maxlen=500)
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def stream(
+        self,
+        messages: List[dict],
+        name: str,
+        priority: int = INTERACTIVE,
+        max_completion_tokens: int = 1024,
+        model: str = MODEL,
+    ) -> Iterator[str]:
+        """Yield the reply token by token once the call is admitted; same contract as ``stream_completion``."""
+        key = make_key(model, messages, max_completion_tokens)
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is not None:
+                self.coalesced += 1
+                # A waiting background call is promoted when an interactive one joins it
+                ticket = self._tickets[key]
+                ticket.priority = min(ticket.priority, priority)
+                self._condition.notify_all()
+                return iter(job)
+
+            ticket = _Ticket(
+                key,
+                priority,
+                estimate_tokens(messages) + max_completion_tokens,
+                next(self._seq),
+            )
+            self._tickets[key] = ticket
+            job = BackgroundStream(
+                self._call(ticket, messages, name, max_completion_tokens, model), self.executor
+            )
+            self._jobs[key] = job
+            return iter(job)
+
+    def complete(self, messages: List[dict], name: str, **kwargs) -> str:
+        return "".join(self.stream(messages, name, **kwargs))
+
+    def _call(
+        self, ticket: _Ticket, messages: List[dict], name: str, max_completion_tokens: int, model: str
+    ) -> Iterator[str]:
+        try:
+            for attempt in range(self.max_retries + 1):
+                self._acquire(ticket)
+                produced = 0
+                try:
+                    for chunk in stream_completion(
+                        self.client, messages, name, max_completion_tokens=max_completion_tokens, model=model
+                    ):
+                        produced += len(chunk)
+                        yield chunk
+                    return
+                except Exception as e:
+                    # Once tokens were handed out the call can not be replayed transparently
+                    delay = self._retry_delay(e, attempt) if produced == 0 else None
+                    if delay is None:
+                        with self._condition:
+                            self.failures += 1
+                        raise
+                    with self._condition:
+                        self.retries += 1
+                finally:
+                    self._release(ticket, estimate_tokens(messages) + produced // CHARS_PER_TOKEN)
+                time.sleep(delay)
+        finally:
+            with self._condition:
+                self._jobs.pop(ticket.key, None)
+                self._tickets.pop(ticket.key, None)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the error is final."""
+        status = getattr(error, "status_code", None)
+        if attempt >= self.max_retries or (status not in RETRY_STATUS and not isinstance(error, APIConnectionError)):
+            return None
+
+        delay = self._random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        try:
+            delay = max(delay, float(retry_after)) if retry_after else delay
+        except ValueError:
+            pass
+        if status == 429:
+            with self._condition:
+                self.rate_limited += 1
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        return delay
+
+    def _admission_delay(self, ticket: _Ticket) -> Optional[float]:
+        """0 if the ticket may start now, else seconds until it might (None: until notified)."""
+        head = min(self._waiting, key=lambda waiting: (waiting.priority, waiting.seq))
+        if head is not ticket or self._running >= self.max_concurrent:
+            return None
+
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+        if not self._window:
+            return 0
+        until_oldest_expires = self._window[0][0] + WINDOW_SECONDS - now
+        if len(self._window) >= self.requests_per_minute:
+            return until_oldest_expires
+        if sum(tokens for _, tokens in self._window) + ticket.tokens > self.tokens_per_minute:
+            return until_oldest_expires
+        return 0
+
+    def _acquire(self, ticket: _Ticket) -> None:
+        queued_at = time.perf_counter()
+        with self._condition:
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    delay = self._admission_delay(ticket)
+                    if delay == 0:
+                        break
+                    self._condition.wait(timeout=delay)
+            finally:
+                self._waiting.remove(ticket)
+            self._running += 1
+            self.requests += 1
+            ticket.reservation = [time.monotonic(), ticket.tokens]
+            self._window.append(ticket.reservation)
+            self._waits.append(time.perf_counter() - queued_at)
+            self._condition.notify_all()
+
+    def _release(self, ticket: _Ticket, used_tokens: int) -> None:
+        with self._condition:
+            self._running -= 1
+            # Replace the worst-case reservation with what the call is estimated to have used
+            ticket.reservation[1] = used_tokens
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        with self._condition:
+            waits = sorted(self._waits)
+            return {
+                "queued": len(self._waiting),
+                "running": self._running,
+                "requests": self.requests,
+                "retries": self.retries,
+                "rate_limited": self.rate_limited,
+                "coalesced": self.coalesced,
+                "failures": self.failures,
+                "mean_wait": sum(waits) / len(waits) if waits else 0.0,
+                "p95_wait": waits[min(int(0.95 * len(waits)), len(waits) - 1)] if waits else 0.0,
+            }
+
+
+def gateway_from_env(client) -> LLMGateway:
+    """Build the gateway from DXVAR_GROQ_RPM / _TPM / _CONCURRENCY / _MAX_RETRIES environment variables."""
+    return LLMGateway(
+        client,
+        requests_per_minute=int(os.environ.get("DXVAR_GROQ_RPM", 30)),
+        tokens_per_minute=int(os.environ.get("DXVAR_GROQ_TPM", 12000)),
+        max_concurrent=int(os.environ.get("DXVAR_GROQ_CONCURRENCY", 8)),
+        max_retries=int(os.environ.get("DXVAR_GROQ_MAX_RETRIES", 4)),
+    )
@@ -0,0 +1,354 @@
+"""Local stand-ins for the SNP, GeneBe, InterVar and Groq APIs.
+
+Each service runs on its own loopback port with configurable latency, jitter
+and failure rate, and every request is recorded so a caller can attribute
+time to upstream calls. Responses are deterministic for a given input:
+
+- SNP: rs values divisible by 3 (ex: rs121913529) resolve to three alleles,
+  every other rs value to one; rs values of 10 digits or more are not found
+- GeneBe: the gene is picked from the ClinGen table by position, so the
+  ClinGen gene-disease lookup always has rows to show
+- Groq: ``/openai/v1/chat/completions``, streamed (server-sent events) or not;
+  the variant-normalization prompt is answered in the CSV format it asks for
+
+Example:
+    >>> with MockServices(profiles={"genebe": ServiceProfile(latency=0.3)}) as services:
+    ...     os.environ.update(services.env())
+    ...     lookup_rsid("rs121913529")
+    ['chr2:...-C>A', 'chr2:...-C>G', 'chr2:...-C>T']
+"""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from dxvar.engine import default_clingen_source
+
+SERVICES = ("snp", "genebe", "intervar", "groq")
+ACMG_CLASSES = ["Pathogenic", "Likely_pathogenic", "Uncertain_significance", "Likely_benign", "Benign"]
+INTERVAR_CLASSES = ["Pathogenic", "Likely pathogenic", "Uncertain significance", "Likely benign", "Benign"]
+REPLY_WORDS = (
+    "The listed conditions share the same gene and differ mostly in onset, inheritance "
+    "and severity; refuted associations are not discussed further."
+).split()
+
+_RS_VALUE = re.compile(r"\b(rs[1-9]\d*)\b", re.IGNORECASE)
+_COORDINATES = re.compile(
+    r"(?:chr|chromosome)?\s*\b([1-9]|1\d|2[0-2]|X|Y|MT?)\b\D+?(\d+)\W+([ACGT]+)\s*(?:>|\bto\b)\s*([ACGT]*)", re.IGNORECASE
+)
+
+
+@dataclass
+class ServiceProfile:
+    """Injected behaviour of one stand-in service.
+
+    ``latency`` (plus or minus ``jitter``) is spent before the response starts;
+    for Groq it is the time to first token and ``token_delay`` is added per token.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    token_delay: float = 0.0
+    reply_tokens: int = 60
+
+
+@dataclass
+class RequestRecord:
+    service: str
+    path: str
+    started: float
+    seconds: float = 0.0
+    status: int = 200
+
+
+class RequestLog:
+    """Requests served by every stand-in, in arrival order."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._records: List[RequestRecord] = list()
+
+    def add(self, record: RequestRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+
+    def mark(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+    def since(self, mark: int) -> List[RequestRecord]:
+        with self._lock:
+            return list(self._records[mark:])
+
+    def summary(self, records: Optional[List[RequestRecord]] = None) -> Dict[str, dict]:
+        """``{service: {"calls", "failures", "seconds"}}``; ``seconds`` is summed handler time."""
+        records = self.since(0) if records is None else records
+        result = dict()
+        for record in records:
+            stats = result.setdefault(record.service, {"calls": 0, "failures": 0, "seconds": 0.0})
+            stats["calls"] += 1
+            stats["failures"] += record.status >= 400
+            stats["seconds"] += record.seconds
+        return result
+
+
+def snp_alleles(rs_number: int) -> List[str]:
+    bases = "ACGT"
+    ref = bases[rs_number % 4]
+    alts = [base for base in bases if base != ref]
+    return [f"{ref}/{alt}" for alt in (alts if rs_number % 3 == 0 else alts[:1])]
+
+
+def snp_position(rs_number: int) -> tuple:
+    """(chromosome, 0-based position) of an rs value."""
+    return str(rs_number % 22 + 1), 1_000_000 + (rs_number * 7919) % 100_000_000
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _serve(self) -> None:
+        service: MockService = self.server.service
+        record = RequestRecord(service.name, self.path, time.perf_counter())
+        try:
+            record.status = service.handle(self)
+        finally:
+            record.seconds = time.perf_counter() - record.started
+            service.log.add(record)
+
+    do_GET = _serve
+    do_POST = _serve
+
+
+class MockService:
+    """One stand-in API on ``127.0.0.1:<port>``.
+
+    Args:
+        name (str): one of ``SERVICES``
+        profile (ServiceProfile): injected latency and failures
+        log (RequestLog): where served requests are recorded
+        genes (List[tuple]): (gene symbol, HGNC number) pairs GeneBe and InterVar answer with
+        seed (int): seed of the jitter and failure draws
+    """
+
+    def __init__(self, name: str, profile: ServiceProfile, log: RequestLog, genes: List[tuple], seed: int = 0) -> None:
+        self.name = name
+        self.profile = profile
+        self.log = log
+        self.genes = genes
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.server.service = self
+        self._thread = threading.Thread(target=self.server.serve_forever, name=f"mock-{name}", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _draw(self) -> tuple:
+        with self._random_lock:
+            delay = self.profile.latency + self._random.uniform(-self.profile.jitter, self.profile.jitter)
+            failed = self._random.random() < self.profile.failure_rate
+        return max(delay, 0.0), failed
+
+    def handle(self, request: _Handler) -> int:
+        """Answer one request; returns the HTTP status sent."""
+        delay, failed = self._draw()
+        url = urlparse(request.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        body = None
+        if request.command == "POST":
+            length = int(request.headers.get("Content-Length") or 0)
+            body = json.loads(request.rfile.read(length) or b"{}")
+
+        time.sleep(delay)
+        if failed:
+            request._send_json(503, {"error": {"message": f"injected {self.name} failure"}})
+            return 503
+        if self.name == "snp":
+            request._send_json(200, self._snp(params))
+        elif self.name == "genebe":
+            request._send_json(200, self._genebe(params))
+        elif self.name == "intervar":
+            request._send_json(200, self._intervar(params))
+        elif body and body.get("stream"):
+            self._groq_stream(request, body)
+        else:
+            request._send_json(200, self._groq_completion(body or dict()))
+        return 200
+
+    def _snp(self, params: dict) -> list:
+        rs_value = params.get("terms", "").lower()
+        digits = rs_value[2:]
+        if not rs_value.startswith("rs") or not digits.isdigit() or len(digits) >= 10:
+            return [0, [], None, []]
+        rs_number = int(digits)
+        chrom, pos = snp_position(rs_number)
+        gene = self.genes[pos % len(self.genes)][0]
+        return [1, [rs_value], None, [[rs_value, chrom, str(pos), ", ".join(snp_alleles(rs_number)), gene]]]
+
+    def _gene(self, params: dict) -> tuple:
+        return self.genes[int(params.get("pos") or 0) % len(self.genes)]
+
+    def _genebe(self, params: dict) -> dict:
+        symbol, hgnc_number = self._gene(params)
+        pos = int(params.get("pos") or 0)
+        return {
+            "variants": [
+                {
+                    "chr": params.get("chr"),
+                    "pos": pos,
+                    "ref": params.get("ref"),
+                    "alt": params.get("alt"),
+                    "acmg_classification": ACMG_CLASSES[pos % len(ACMG_CLASSES)],
+                    "effect": "missense_variant",
+                    "gene_symbol": symbol,
+                    "gene_hgnc_id": hgnc_number,
+                    "dbsnp": f"rs{pos}",
+                    "frequency_reference_population": round((pos % 1000) / 1e5, 6),
+                    "acmg_score": pos % 10 - 4,
+                    "acmg_criteria": "PM2,PP3",
+                }
+            ]
+        }
+
+    def _intervar(self, params: dict) -> dict:
+        symbol, _ = self._gene(params)
+        pos = int(params.get("pos") or 0)
+        return {"Intervar": INTERVAR_CLASSES[pos % len(INTERVAR_CLASSES)], "Gene": symbol}
+
+    def _reply(self, messages: List[dict]) -> str:
+        system = messages[0].get("content", "") if messages else ""
+        user = messages[-1].get("content", "") if messages else ""
+        if "CSV format" in system:
+            coordinates = _COORDINATES.search(user)
+            if coordinates:
+                return ",".join(coordinates.groups()) + ",hg38"
+            rs_value = _RS_VALUE.search(user)
+            if rs_value:
+                return rs_value.group(1)
+            return "Please enter a single variant, for example chr6:160585140-T>G."
+        words = [REPLY_WORDS[i % len(REPLY_WORDS)] for i in range(self.profile.reply_tokens)]
+        return " ".join(words)
+
+    def _groq_completion(self, body: dict) -> dict:
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": self._reply(body.get("messages", list()))},
+                    "finish_reason": "stop",
+                    "logprobs": None,
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _groq_stream(self, request: _Handler, body: dict) -> None:
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+
+        def event(delta: dict, finish_reason: Optional[str] = None) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason, "logprobs": None}],
+            }
+            return f"data: {json.dumps(chunk)}\n\n".encode("utf-8")
+
+        request.send_response(200)
+        request.send_header("Content-Type", "text/event-stream")
+        request.send_header("Cache-Control", "no-cache")
+        request.send_header("Connection", "close")
+        request.end_headers()
+        request.close_connection = True
+
+        tokens = re.findall(r"\S+\s*", self._reply(body.get("messages", list())))
+        request.wfile.write(event({"role": "assistant", "content": ""}))
+        for token in tokens:
+            request.wfile.write(event({"content": token}))
+            request.wfile.flush()
+            if self.profile.token_delay:
+                time.sleep(self.profile.token_delay)
+        request.wfile.write(event(dict(), "stop"))
+        request.wfile.write(b"data: [DONE]\n\n")
+        request.wfile.flush()
+
+
+@dataclass
+class MockServices:
+    """All four stand-ins, started on enter and stopped on exit.
+
+    Args:
+        profiles (Dict[str, ServiceProfile]): per-service behaviour; missing services answer immediately
+        clingen_source (str, optional): ClinGen CSV the GeneBe stand-in picks genes from
+        seed (int): seed of the jitter and failure draws
+    """
+
+    profiles: Dict[str, ServiceProfile] = field(default_factory=dict)
+    clingen_source: Optional[str] = None
+    seed: int = 0
+    log: RequestLog = field(default_factory=RequestLog)
+    services: Dict[str, MockService] = field(default_factory=dict)
+
+    def __enter__(self) -> "MockServices":
+        clingen = pd.read_csv(self.clingen_source or default_clingen_source(), usecols=["GENE SYMBOL", "GENE ID (HGNC)"])
+        genes = [
+            (symbol, int(hgnc_id.split(":")[1]))
+            for symbol, hgnc_id in clingen.drop_duplicates().itertuples(index=False)
+        ]
+        for i, name in enumerate(SERVICES):
+            service = MockService(name, self.profiles.get(name, ServiceProfile()), self.log, genes, seed=self.seed + i)
+            service.start()
+            self.services[name] = service
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for service in self.services.values():
+            service.stop()
+        self.services.clear()
+
+    def env(self) -> Dict[str, str]:
+        """Environment variables that point ``dxvar.annotation`` and the Groq client at the stand-ins."""
+        return {
+            "DXVAR_SNP_URL": self.services["snp"].base_url + "/api/snps/v3/search",
+            "DXVAR_GENEBE_URL": self.services["genebe"].base_url + "/cloud/api-public/v1/variant",
+            "DXVAR_INTERVAR_URL": self.services["intervar"].base_url + "/api_new.php",
+            "GROQ_BASE_URL": self.services["groq"].base_url,
+        }
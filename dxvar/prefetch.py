@@ -0,0 +1,94 @@
+"""Speculative annotation of every allele of a multi-allelic rs value.
+
+When an rs value resolves to several alleles the app asks the user to pick
+one, and each pick is a full rerun. Instead of waiting for the pick, GeneBe
+and InterVar are queried for all alleles at once on the engine's thread pool
+as soon as the rs value resolves, and the disease explanation is started as
+soon as GeneBe names an allele's gene. Switching alleles then reads finished
+futures (and usually a cached explanation) instead of making fresh calls.
+
+Alleles at one position nearly always hit the same gene, so their
+explanation prompts are identical and the LLM gateway and response cache
+turn them into a single call.
+
+Example:
+    >>> prefetch = AllelePrefetch("rs121913529", lookup_rsid("rs121913529"), engine, explain)
+    >>> genebe_future, intervar_future = prefetch.lookups(["12", "25245350", "C", "A", "hg38"])
+"""
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dxvar.llm import BackgroundStream
+from dxvar.variant_parser import parse_coordinates
+
+
+@dataclass
+class PrefetchedAllele:
+    parts: List[str]
+    genebe: Future
+    intervar: Future
+    explanation: Optional[BackgroundStream] = None
+
+
+def _failed(future: Future) -> bool:
+    return future.done() and (future.exception() is not None or future.result() is None)
+
+
+class AllelePrefetch:
+    """Lookups started for every allele of one rs value.
+
+    Args:
+        rsid (str): the rs value the alleles were resolved from
+        alleles (List[str]): alleles as returned by ``lookup_rsid`` (ex: ``chr6:160585140-T>G``)
+        engine (AnnotationEngine): submits the lookups on its thread pool
+        explain (Callable, optional): ``explain(clingen_matches)`` starts the disease explanation in
+            the background and returns its stream, or None if it is already cached; it is called on
+            a worker thread, so it must not touch Streamlit
+    """
+
+    def __init__(
+        self,
+        rsid: str,
+        alleles: List[str],
+        engine,
+        explain: Optional[Callable[[object], Optional[BackgroundStream]]] = None,
+    ) -> None:
+        self.rsid = rsid.strip().lower()
+        self.alleles = alleles
+        self.engine = engine
+        self.explain = explain
+        self.entries: Dict[str, PrefetchedAllele] = dict()
+        for allele in alleles:
+            variant = parse_coordinates(allele)
+            if variant is None:
+                continue
+            parts = variant.to_csv().split(",")
+            entry = PrefetchedAllele(parts, engine.submit_genebe(parts), engine.submit_intervar(parts))
+            self.entries[",".join(parts)] = entry
+            if explain is not None:
+                entry.genebe.add_done_callback(lambda future, entry=entry: self._explain(entry, future))
+
+    def _explain(self, entry: PrefetchedAllele, future: Future) -> None:
+        if _failed(future):
+            return
+        genebe = future.result()
+        matches = self.engine.find_gene_match(genebe[2], 'HGNC:' + str(genebe[3])) or "No disease found"
+        entry.explanation = self.explain(matches)
+
+    def matches(self, rsid: str) -> bool:
+        return rsid.strip().lower() == self.rsid
+
+    def get(self, parts: List[str]) -> Optional[PrefetchedAllele]:
+        return self.entries.get(",".join(parts))
+
+    def lookups(self, parts: List[str]) -> Tuple[Future, Future]:
+        """GeneBe and InterVar futures for ``parts``; lookups that failed or were not prefetched are (re)submitted."""
+        entry = self.get(parts)
+        if entry is None:
+            return self.engine.submit_genebe(parts), self.engine.submit_intervar(parts)
+        if _failed(entry.genebe):
+            entry.genebe = self.engine.submit_genebe(parts)
+        if _failed(entry.intervar):
+            entry.intervar = self.engine.submit_intervar(parts)
+        return entry.genebe, entry.intervar
@@ -0,0 +1,159 @@
+"""Prompt-keyed cache for LLM responses, shared across Streamlit sessions."""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Iterator, Optional
+
+
+def _canonical(value: Any) -> Any:
+    """Order-independent, JSON-serializable form of the prompt inputs."""
+    if isinstance(value, dict):
+        return {str(key): _canonical(item) for key, item in sorted(value.items(), key=lambda x: str(x[0]))}
+    if isinstance(value, (set, frozenset)):
+        return sorted(_canonical(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def make_key(model: str, system_messages: Iterable[dict], payload: Any) -> str:
+    """sha256 over the model, the system prompt and the prompt payload (ex: disease dict).
+
+    Example:
+        >>> make_key("llama", [{"role": "system", "content": "x"}], {"b": 1, "a": 2}) == \\
+        ...     make_key("llama", [{"role": "system", "content": "x"}], {"a": 2, "b": 1})
+        True
+    """
+    blob = json.dumps(
+        {"model": model, "system": list(system_messages), "payload": _canonical(payload)},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU cache with optional TTL and on-disk persistence.
+
+    Args:
+        max_entries (int): entries kept in memory; least recently used are evicted first
+        ttl_seconds (float, optional): entries older than this are treated as misses
+        disk_dir (str, optional): directory where every entry is also written as
+            ``<key>.json`` so responses survive restarts and are shared by processes
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: Optional[float] = None,
+        disk_dir: Optional[str] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as fh:
+                record = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        return record["created"], record["value"]
+
+    def _write_disk(self, key: str, created: float, value: str) -> None:
+        if not self.disk_dir:
+            return
+        tmp_path = self._disk_path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump({"created": created, "value": value}, fh, ensure_ascii=False)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._read_disk(key)
+            if entry is not None and not self._expired(entry[0]):
+                self._insert(key, entry)
+
+        if entry is None or self._expired(entry[0]):
+            with self._lock:
+                self._entries.pop(key, None)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return entry[1]
+
+    def _insert(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key: str, value: str) -> None:
+        created = time.time()
+        self._insert(key, (created, value))
+        self._write_disk(key, created, value)
+
+    def stream_through(self, key: str, chunks: Iterable[str]) -> Iterator[str]:
+        """Pass ``chunks`` through and store the joined text once the stream completes.
+
+        A stream that is abandoned half way is not cached.
+        """
+        parts = list()
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.set(key, "".join(parts))
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+def cache_from_env() -> ResponseCache:
+    """Build the cache from DXVAR_LLM_CACHE_SIZE / _TTL / _DIR environment variables."""
+    ttl = os.environ.get("DXVAR_LLM_CACHE_TTL")
+    return ResponseCache(
+        max_entries=int(os.environ.get("DXVAR_LLM_CACHE_SIZE", 512)),
+        ttl_seconds=float(ttl) if ttl else None,
+        disk_dir=os.environ.get("DXVAR_LLM_CACHE_DIR") or None,
+    )
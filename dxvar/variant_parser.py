@@ -0,0 +1,240 @@
+"""Deterministic variant normalizer for the DxVar query box.
+
+Turns the variant notations users commonly type into the
+``chromosome,position,ref,alt,genome`` string that ``get_variant_info``
+expects, so the Groq round-trip is only needed for free text that no rule
+understands.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+DEFAULT_GENOME = "hg38"
+
+# RefSeq chromosome accessions -> (chromosome, genome build)
+_REFSEQ_VERSIONS = {
+    "hg38": {
+        1: 11, 2: 12, 3: 12, 4: 12, 5: 10, 6: 12, 7: 14, 8: 11, 9: 12, 10: 11, 11: 10, 12: 12,
+        13: 11, 14: 9, 15: 10, 16: 10, 17: 11, 18: 10, 19: 10, 20: 11, 21: 9, 22: 11, 23: 11, 24: 10,
+    },
+    "hg19": {
+        1: 10, 2: 11, 3: 11, 4: 11, 5: 9, 6: 11, 7: 13, 8: 10, 9: 11, 10: 10, 11: 9, 12: 11,
+        13: 10, 14: 8, 15: 9, 16: 9, 17: 10, 18: 9, 19: 9, 20: 10, 21: 8, 22: 10, 23: 10, 24: 9,
+    },
+}
+REFSEQ_CHROMOSOMES = {
+    f"NC_{number:06d}.{version}": (
+        {23: "X", 24: "Y"}.get(number, str(number)),
+        genome,
+    )
+    for genome, versions in _REFSEQ_VERSIONS.items()
+    for number, version in versions.items()
+}
+REFSEQ_CHROMOSOMES["NC_012920.1"] = ("MT", DEFAULT_GENOME)
+
+_CHROM = r"(?:chr)?(?P<chrom>[1-9]|1\d|2[0-2]|X|Y|MT?)"
+_BASES = r"[ACGTN]+"
+_DELETED = r"(?:-|\.|del)?"
+
+# chr6:160585140-T>G, 6:160585140:T>G, chr6:160585140-T>, chr6:160585140 T>-
+_COLON_ARROW = re.compile(
+    rf"\b{_CHROM}[:\s]\s*(?P<pos>\d+)\s*[-:\s]\s*(?P<ref>{_BASES})\s*>\s*(?P<alt>{_BASES}|{_DELETED})(?![A-Z])",
+    re.IGNORECASE,
+)
+# 6-160585140-T-G, chr6:160585140:T:G, chr6<TAB>160585140<TAB>T<TAB>G (VCF columns)
+_DELIMITED = re.compile(
+    rf"\b{_CHROM}(?P<sep>[-:_\s,]+)(?P<pos>\d+)(?P=sep)(?:[^\s,]+(?P=sep))?(?P<ref>{_BASES})(?P=sep)(?P<alt>{_BASES}|-|\.)(?![A-Z])",
+    re.IGNORECASE,
+)
+# NC_000006.12:g.160585140T>G, chr6:g.160585140T>G
+_HGVS_SUB = re.compile(
+    rf"\b(?:(?P<acc>NC_\d{{6}}\.\d+)|{_CHROM}):g\.(?P<pos>\d+)(?P<ref>[ACGT])>(?P<alt>[ACGT])(?![A-Z])",
+    re.IGNORECASE,
+)
+# NC_000006.12:g.160585140_160585142delTGA, chr6:g.160585140delT
+_HGVS_DEL = re.compile(
+    rf"\b(?:(?P<acc>NC_\d{{6}}\.\d+)|{_CHROM}):g\.(?P<pos>\d+)(?:_(?P<end>\d+))?del(?P<ref>[ACGT]+)(?![A-Z])",
+    re.IGNORECASE,
+)
+# NC_000006.12:g.160585140_160585141delinsGG, chr6:g.160585140delTinsGG
+_HGVS_DELINS = re.compile(
+    rf"\b(?:(?P<acc>NC_\d{{6}}\.\d+)|{_CHROM}):g\.(?P<pos>\d+)(?:_(?P<end>\d+))?del(?P<ref>[ACGT]+)ins(?P<alt>[ACGT]+)(?![A-Z])",
+    re.IGNORECASE,
+)
+_RS_ID = re.compile(r"\b(rs[1-9]\d*)\b", re.IGNORECASE)
+_GENOME_HINTS = (
+    (re.compile(r"\b(hg19|grch37|b37)\b", re.IGNORECASE), "hg19"),
+    (re.compile(r"\b(hg38|grch38|b38)\b", re.IGNORECASE), "hg38"),
+)
+
+
+@dataclass
+class ParsedVariant:
+    chrom: str
+    pos: int
+    ref: str
+    alt: str
+    genome: str = DEFAULT_GENOME
+
+    def to_csv(self) -> str:
+        """Same format the assistant is prompted to answer with (ex: 6,160585140,T,G,hg38)."""
+        return f"{self.chrom},{self.pos},{self.ref},{self.alt},{self.genome}"
+
+
+class ParserStats:
+    """Process-wide hit/miss counters, shared by every Streamlit session."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fallback_seconds = 0.0
+
+    def record_hit(self) -> None:
+        with self._lock:
+            self.hits += 1
+
+    def record_miss(self, fallback_seconds: float = 0.0) -> None:
+        with self._lock:
+            self.misses += 1
+            self.fallback_seconds += fallback_seconds
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> dict:
+        """Hit rate plus the LLM calls/latency the local parser avoided.
+
+        Saved seconds are estimated from the mean latency of the fallback
+        calls that actually went to the LLM.
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            mean_fallback = self.fallback_seconds / self.misses if self.misses else 0.0
+            return {
+                "queries": total,
+                "parsed_locally": self.hits,
+                "llm_fallbacks": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "llm_calls_saved": self.hits,
+                "mean_llm_seconds": mean_fallback,
+                "est_seconds_saved": self.hits * mean_fallback,
+            }
+
+
+stats = ParserStats()
+
+
+def normalize_chromosome(chrom: str) -> str:
+    chrom = chrom.upper()
+    if chrom.startswith("CHR"):
+        chrom = chrom[3:]
+    if chrom in ("M", "MT"):
+        return "MT"
+    return chrom
+
+
+def _detect_genome(text: str) -> str:
+    for pattern, genome in _GENOME_HINTS:
+        if pattern.search(text):
+            return genome
+    return DEFAULT_GENOME
+
+
+def _locate(match: re.Match, text: str):
+    accession = match.groupdict().get("acc")
+    if accession:
+        if accession.upper() not in REFSEQ_CHROMOSOMES:
+            return None
+        return REFSEQ_CHROMOSOMES[accession.upper()]
+    return normalize_chromosome(match.group("chrom")), _detect_genome(text)
+
+
+def _span_matches(match: re.Match, ref: str) -> bool:
+    end = match.groupdict().get("end")
+    if end is None:
+        return True
+    return int(end) - int(match.group("pos")) + 1 == len(ref)
+
+
+def parse_coordinates(text: str) -> Optional[ParsedVariant]:
+    """Extract a single chromosome/position/ref/alt variant from free text.
+
+    Returns None when nothing matches or when the text holds more than one
+    distinct variant, so the caller can fall back to the assistant.
+    """
+    found = []
+    for pattern in (_HGVS_DELINS, _HGVS_DEL, _HGVS_SUB):
+        for match in pattern.finditer(text):
+            location = _locate(match, text)
+            ref = match.group("ref").upper()
+            if location is None or not _span_matches(match, ref):
+                return None
+            alt = (match.groupdict().get("alt") or "").upper()
+            found.append(ParsedVariant(location[0], int(match.group("pos")), ref, alt, location[1]))
+        if found:
+            break
+
+    if not found:
+        for pattern in (_COLON_ARROW, _DELIMITED):
+            for match in pattern.finditer(text):
+                chrom, genome = _locate(match, text)
+                alt = match.group("alt").upper()
+                alt = "" if alt in ("-", ".", "DEL") else alt
+                found.append(
+                    ParsedVariant(chrom, int(match.group("pos")), match.group("ref").upper(), alt, genome)
+                )
+            if found:
+                break
+
+    unique = {variant.to_csv() for variant in found}
+    if len(unique) != 1:
+        return None
+    return found[0]
+
+
+def normalize_variant(text: str) -> Optional[str]:
+    """Local replacement for ``get_assistant_response_initial``.
+
+    Follows the same precedence the assistant is instructed to use: complete
+    coordinates win over an rs value, an rs value is returned as-is when the
+    coordinates are incomplete, and anything else is left to the LLM.
+
+    Example:
+        >>> normalize_variant("chr6:160585140-T>G")
+        '6,160585140,T,G,hg38'
+        >>> normalize_variant("NC_000023.10:g.1000_1002delTGA")
+        'X,1000,TGA,,hg19'
+        >>> normalize_variant("rs124234 chromosome:3, pos:13423")
+        'rs124234'
+        >>> normalize_variant("what does this variant do?") is None
+        True
+    """
+    text = text.strip()
+    variant = parse_coordinates(text)
+    if variant is not None:
+        return variant.to_csv()
+
+    rs_ids = {rs_id.lower() for rs_id in _RS_ID.findall(text)}
+    if len(rs_ids) == 1:
+        return rs_ids.pop()
+
+    return None
+
+
+def resolve_variant(text: str, fallback) -> str:
+    """Normalize ``text`` locally, calling ``fallback(text)`` (the LLM) only on a miss."""
+    normalized = normalize_variant(text)
+    if normalized is not None:
+        stats.record_hit()
+        return normalized
+
+    start = time.perf_counter()
+    try:
+        return fallback(text)
+    finally:
+        stats.record_miss(time.perf_counter() - start)
@@ -0,0 +1,116 @@
+import argparse
+import csv
+import threading
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("requests")
+
+from dxvar import batch
+from dxvar.__main__ import annotate, progress_printer
+from dxvar.batch import BatchReport
+from dxvar.engine import AnnotationEngine
+
+CLINGEN = (
+    '"GENE SYMBOL","GENE ID (HGNC)","DISEASE LABEL","DISEASE ID (MONDO)","MOI","CLASSIFICATION","GCEP"\n'
+    '"RAF1","HGNC:9829","Noonan syndrome","MONDO:0018997","AD","Definitive","RASopathy"\n'
+)
+LINES = [
+    "##fileformat=VCFv4.2",
+    "chr6:160585140-T>G",
+    "rs123",
+    "what does this do",
+    "1\t100\t.\tA\tG,<DEL>\t.\t.\t.",
+]
+
+
+class StubFetchers:
+    """Records the timeout and worker thread of every upstream call."""
+
+    def __init__(self):
+        self.timeouts = list()
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def _record(self, timeout):
+        with self._lock:
+            self.timeouts.append(timeout)
+            self.threads.add(threading.current_thread().name)
+
+    def lookup_rsid(self, rs_id, timeout=30, session=None):
+        self._record(timeout)
+        return ["chr12:25245350-C>A", "chr12:25245350-C>T"]
+
+    def fetch_genebe(self, parts, timeout=30, session=None):
+        self._record(timeout)
+        return ["Pathogenic", "missense", "RAF1", 9829, "rs1", 0.0, 10, "PS1"]
+
+    def fetch_intervar(self, parts, timeout=30, session=None):
+        self._record(timeout)
+        return ["Likely pathogenic", "", "-", ""]
+
+
+@pytest.fixture
+def fetchers(monkeypatch):
+    stub = StubFetchers()
+    for name in ("lookup_rsid", "fetch_genebe", "fetch_intervar"):
+        monkeypatch.setattr(batch, name, getattr(stub, name))
+    return stub
+
+
+@pytest.fixture
+def clingen_csv(tmp_path):
+    path = tmp_path / "clingen.csv"
+    path.write_text(CLINGEN)
+    return str(path)
+
+
+def check_counts(report, rows):
+    # coordinates, rs (2 alleles), unparsable text, VCF row split into G and <DEL>
+    assert report.records == 5
+    assert report.variants == 4
+    assert report.rows == len(rows) == 6
+    assert report.errors == 2
+
+
+def test_annotate_lines_passes_timeout_and_uses_engine_pool(fetchers, clingen_csv):
+    engine = AnnotationEngine(clingen_source=clingen_csv, workers=2, timeout=7)
+    report = BatchReport()
+
+    rows = list(engine.annotate_lines(LINES, report=report))
+
+    check_counts(report, rows)
+    assert fetchers.timeouts and set(fetchers.timeouts) == {7}
+    assert all(name.startswith("dxvar_") for name in fetchers.threads)
+    variant_rows = [row for row in rows if "Variant" in row and not row.get("Error")]
+    assert {row["ClinGen diseases"] for row in variant_rows} == {"Noonan syndrome (Definitive)"}
+    assert {row["InterVar"] for row in variant_rows} == {"Likely pathogenic"}
+
+
+def test_cli_writes_every_row(fetchers, clingen_csv, tmp_path, capsys):
+    source = tmp_path / "input.txt"
+    source.write_text("\n".join(LINES) + "\n")
+    output = tmp_path / "out.tsv"
+    args = argparse.Namespace(
+        input=str(source), output=str(output), workers=2, genome="hg38", clingen=clingen_csv, timeout=3
+    )
+
+    annotate(args)
+
+    with open(output, encoding="utf-8") as fh:
+        rows = list(csv.DictReader(fh, delimiter="\t"))
+    assert len(rows) == 6
+    assert set(fetchers.timeouts) == {3}
+    assert "Annotated 5 inputs, 4 variants into 6 rows (2 errors)" in capsys.readouterr().err
+
+
+def test_progress_is_printed_when_a_hundred_is_crossed(capsys):
+    report_progress = progress_printer(every=100)
+    report = BatchReport()
+    for records in (99, 102, 150, 199, 203, 310):
+        report.records = records
+        report_progress(report)
+
+    lines = capsys.readouterr().err.splitlines()
+    assert [line.split()[0] for line in lines] == ["102", "203", "310"]
@@ -0,0 +1,100 @@
+from dxvar.chat_memory import ConversationMemory, estimate_tokens, summary_messages
+
+SYSTEM = [{"role": "system", "content": "s" * 40}]
+
+
+def turns(n, size=80, start=0):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": "%d:" % i + "x" * size}
+        for i in range(start, start + n)
+    ]
+
+
+class Summarizer:
+    def __init__(self):
+        self.calls = list()
+
+    def __call__(self, pending):
+        self.calls.append(pending)
+        return "summary %d" % len(self.calls)
+
+
+def test_estimate_tokens_counts_framing():
+    assert estimate_tokens([{"role": "user", "content": "x" * 40}]) == 14
+    assert estimate_tokens([]) == 0
+
+
+def test_short_history_is_sent_verbatim():
+    summarizer = Summarizer()
+    memory = ConversationMemory(summarizer, token_budget=1000)
+    history = turns(4)
+
+    messages = memory.build_prompt(SYSTEM, history, "variant context")
+
+    assert messages == SYSTEM + [{"role": "system", "content": "variant context"}] + history
+    assert summarizer.calls == []
+    assert memory.last_report.summarized_messages == 0
+
+
+def test_long_history_is_summarized_under_budget():
+    summarizer = Summarizer()
+    memory = ConversationMemory(summarizer, token_budget=100, min_recent_messages=2)
+    history = turns(10)
+
+    messages = memory.build_prompt(SYSTEM, history, "variant context")
+
+    assert estimate_tokens(messages) <= 100
+    assert messages[0] == SYSTEM[0]
+    assert messages[1] == {"role": "system", "content": "variant context"}
+    assert messages[2] == {"role": "system", "content": "Summary of the earlier conversation: summary 1"}
+    assert messages[3:] == history[memory.summarized_upto :]
+    assert summarizer.calls == [history[: memory.summarized_upto]]
+
+    report = memory.last_report
+    assert report.prompt_tokens == estimate_tokens(messages)
+    assert report.unbounded_tokens == estimate_tokens(SYSTEM + [messages[1]] + history)
+    assert report.recent_messages + report.summarized_messages == len(history)
+
+
+def test_recent_messages_are_kept_over_budget():
+    memory = ConversationMemory(Summarizer(), token_budget=50, min_recent_messages=3)
+    history = turns(6, size=400)
+
+    messages = memory.build_prompt(SYSTEM, history)
+
+    assert messages[-3:] == history[-3:]
+    assert memory.summarized_upto == 3
+
+
+def test_summary_rolls_forward():
+    summarizer = Summarizer()
+    memory = ConversationMemory(summarizer, token_budget=100, min_recent_messages=2)
+    history = turns(10)
+    memory.build_prompt(SYSTEM, history)
+    first_upto = memory.summarized_upto
+
+    history += turns(6, start=10)
+    memory.build_prompt(SYSTEM, history)
+
+    assert len(summarizer.calls) == 2
+    assert summarizer.calls[1][0] == {"role": "system", "content": "Earlier summary: summary 1"}
+    assert summarizer.calls[1][1:] == history[first_upto : memory.summarized_upto]
+
+
+def test_failed_summarizer_falls_back_to_transcript_tail():
+    def summarizer(pending):
+        raise RuntimeError("rate limited")
+
+    memory = ConversationMemory(summarizer, token_budget=100, min_recent_messages=2)
+    messages = memory.build_prompt(SYSTEM, turns(10))
+
+    assert memory.summary
+    assert len(memory.summary) <= 100
+    assert "assistant:" in memory.summary or "user:" in memory.summary
+    assert estimate_tokens(messages) <= 100
+
+
+def test_summary_messages():
+    messages = summary_messages([{"role": "user", "content": "is RAF1 linked to Noonan?"}])
+    assert messages[0]["role"] == "system"
+    assert messages[1] == {"role": "user", "content": "user: is RAF1 linked to Noonan?"}
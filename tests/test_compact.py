@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("core.data_model")
+
+from ASC3.mil_model.compact import VariantTable, VariantTableBuilder, variant_rows
+
+ROWS = [
+    ("1-100-A-T", "HGNC:1", "OMIM:100"),
+    ("2-200-ACGT-A", "HGNC:2", "OMIM:200"),
+    ("X-300-G-C", None, None),
+    ("1-101-A-T", "HGNC:1", "OMIM:200"),
+]
+
+
+@pytest.fixture
+def table() -> VariantTable:
+    builder = VariantTableBuilder()
+    for cpra, gene_id, disease_id in ROWS:
+        builder.add(cpra, gene_id=gene_id, disease_id=disease_id)
+    return builder.build()
+
+
+def test_indexing(table):
+    assert len(table) == len(ROWS)
+    for i, (cpra, gene_id, disease_id) in enumerate(ROWS):
+        assert table.cpra(i) == cpra
+        assert table.gene_id(i) == gene_id
+        assert table.disease_id(i) == disease_id
+
+
+def test_categories_are_interned(table):
+    assert table.genes == ["HGNC:1", "HGNC:2"]
+    assert table.diseases == ["OMIM:100", "OMIM:200"]
+    assert table.gene_codes.tolist() == [0, 1, -1, 0]
+    assert table.disease_codes.tolist() == [0, 1, -1, 1]
+
+
+def test_getitem_builds_variants(table):
+    variant = table[1]
+    assert (variant.cpra, variant.gene_id, variant.disease_id) == ROWS[1]
+    assert table[2].cpra == "X-300-G-C"
+    assert [variant.cpra for variant in table] == [row[0] for row in ROWS]
+
+
+def test_rows_match_indexing(table):
+    assert list(table.rows()) == ROWS
+    assert list(variant_rows(table)) == ROWS
+    assert list(variant_rows(list(table))) == ROWS
+
+
+def test_nbytes(table):
+    buffer_size = sum(len(cpra) + 1 for cpra, _, _ in ROWS)
+    assert len(table.buffer) == buffer_size
+    assert table.nbytes() == buffer_size + 8 * (len(ROWS) + 1) + 4 * len(ROWS) * 2
+
+
+def test_empty_table():
+    table = VariantTableBuilder().build()
+    assert len(table) == 0
+    assert list(table.rows()) == []
+    assert table.offsets.tolist() == [0]
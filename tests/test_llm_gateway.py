@@ -0,0 +1,186 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from dxvar.llm_gateway import BACKGROUND, INTERACTIVE, LLMGateway
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__("status %s" % status_code)
+        self.status_code = status_code
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class FakeClient:
+    """Stands in for ``groq.Groq``; replies with the last message's content, split in two chunks.
+
+    Prompts listed in ``hold`` block until ``release`` is set, and ``errors`` are
+    raised (in order) instead of replying.
+    """
+
+    def __init__(self, hold=(), errors=()):
+        self.calls = list()
+        self.hold = set(hold)
+        self.release = threading.Event()
+        self.errors = list(errors)
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        with self._lock:
+            self.calls.append(prompt)
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        return self._reply(prompt)
+
+    def _reply(self, prompt):
+        if prompt in self.hold:
+            self.release.wait(timeout=5)
+        yield chunk(prompt[:1])
+        yield chunk(prompt[1:])
+
+
+def user(text):
+    return [{"role": "user", "content": text}]
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def make_gateway():
+    gateways = list()
+
+    def make(client, **kwargs):
+        gateway = LLMGateway(client, backoff_base=0.01, backoff_cap=0.05, **kwargs)
+        gateways.append(gateway)
+        return gateway
+
+    yield make
+    for gateway in gateways:
+        gateway.client.release.set()
+        gateway.executor.shutdown(wait=True)
+
+
+def test_stream_yields_reply(make_gateway):
+    gateway = make_gateway(FakeClient())
+    assert gateway.complete(user("hello"), name="chat") == "hello"
+    assert gateway.stats()["requests"] == 1
+
+
+def test_identical_prompts_in_flight_share_one_call(make_gateway):
+    client = FakeClient(hold={"explain RAF1"})
+    gateway = make_gateway(client)
+
+    first = gateway.stream(user("explain RAF1"), name="explanation", priority=BACKGROUND)
+    wait_for(lambda: client.calls)
+    second = gateway.stream(user("explain RAF1"), name="explanation", priority=BACKGROUND)
+    client.release.set()
+
+    assert "".join(first) == "".join(second) == "explain RAF1"
+    assert client.calls == ["explain RAF1"]
+    assert gateway.stats()["coalesced"] == 1
+
+
+def test_finished_prompts_are_not_coalesced(make_gateway):
+    client = FakeClient()
+    gateway = make_gateway(client)
+    assert gateway.complete(user("same"), name="chat") == "same"
+    assert gateway.complete(user("same"), name="chat") == "same"
+    assert client.calls == ["same", "same"]
+
+
+def test_interactive_calls_are_admitted_first(make_gateway):
+    client = FakeClient(hold={"running"})
+    gateway = make_gateway(client, max_concurrent=1)
+
+    running = gateway.stream(user("running"), name="chat")
+    wait_for(lambda: client.calls)
+    background = gateway.stream(user("background"), name="explanation", priority=BACKGROUND)
+    wait_for(lambda: gateway.stats()["queued"] == 1)
+    interactive = gateway.stream(user("interactive"), name="chat", priority=INTERACTIVE)
+    wait_for(lambda: gateway.stats()["queued"] == 2)
+    client.release.set()
+
+    for stream in (running, background, interactive):
+        "".join(stream)
+    assert client.calls == ["running", "interactive", "background"]
+
+
+def test_joining_interactive_call_promotes_waiting_background_call(make_gateway):
+    client = FakeClient(hold={"running"})
+    gateway = make_gateway(client, max_concurrent=1)
+
+    running = gateway.stream(user("running"), name="chat")
+    wait_for(lambda: client.calls)
+    older = gateway.stream(user("older"), name="explanation", priority=BACKGROUND)
+    wait_for(lambda: gateway.stats()["queued"] == 1)
+    newer = gateway.stream(user("newer"), name="explanation", priority=BACKGROUND)
+    wait_for(lambda: gateway.stats()["queued"] == 2)
+    joined = gateway.stream(user("newer"), name="chat", priority=INTERACTIVE)
+    client.release.set()
+
+    for stream in (running, older, newer, joined):
+        "".join(stream)
+    assert client.calls == ["running", "newer", "older"]
+
+
+def test_rate_limited_call_is_retried(make_gateway):
+    client = FakeClient(errors=[APIError(429), APIError(503)])
+    gateway = make_gateway(client)
+
+    assert gateway.complete(user("retry me"), name="chat") == "retry me"
+    stats = gateway.stats()
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+    assert stats["rate_limited"] == 1
+    assert stats["failures"] == 0
+
+
+def test_final_errors_are_raised(make_gateway):
+    client = FakeClient(errors=[APIError(400)])
+    gateway = make_gateway(client)
+
+    with pytest.raises(APIError):
+        gateway.complete(user("bad request"), name="chat")
+    assert gateway.stats()["retries"] == 0
+    assert gateway.stats()["failures"] == 1
+
+
+def test_retries_are_bounded(make_gateway):
+    client = FakeClient(errors=[APIError(503)] * 3)
+    gateway = make_gateway(client, max_retries=2)
+
+    with pytest.raises(APIError):
+        gateway.complete(user("down"), name="chat")
+    assert len(client.calls) == 3
+    assert gateway.stats()["failures"] == 1
+
+
+def test_request_budget_delays_admission(make_gateway):
+    client = FakeClient(hold={"second"})
+    gateway = make_gateway(client, requests_per_minute=1)
+    assert gateway.complete(user("first"), name="chat") == "first"
+
+    gateway.stream(user("second"), name="chat")
+    wait_for(lambda: gateway.stats()["queued"] == 1)
+    time.sleep(0.05)
+    assert client.calls == ["first"]
+
+    # let the waiting call through instead of waiting out the minute
+    with gateway._condition:
+        gateway._window.clear()
+        gateway._condition.notify_all()
+    wait_for(lambda: client.calls == ["first", "second"])
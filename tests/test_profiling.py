@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from ASC3.profiling import ProfilingMiddleware
+
+TOKEN = "s3cret"
+
+
+async def app(scope, receive, send):
+    status = 404 if scope["path"].startswith("/profiles/") else 200
+    await send({"type": "http.response.start", "status": status, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def call(middleware, path="/predict", method="POST", token=None, query_string=b""):
+    """Run one request through the middleware; returns (status, response headers)."""
+    headers = [(b"x-profile-token", token)] if token is not None else list()
+    scope = {"type": "http", "method": method, "path": path, "headers": headers, "query_string": query_string}
+    messages = list()
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return messages[0]["status"], dict(messages[0].get("headers", list()))
+
+
+@pytest.fixture
+def middleware(tmp_path):
+    return ProfilingMiddleware(app, token=TOKEN, output_dir=str(tmp_path), interval=0.001)
+
+
+def test_valid_token_profiles_request(middleware, tmp_path):
+    status, headers = call(middleware, token=TOKEN.encode())
+    assert status == 200
+    profile_id = headers[b"x-profile-id"].decode()
+    assert (tmp_path / (profile_id + ".json")).exists()
+    assert (tmp_path / (profile_id + ".folded")).exists()
+
+
+@pytest.mark.parametrize(
+    "token", [b"wrong", "토큰".encode("utf-8"), "s3crét".encode("latin-1"), b""]
+)
+def test_other_tokens_are_passed_through(middleware, token):
+    # non-ASCII tokens used to raise TypeError in hmac.compare_digest and turn /predict into a 500
+    status, headers = call(middleware, token=token)
+    assert status == 200
+    assert b"x-profile-id" not in headers
+
+
+def test_query_string_token_is_ignored(middleware):
+    status, headers = call(middleware, query_string=b"profile=" + TOKEN.encode())
+    assert status == 200
+    assert b"x-profile-id" not in headers
+
+
+def test_saved_profile_requires_token(middleware):
+    _, headers = call(middleware, token=TOKEN.encode())
+    path = "/profiles/%s.json" % headers[b"x-profile-id"].decode()
+
+    assert call(middleware, path, method="GET", token=TOKEN.encode())[0] == 200
+    assert call(middleware, path, method="GET", token="토큰".encode("utf-8"))[0] == 404
+    assert call(middleware, path, method="GET")[0] == 404
@@ -0,0 +1,64 @@
+from dxvar.response_cache import ResponseCache, make_key
+
+SYSTEM = [{"role": "system", "content": "Explain the disease."}]
+
+
+def test_make_key_ignores_mapping_and_set_order():
+    first = {"gene": "RAF1", "diseases": {"MONDO:1", "MONDO:2"}, "moi": {"b": 1, "a": 2}}
+    second = {"moi": {"a": 2, "b": 1}, "diseases": {"MONDO:2", "MONDO:1"}, "gene": "RAF1"}
+    assert make_key("llama", SYSTEM, first) == make_key("llama", SYSTEM, second)
+
+
+def test_make_key_keeps_list_order():
+    assert make_key("llama", SYSTEM, ["a", "b"]) != make_key("llama", SYSTEM, ["b", "a"])
+
+
+def test_make_key_depends_on_model_system_and_payload():
+    key = make_key("llama", SYSTEM, {"gene": "RAF1"})
+    assert key != make_key("other", SYSTEM, {"gene": "RAF1"})
+    assert key != make_key("llama", [{"role": "system", "content": "Be brief."}], {"gene": "RAF1"})
+    assert key != make_key("llama", SYSTEM, {"gene": "BRAF"})
+
+
+def test_make_key_tuple_and_list_payloads_match():
+    assert make_key("llama", SYSTEM, ("a", 1)) == make_key("llama", SYSTEM, ["a", 1])
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("dxvar.response_cache.time.time", lambda: now[0])
+    cache = ResponseCache(ttl_seconds=10)
+    cache.set("a", "1")
+    now[0] += 5
+    assert cache.get("a") == "1"
+    now[0] += 10
+    assert cache.get("a") is None
+
+
+def test_disk_entries_survive_restart(tmp_path):
+    ResponseCache(disk_dir=str(tmp_path)).set("a", "explanation")
+    assert ResponseCache(disk_dir=str(tmp_path)).get("a") == "explanation"
+
+
+def test_stream_through_stores_only_completed_streams():
+    cache = ResponseCache()
+    assert list(cache.stream_through("done", iter(["a", "b"]))) == ["a", "b"]
+    assert cache.get("done") == "ab"
+
+    stream = cache.stream_through("abandoned", iter(["a", "b"]))
+    next(stream)
+    stream.close()
+    assert cache.get("abandoned") is None
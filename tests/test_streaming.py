@@ -0,0 +1,139 @@
+import copy
+import json
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pydantic")
+pytest.importorskip("core.snv_factory")
+pytest.importorskip("ASC3.tree_model.model")
+
+from ASC3.mil_model import streaming
+from ASC3.mil_model.compact import VariantTableBuilder
+from ASC3.mil_model.data_model import MILRequest
+from ASC3.mil_model.streaming import PARSE_ERRORS, MILRequestStreamParser, SNVMatrixBuilder
+
+EXAMPLE = MILRequest.Config.schema_extra["example"]
+FEATURES = EXAMPLE["snv"]["OMIM:600276-OMIM:125310"]["1-100-A-T"]
+
+
+def make_request(n_snv: int = 40, snv_first: bool = True) -> dict:
+    snv = dict()
+    for i in range(n_snv):
+        group = snv.setdefault("OMIM:%06d-OMIM:%06d" % (i % 6, i % 6 + 1), dict())
+        group["%s-%s-A-T" % (i % 22 + 1, i)] = dict(
+            FEATURES, inhouse_variant_ac=i * 37 % 300, disease_similarity=i / 7, qual=0.1 * i
+        )
+    head = dict(sample_id="S", inhouse_total_ac=1234, cnv=copy.deepcopy(EXAMPLE["cnv"]))
+    return dict(snv=snv, **head) if snv_first else dict(head, snv=snv)
+
+
+def reference(request: dict):
+    """/predict 경로: MILRequest 검증 후 SNVFeature.to_vector"""
+    mil_request = MILRequest(**request)
+    vectors, variants = list(), VariantTableBuilder()
+    for gene_disease, group in mil_request.snv.items():
+        gene_id, disease_id = gene_disease.split("-", maxsplit=1)
+        for cpra, features in group.items():
+            vectors.append(features.to_vector(mil_request.inhouse_total_ac))
+            variants.add(cpra, gene_id, disease_id)
+    return np.array(vectors, dtype=np.float32), list(variants.build().rows())
+
+
+def parse(body: bytes, cuts=(), capacity: int = 3):
+    """body를 cuts 위치에서 나눠 넣고 (fields, SNVData) 반환"""
+    builder = SNVMatrixBuilder(capacity=capacity)
+    parser = MILRequestStreamParser(builder.add_group)
+    bounds = [0] + sorted(cuts) + [len(body)]
+    for start, end in zip(bounds, bounds[1:]):
+        parser.feed(body[start:end])
+    fields = parser.close()
+    mil_request = MILRequest(**dict(fields, snv=dict()))
+    return fields, builder.build(mil_request.inhouse_total_ac, ["h"] * len(FEATURES))
+
+
+@pytest.fixture(params=["ijson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "ijson":
+        pytest.importorskip("ijson")
+    else:
+        monkeypatch.setattr(streaming, "ijson", None)
+    return request.param
+
+
+def random_cuts(body: bytes, seed: int):
+    rng = random.Random(seed)
+    return rng.sample(range(1, len(body)), k=min(len(body) - 1, rng.randint(1, 200)))
+
+
+@pytest.mark.parametrize("snv_first", [True, False], ids=["snv_first", "snv_last"])
+@pytest.mark.parametrize("split", ["bytes", "random", "whole"])
+def test_stream_matches_predict_path(backend, snv_first, split):
+    request = make_request(snv_first=snv_first)
+    body = json.dumps(request).encode()
+    if split == "bytes":
+        cuts = range(1, len(body))
+    elif split == "random":
+        cuts = random_cuts(body, seed=len(body))
+    else:
+        cuts = ()
+
+    fields, snv_data = parse(body, cuts)
+
+    x, rows = reference(request)
+    np.testing.assert_array_equal(snv_data.x, x)
+    assert list(snv_data.variants.rows()) == rows
+    assert fields["inhouse_total_ac"] == 1234
+    assert fields["cnv"] == request["cnv"]
+
+
+def test_empty_snv(backend):
+    fields, snv_data = parse(json.dumps(make_request(n_snv=0)).encode())
+    assert snv_data.x.shape == (0, len(FEATURES))
+    assert fields["sample_id"] == "S"
+
+
+@pytest.mark.parametrize("snv", [[], [1], None, 1, "x"], ids=["empty_array", "array", "null", "int", "str"])
+@pytest.mark.parametrize("snv_first", [True, False], ids=["snv_first", "snv_last"])
+def test_non_object_snv_is_rejected(backend, snv, snv_first):
+    request = make_request(n_snv=3, snv_first=snv_first)
+    request["snv"] = snv
+    with pytest.raises(PARSE_ERRORS):
+        parse(json.dumps(request).encode(), cuts=(5,))
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"[1, 2]",
+        b"",
+        b'{"sample_id": "S", "inhouse_total_ac": 1, "cnv": {}}',
+        b'{"snv": {"nodash": {"1-1-A-T": {}}}}',
+        b'{"snv": {"OMIM:1-OMIM:2": {"1-1-A-T": 1}}}',
+        b'{"snv": {"OMIM:1-OMIM:2": {"1-1-A-T": {"qual": 1}}}}',
+    ],
+    ids=["array", "empty", "no_snv", "no_dash", "scalar_feature", "missing_feature"],
+)
+def test_malformed_body_is_rejected(backend, body):
+    with pytest.raises(PARSE_ERRORS):
+        parse(body)
+
+
+@pytest.mark.parametrize("snv_first", [True, False], ids=["snv_first", "snv_last"])
+def test_truncated_body_is_rejected(backend, snv_first):
+    body = json.dumps(make_request(snv_first=snv_first)).encode()
+    for end in (1, len(body) // 2, len(body) - 1):
+        with pytest.raises(PARSE_ERRORS):
+            parse(body[:end], cuts=(end // 3,))
+
+
+@pytest.mark.parametrize("inhouse_total_ac", [0, -1])
+def test_non_positive_inhouse_total_ac_is_rejected(backend, inhouse_total_ac):
+    request = make_request(n_snv=3)
+    request["inhouse_total_ac"] = inhouse_total_ac
+    with pytest.raises(PARSE_ERRORS):
+        parse(json.dumps(request).encode())
+    # /predict의 MILRequest 검증도 같은 이유로 실패
+    with pytest.raises(ValueError):
+        MILRequest(**request)
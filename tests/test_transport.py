@@ -0,0 +1,141 @@
+import asyncio
+import gzip
+import json
+import zlib
+
+import pytest
+
+pytest.importorskip("starlette")
+
+from ASC3.transport import DecompressionMiddleware, RequestBodyError, _BoundedDecompressor, compress
+
+LIMIT = 2**20
+ZSTD_BLOCK = 128 * 2**10
+
+
+def gzip_bomb(size: int) -> bytes:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    block = b"\0" * 2**20
+    return b"".join(compressor.compress(block) for _ in range(size // len(block))) + compressor.flush()
+
+
+def zstd_bomb(size: int) -> bytes:
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(b"\0" * size)
+
+
+@pytest.fixture(params=["gzip", "zstd"])
+def encoding(request):
+    if request.param == "zstd":
+        pytest.importorskip("zstandard")
+    return request.param
+
+
+def chunks(data: bytes, size: int):
+    return [data[i : i + size] for i in range(0, len(data), size)] or [b""]
+
+
+def test_round_trip_in_chunks(encoding):
+    body = json.dumps({"snv": {str(i): i / 7 for i in range(5000)}}).encode()
+    decompressor = _BoundedDecompressor(encoding, LIMIT)
+    parts = chunks(compress(body, encoding), 100)
+
+    out = b"".join(
+        decompressor.decompress(part, final=i == len(parts) - 1) for i, part in enumerate(parts)
+    )
+    assert out == body
+
+
+def test_body_of_exactly_limit_is_accepted(encoding):
+    body = b"x" * LIMIT
+    assert _BoundedDecompressor(encoding, LIMIT).decompress(compress(body, encoding), final=True) == body
+
+
+def test_body_over_limit_is_rejected(encoding):
+    with pytest.raises(RequestBodyError) as error:
+        _BoundedDecompressor(encoding, LIMIT).decompress(compress(b"x" * (LIMIT + 1), encoding), final=True)
+    assert error.value.status_code == 413
+
+
+@pytest.mark.parametrize("bomb, slack", [(gzip_bomb, 1), (zstd_bomb, ZSTD_BLOCK)], ids=["gzip", "zstd"])
+def test_single_chunk_bomb_stops_at_limit(bomb, slack):
+    data = bomb(2**26)
+    encoding = "gzip" if bomb is gzip_bomb else "zstd"
+    decompressor = _BoundedDecompressor(encoding, LIMIT)
+
+    with pytest.raises(RequestBodyError) as error:
+        decompressor.decompress(data, final=True)
+
+    assert error.value.status_code == 413
+    # decompression stops at the first output block past the limit, not after inflating 64 MiB
+    assert LIMIT < decompressor.size <= LIMIT + slack
+
+
+def test_corrupt_body_raises_codec_error(encoding):
+    with pytest.raises(Exception) as error:
+        _BoundedDecompressor(encoding, LIMIT).decompress(b"not compressed" * 10, final=True)
+    assert not isinstance(error.value, RequestBodyError)
+
+
+def run_middleware(encoding: str, body_chunks, max_body_size: int = LIMIT):
+    """Send a request through DecompressionMiddleware; returns (status, body the app read)."""
+    received = list()
+
+    async def app(scope, receive, send):
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+        received.append(body)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+        for i, chunk in enumerate(body_chunks)
+    ]
+    sent = list()
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/predict",
+        "headers": [(b"content-encoding", encoding.encode()), (b"content-length", b"1")],
+    }
+    middleware = DecompressionMiddleware(app, max_body_size=max_body_size)
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], received[0] if received else None
+
+
+def test_middleware_decompresses_streamed_body(encoding):
+    body = b'{"sample_id": "S"}' * 1000
+    status, received = run_middleware(encoding, chunks(compress(body, encoding), 64))
+    assert (status, received) == (200, body)
+
+
+def test_middleware_rejects_bomb_with_413(encoding):
+    data = gzip_bomb(2**26) if encoding == "gzip" else zstd_bomb(2**26)
+    status, _ = run_middleware(encoding, chunks(data, 2**16))
+    assert status == 413
+
+
+def test_middleware_rejects_corrupt_body_with_400(encoding):
+    status, _ = run_middleware(encoding, [b"not compressed" * 10])
+    assert status == 400
+
+
+def test_middleware_rejects_unknown_encoding_with_415():
+    status, received = run_middleware("br", [b"x"])
+    assert (status, received) == (415, None)
+
+
+def test_gzip_helper_matches_stdlib():
+    assert gzip.decompress(compress(b"abc", "gzip")) == b"abc"
@@ -0,0 +1,84 @@
+import pytest
+
+from dxvar import variant_parser
+from dxvar.variant_parser import ParserStats, normalize_variant, resolve_variant
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("chr6:160585140-T>G", "6,160585140,T,G,hg38"),
+        ("6-160585140-T-G", "6,160585140,T,G,hg38"),
+        ("chr6\t160585140\t.\tT\tG", "6,160585140,T,G,hg38"),
+        ("chr6:160585140-T>-", "6,160585140,T,,hg38"),
+        ("NC_000006.11:g.160585140T>G", "6,160585140,T,G,hg19"),
+        ("NC_000006.12:g.160585140_160585142delTGA", "6,160585140,TGA,,hg38"),
+        ("chr6:g.160585140delTinsGG", "6,160585140,T,GG,hg38"),
+        ("GRCh37 chr1:100-A>G", "1,100,A,G,hg19"),
+    ],
+)
+def test_coordinate_formats(text, expected):
+    assert normalize_variant(text) == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("chrX:1000-A>G", "X,1000,A,G,hg38"),
+        ("chrY:1000-A>G", "Y,1000,A,G,hg38"),
+        ("chrM:73-A>G", "MT,73,A,G,hg38"),
+        ("chrMT:73-A>G", "MT,73,A,G,hg38"),
+        ("NC_000023.11:g.1000A>G", "X,1000,A,G,hg38"),
+        ("NC_000024.10:g.1000A>G", "Y,1000,A,G,hg38"),
+        ("NC_012920.1:g.73A>G", "MT,73,A,G,hg38"),
+    ],
+)
+def test_sex_and_mitochondrial_chromosomes(text, expected):
+    assert normalize_variant(text) == expected
+
+
+def test_complete_coordinates_win_over_rs():
+    assert normalize_variant("rs121913529 chr12:25245350-C>A") == "12,25245350,C,A,hg38"
+
+
+def test_rs_returned_when_coordinates_incomplete():
+    assert normalize_variant("rs124234 chromosome:3, pos:13423") == "rs124234"
+    assert normalize_variant("RS123") == "rs123"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "what does this variant do?",
+        "rs1 and rs2",
+        "chr1:100-A>G chr2:200-C>T",
+        "chr23:100-A>G",
+        "NC_000001.99:g.100A>G",
+        # the deleted span does not match the deleted bases
+        "NC_000006.12:g.160585140_160585141delTGA",
+    ],
+)
+def test_left_to_the_llm(text):
+    assert normalize_variant(text) is None
+
+
+def test_same_variant_twice_is_not_ambiguous():
+    assert normalize_variant("chr1:100-A>G, again chr1:100-A>G") == "1,100,A,G,hg38"
+
+
+def test_resolve_variant_calls_fallback_only_on_miss(monkeypatch):
+    monkeypatch.setattr(variant_parser, "stats", ParserStats())
+    calls = list()
+
+    def fallback(text):
+        calls.append(text)
+        return "1,100,A,G,hg38"
+
+    assert resolve_variant("chr6:160585140-T>G", fallback) == "6,160585140,T,G,hg38"
+    assert resolve_variant("the BRAF hotspot", fallback) == "1,100,A,G,hg38"
+    assert calls == ["the BRAF hotspot"]
+
+    summary = variant_parser.stats.summary()
+    assert summary["parsed_locally"] == 1
+    assert summary["llm_fallbacks"] == 1
+    assert summary["hit_rate"] == 0.5